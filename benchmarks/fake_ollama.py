@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Local HTTP stand-in for the Ollama API, for offline benchmarks and CI.
+
+python -m benchmarks.fake_ollama --port 11435
+
+Embeddings are deterministic hashed bag-of-words vectors, so similar texts get
+similar vectors and retrieval quality is meaningful. Chat replies are derived
+from the prompt: query-rewrite prompts get keyword variations of the question,
+and answer prompts get the first sentences of the context. Optional delays
+emulate model latency.
+"""
+
+import argparse
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or that the this to was what when where "
+    "which who why with you your".split()
+)
+
+def fake_embedding(text: str, dim: int = 384) -> List[float]:
+    """Signed feature hashing of word unigrams and bigrams, L2-normalized."""
+    words = _WORD_RE.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts: Dict[str, int] = {}
+    for feature in features:
+        counts[feature] = counts.get(feature, 0) + 1
+    vector = [0.0] * dim
+    for feature, count in counts.items():
+        digest = zlib.crc32(feature.encode("utf-8"))
+        vector[digest % dim] += (1.0 if digest & 0x80000000 else -1.0) * (1 + math.log(count))
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def fake_reply(prompt: str) -> str:
+    """Deterministic reply for the app's query-rewrite and answer prompts."""
+    if "Original question:" in prompt:
+        question = prompt.rsplit("Original question:", 1)[1].strip()
+        keywords = [w for w in _WORD_RE.findall(question.lower()) if w not in _STOPWORDS]
+        return "\n".join([" ".join(keywords), " ".join(reversed(keywords))])
+    match = re.search(r"following context:(.*?)Question:", prompt, re.S)
+    context = match.group(1) if match else prompt
+    sentences = re.split(r"(?<=[.!?])\s+", " ".join(context.split()))
+    return " ".join(sentences[:2]).strip() or "I don't know."
+
+class FakeOllamaServer:
+    """
+    Threaded HTTP server implementing the Ollama endpoints the app uses.
+
+    Usable as a context manager; `base_url` is passed to `OllamaEmbeddings`,
+    `ChatOllama` or `ollama.Client` as their host.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        dim: int = 384,
+        embed_delay: float = 0.0,
+        token_delay: float = 0.0,
+        first_token_delay: float = 0.0,
+        list_delay: float = 0.0,
+        models: Optional[List[str]] = None
+    ):
+        """
+        Parameters:
+            host (str): Interface to bind.
+            port (int): Port to bind; 0 picks a free one.
+            dim (int): Embedding dimension.
+            embed_delay (float): Seconds added per embedding request.
+            token_delay (float): Seconds between streamed tokens.
+            first_token_delay (float): Seconds before the first token (prompt prefill).
+            list_delay (float): Seconds added per model listing (/api/tags, /api/ps).
+            models (Optional[List[str]]): Model names reported by /api/tags.
+        """
+        self.dim = dim
+        self.embed_delay = embed_delay
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.list_delay = list_delay
+        self.models = models or ["fake-chat", "nomic-embed-text"]
+        self.requests: Dict[str, int] = {}
+        self.loaded: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _count(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Streamed tokens are small writes; Nagle would add ~40 ms per reply
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload: Dict, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self) -> Dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                server._count(self.path)
+                if self.path in ("/api/tags", "/api/ps"):
+                    time.sleep(server.list_delay)
+                if self.path == "/api/tags":
+                    self._send_json({"models": [
+                        {"name": name, "model": name, "size": 0, "digest": "0" * 64, "details": {}}
+                        for name in server.models
+                    ]})
+                elif self.path == "/api/ps":
+                    self._send_json({"models": [
+                        {"name": name, "model": name, "size": 0, "digest": "0" * 64, "details": {}}
+                        for name in server.loaded
+                    ]})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                server._count(self.path)
+                request = self._read_json()
+                if request.get("model"):
+                    name = request["model"] if ":" in request["model"] else f"{request['model']}:latest"
+                    server.loaded[name] = time.time()
+                if self.path == "/api/embed":
+                    inputs = request.get("input", "")
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    time.sleep(server.embed_delay)
+                    self._send_json({
+                        "model": request.get("model", ""),
+                        "embeddings": [fake_embedding(text, server.dim) for text in inputs],
+                    })
+                elif self.path == "/api/embeddings":
+                    time.sleep(server.embed_delay)
+                    self._send_json({"embedding": fake_embedding(request.get("prompt", ""), server.dim)})
+                elif self.path in ("/api/chat", "/api/generate"):
+                    if self.path == "/api/chat":
+                        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+                    else:
+                        prompt = request.get("prompt", "")
+                    self._reply(request, fake_reply(prompt) if prompt else "")
+                elif self.path == "/api/show":
+                    self._send_json({"details": {"family": "fake"}, "model_info": {}, "capabilities": ["completion"]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def _message(self, request: Dict, content: str, done: bool) -> Dict:
+                message = {
+                    "model": request.get("model", ""),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "done": done,
+                }
+                if self.path == "/api/chat":
+                    message["message"] = {"role": "assistant", "content": content}
+                else:
+                    message["response"] = content
+                return message
+
+            def _reply(self, request: Dict, text: str) -> None:
+                tokens = re.findall(r"\S+\s*", text)
+                time.sleep(server.first_token_delay)
+                final = {"done_reason": "stop", "prompt_eval_count": 0, "eval_count": len(tokens)}
+                if not request.get("stream", True):
+                    time.sleep(server.token_delay * len(tokens))
+                    self._send_json({**self._message(request, text, True), **final})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    self._write_chunk(self._message(request, token, False))
+                    time.sleep(server.token_delay)
+                self._write_chunk({**self._message(request, "", True), **final})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, payload: Dict) -> None:
+                line = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=11435, help="Port to bind")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--embed-delay", type=float, default=0.0, help="Seconds added per embedding request")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="Seconds before the first token")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    server = FakeOllamaServer(
+        host=args.host,
+        port=args.port,
+        dim=args.dim,
+        embed_delay=args.embed_delay,
+        token_delay=args.token_delay,
+        first_token_delay=args.first_token_delay
+    )
+    print(f"Fake Ollama listening on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Build the labeled question -> passage set used by the retrieval benchmark.
+
+python -m benchmarks.labeled_set --documents documents --out benchmarks/data/labeled_set.json
+
+Each entry pairs a keyword question with the sentence it was derived from.
+Relevance is judged by an anchor phrase from that sentence rather than by
+chunk ids, so the same set stays valid when chunk_size or chunk_overlap change.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from langchain.schema import Document
+
+from src.core.ingest import SUPPORTED_EXTENSIONS, _extract_file
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or that the their this to "
+    "was were what when where which who why will with you your".split()
+)
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace so relevance checks ignore layout."""
+    return " ".join(text.lower().split())
+
+def load_documents(folder: Path) -> List[Document]:
+    """Extract every supported file below `folder`, in a stable order."""
+    documents = []
+    for path in sorted(folder.rglob("*")):
+        if path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            documents.extend(_extract_file(str(path)))
+    return documents
+
+def build_labeled_set(documents: List[Document], questions: int = 40, seed: int = 0, min_words: int = 8) -> List[Dict]:
+    """
+    Sample distinct sentences and turn each into a question made of its four
+    rarest content words. The anchor is six consecutive words from the middle
+    of the sentence; a retrieved chunk is relevant if it contains the anchor.
+    """
+    sentences: Dict[str, str] = {}
+    for doc in documents:
+        for sentence in _SENTENCE_RE.split(" ".join(doc.page_content.split())):
+            words = _WORD_RE.findall(sentence)
+            if min_words <= len(words) <= 60:
+                sentences.setdefault(normalize(sentence), doc.metadata.get("source", ""))
+
+    document_frequency = Counter(word for sentence in sentences for word in set(_WORD_RE.findall(sentence)))
+    entries, seen_questions = [], set()
+    for sentence, source in sentences.items():
+        words = _WORD_RE.findall(sentence)
+        content = [w for w in dict.fromkeys(words) if w not in _STOPWORDS and not w.isdigit()]
+        if len(content) < 4:
+            continue
+        keywords = sorted(content, key=lambda w: (-math.log(len(sentences) / document_frequency[w]), content.index(w)))[:4]
+        question = f"What does the document say about {' '.join(keywords)}?"
+        if question in seen_questions:
+            continue
+        seen_questions.add(question)
+        middle = max(len(words) // 2 - 3, 0)
+        entries.append({"question": question, "answer": sentence, "anchor": " ".join(words[middle:middle + 6]), "source": source})
+
+    entries = random.Random(seed).sample(entries, min(questions, len(entries)))
+    for number, entry in enumerate(entries):
+        entry["id"] = f"q{number:03d}"
+    return entries
+
+def is_relevant(chunk_text: str, entry: Dict) -> bool:
+    """True if the chunk contains the entry's anchor phrase."""
+    return entry["anchor"] in " ".join(_WORD_RE.findall(chunk_text.lower()))
+
+def load_labeled_set(path: Path) -> List[Dict]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build a labeled question set from a documents folder.")
+    parser.add_argument("--documents", type=Path, default=Path("documents"), help="Folder with source documents")
+    parser.add_argument("--questions", type=int, default=40, help="Number of questions to sample")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed")
+    parser.add_argument("--out", type=Path, default=Path("benchmarks/data/labeled_set.json"), help="Output JSON file")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    entries = build_labeled_set(load_documents(args.documents), questions=args.questions, seed=args.seed)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(entries, indent=2) + "\n", encoding="utf-8")
+    print(f"Wrote {len(entries)} questions to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Compare PDF text backends on speed and extracted-text parity.
+
+python -m benchmarks.pdf_backends --reference pdfplumber --json pdf_backends.json
+"""
+
+import argparse
+import json
+import logging
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from src.core.pdf_backends import BACKENDS, get_backend
+
+def token_f1(text: str, reference: str) -> float:
+    """Bag-of-words F1 between two page texts; 1.0 means identical word content."""
+    tokens, ref_tokens = Counter(text.split()), Counter(reference.split())
+    if not tokens and not ref_tokens:
+        return 1.0
+    overlap = sum((tokens & ref_tokens).values())
+    if overlap == 0:
+        return 0.0
+    precision = overlap / sum(tokens.values())
+    recall = overlap / sum(ref_tokens.values())
+    return 2 * precision * recall / (precision + recall)
+
+def run_backend(name: str, pdfs: List[Path]) -> Dict:
+    """Extract every page of every PDF with one backend and time it."""
+    backend = get_backend(name)
+    pages: Dict[str, Dict[int, str]] = {}
+    start = time.perf_counter()
+    for pdf in pdfs:
+        data = pdf.read_bytes()
+        pages[str(pdf)] = dict(backend.iter_pages(data))
+    elapsed = time.perf_counter() - start
+    page_count = sum(len(p) for p in pages.values())
+    return {
+        "backend": name,
+        "pages": page_count,
+        "seconds": elapsed,
+        "pages_per_second": page_count / elapsed if elapsed else 0.0,
+        "chars": sum(len(text) for p in pages.values() for text in p.values()),
+        "empty_pages": sum(1 for p in pages.values() for text in p.values() if not text.strip()),
+        "_texts": pages,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction backends.")
+    parser.add_argument("--documents", type=Path, default=Path("documents"), help="Folder searched for PDFs")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), help="Backends to compare")
+    parser.add_argument("--reference", default="pdfplumber", help="Backend whose text is used as reference")
+    parser.add_argument("--json", type=Path, default=None, help="Write the results to this JSON file")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args()
+    pdfs = sorted(args.documents.rglob("*.pdf"))
+    if not pdfs:
+        raise SystemExit(f"No PDFs found in {args.documents}")
+
+    results = []
+    for name in args.backends:
+        try:
+            results.append(run_backend(name, pdfs))
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+
+    reference = next((r for r in results if r["backend"] == args.reference), None)
+    for result in results:
+        if reference is None:
+            result["parity"] = None
+            continue
+        scores = [
+            token_f1(result["_texts"][pdf].get(number, ""), ref_text)
+            for pdf, ref_pages in reference["_texts"].items()
+            for number, ref_text in ref_pages.items()
+        ]
+        result["parity"] = sum(scores) / len(scores) if scores else None
+
+    print(f"{len(pdfs)} PDFs, parity measured against {args.reference}\n")
+    print(f"{'backend':<14}{'pages':>7}{'seconds':>10}{'pages/s':>10}{'chars':>10}{'empty':>7}{'parity':>8}")
+    for r in results:
+        parity = f"{r['parity']:.3f}" if r["parity"] is not None else "-"
+        print(
+            f"{r['backend']:<14}{r['pages']:>7}{r['seconds']:>10.2f}{r['pages_per_second']:>10.1f}"
+            f"{r['chars']:>10}{r['empty_pages']:>7}{parity:>8}"
+        )
+
+    if args.json:
+        report = [{k: v for k, v in r.items() if not k.startswith("_")} for r in results]
+        args.json.write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
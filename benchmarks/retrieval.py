@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval quality and latency benchmark.
+
+python -m benchmarks.retrieval --retriever hybrid --chunk-size 1000 --json reports/retrieval.json
+
+Ingests `documents/` through the real embedding and retrieval code, with a
+local fake Ollama server standing in for the models, then answers the labeled
+question set. Reports recall@k, MRR@k, ingestion throughput and p50/p95/p99
+latency per stage as JSON, so runs can be diffed between commits.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import yaml
+from langchain.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.labeled_set import build_labeled_set, is_relevant, load_documents, load_labeled_set
+from src.core.context import ContextPacker
+from src.core.document import DocumentProcessor
+from src.core.embedding_executor import BatchedEmbeddings
+from src.core.lexical_index import BM25Index
+from src.core.numpy_store import NumpyVectorStore
+from src.core.rag import ParallelMultiQueryRetriever, reciprocal_rank_fusion
+
+RETRIEVERS = ("vector", "multi-query", "hybrid", "lexical")
+
+class StageTimer:
+    """Collects per-stage wall-clock samples in milliseconds."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def time(self, stage: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(1000 * (time.perf_counter() - start))
+        return result
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "count": len(values),
+                "mean": float(np.mean(values)),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "p99": float(np.percentile(values, 99)),
+            }
+            for stage, values in self.samples.items()
+        }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def open_store(name: str, embeddings, directory: str):
+    if name == "chroma":
+        from langchain_community.vectorstores import Chroma
+        return Chroma(persist_directory=directory, collection_name="benchmark", embedding_function=embeddings)
+    return NumpyVectorStore(collection_name="benchmark", embedding_function=embeddings, quantization=name.split("-")[1])
+
+def ingest(args, server: FakeOllamaServer, directory: str):
+    """Extract, split, embed and index the documents folder, timing each stage."""
+    timings = {}
+    start = time.perf_counter()
+    documents = load_documents(args.documents)
+    timings["extract"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = DocumentProcessor(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap).split_documents(documents)
+    timings["split"] = time.perf_counter() - start
+
+    embeddings = BatchedEmbeddings(OllamaEmbeddings(model="nomic-embed-text", base_url=server.base_url), batch_size=32)
+    vector_db = open_store(args.store, embeddings, directory)
+    start = time.perf_counter()
+    vector_db.add_documents(chunks)
+    timings["embed"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lexical_index = BM25Index()
+    lexical_index.add_documents(chunks)
+    timings["lexical_index"] = time.perf_counter() - start
+
+    total = sum(timings.values())
+    files = len({doc.metadata.get("source") for doc in documents})
+    report = {
+        "files": files,
+        "chunks": len(chunks),
+        "seconds": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        "files_per_second": files / total if total else 0.0,
+        "chunks_per_second": len(chunks) / total if total else 0.0,
+    }
+    return documents, vector_db, lexical_index, report
+
+def run(args) -> Dict:
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    args.chunk_size = args.chunk_size or config["text_splitter"]["chunk_size"]
+    args.chunk_overlap = args.chunk_overlap if args.chunk_overlap is not None else config["text_splitter"]["chunk_overlap"]
+    args.k = args.k or config["retrieval"]["k"]
+
+    with FakeOllamaServer(
+        embed_delay=args.embed_delay,
+        token_delay=args.token_delay,
+        first_token_delay=args.first_token_delay
+    ) as server, tempfile.TemporaryDirectory() as directory:
+        documents, vector_db, lexical_index, ingestion = ingest(args, server, directory)
+        labeled = load_labeled_set(args.labeled_set) if args.labeled_set.exists() else build_labeled_set(documents)
+        if args.questions:
+            labeled = labeled[:args.questions]
+
+        llm = ChatOllama(model="fake-chat", base_url=server.base_url, temperature=0)
+        retriever = ParallelMultiQueryRetriever.from_llm(
+            vector_db,
+            llm,
+            prompt=PromptTemplate(input_variables=["question"], template=config["prompt_templates"]["query_prompt"]),
+            k=args.k,
+            max_variations=config["retrieval"]["max_variations"]
+        )
+        answer_chain = ChatPromptTemplate.from_template(config["prompt_templates"]["response_prompt"]) | llm | StrOutputParser()
+        packer = ContextPacker(
+            token_budget=config["context"]["token_budget"]["default"],
+            chars_per_token=config["context"]["chars_per_token"]
+        )
+
+        timer = StageTimer()
+        hits, reciprocal_ranks = 0, []
+        for entry in labeled:
+            question = entry["question"]
+            start = time.perf_counter()
+            if args.retriever == "lexical":
+                documents_found = [doc for doc, _ in timer.time("lexical", lexical_index.search, question, k=args.k)]
+            else:
+                queries = [question]
+                if args.retriever != "vector":
+                    queries = timer.time("rewrite", retriever.generate_queries, question)
+                vectors = timer.time("embed", retriever.embed_queries, queries)
+                documents_found = timer.time("search", retriever.search_by_vectors, vectors)
+                if args.retriever == "hybrid":
+                    lexical = [doc for doc, _ in timer.time("lexical", lexical_index.search, question, k=args.k)]
+                    documents_found = timer.time("fuse", reciprocal_rank_fusion, [documents_found, lexical])
+            context = timer.time("pack", packer.pack, question, documents_found)
+            if args.generate:
+                timer.time("generate", answer_chain.invoke, {"context": context, "question": question})
+            timer.samples.setdefault("total", []).append(1000 * (time.perf_counter() - start))
+
+            ranks = [rank for rank, doc in enumerate(documents_found[:args.k], 1) if is_relevant(doc.page_content, entry)]
+            hits += bool(ranks)
+            reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+
+        requests = dict(server.requests)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "processor": platform.machine()},
+        "settings": {
+            "retriever": args.retriever,
+            "store": args.store,
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "k": args.k,
+            "max_variations": config["retrieval"]["max_variations"],
+            "questions": len(labeled),
+            "embed_delay": args.embed_delay,
+            "token_delay": args.token_delay,
+            "first_token_delay": args.first_token_delay,
+        },
+        "ingestion": ingestion,
+        "quality": {
+            f"recall@{args.k}": hits / len(labeled) if labeled else 0.0,
+            f"mrr@{args.k}": float(np.mean(reciprocal_ranks)) if reciprocal_ranks else 0.0,
+        },
+        "latency_ms": timer.summary(),
+        "ollama_requests": requests,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline retrieval quality and latency benchmark.")
+    parser.add_argument("--documents", type=Path, default=Path("documents"), help="Folder with source documents")
+    parser.add_argument("--labeled-set", type=Path, default=Path("benchmarks/data/labeled_set.json"), help="Labeled questions")
+    parser.add_argument("--config", type=Path, default=Path("config.yml"), help="Path to config.yml")
+    parser.add_argument("--retriever", choices=RETRIEVERS, default="multi-query", help="Retrieval strategy")
+    parser.add_argument("--store", choices=("numpy-float16", "numpy-int8", "chroma"), default="numpy-float16", help="Vector store")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Override text_splitter.chunk_size")
+    parser.add_argument("--chunk-overlap", type=int, default=None, help="Override text_splitter.chunk_overlap")
+    parser.add_argument("--k", type=int, default=None, help="Override retrieval.k")
+    parser.add_argument("--questions", type=int, default=None, help="Use only the first N questions")
+    parser.add_argument("--no-generate", dest="generate", action="store_false", help="Skip the answer generation stage")
+    parser.add_argument("--embed-delay", type=float, default=0.0, help="Fake seconds per embedding request")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Fake seconds per generated token")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="Fake prefill seconds per generation")
+    parser.add_argument("--json", type=Path, default=None, help="Write the report to this JSON file")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args()
+    report = run(args)
+
+    settings, ingestion = report["settings"], report["ingestion"]
+    print(
+        f"{settings['retriever']} retriever, {settings['store']}, chunk_size={settings['chunk_size']} "
+        f"overlap={settings['chunk_overlap']} k={settings['k']}, {settings['questions']} questions"
+    )
+    print(
+        f"Ingestion: {ingestion['files']} files, {ingestion['chunks']} chunks, "
+        f"{ingestion['chunks_per_second']:.1f} chunks/s {ingestion['seconds']}"
+    )
+    print("Quality: " + ", ".join(f"{name} {value:.3f}" for name, value in report["quality"].items()))
+    print(f"\n{'stage':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for stage, stats in report["latency_ms"].items():
+        print(f"{stage:<10}{stats['p50']:>9.2f}{stats['p95']:>9.2f}{stats['p99']:>9.2f}")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+
+if __name__ == "__main__":
+    main()
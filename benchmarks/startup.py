@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+App startup and per-rerun overhead benchmark.
+
+python -m benchmarks.startup --json startup.json
+
+Startup: each module set is imported in a fresh process, as the first run of
+a Streamlit script does, and its import time and resident memory are
+reported. The default sets are the app's own modules (with src/app on the
+path, like `streamlit run src/app/main.py`) and heavy libraries for
+comparison; sets that are not installed are skipped.
+
+Per rerun: every rerun used to list the installed models. Direct
+`ollama.list()` calls are timed against `ModelCatalog.models()` lookups. The
+target is a local fake Ollama server with a configurable delay, or a real
+server passed with --host.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import ollama
+
+from benchmarks.fake_ollama import FakeOllamaServer
+from src.core.model_catalog import ModelCatalog
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+MODULE_SETS = {
+    "app": ["pipelines", "vector_db", "question_processor", "modular.pdf_utils"],
+    "langchain": ["langchain_core.runnables", "langchain_ollama"],
+    "document-parsers": ["bs4", "docx"],
+    "torch": ["torch"],
+}
+
+# Runs in the fresh process: import the modules, then report time and peak RSS
+_IMPORT_PROBE = """
+import json, resource, sys, time
+sys.path[:0] = {paths!r}
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+def measure_imports(name: str, modules: List[str], repeats: int) -> Optional[Dict]:
+    """Median import time and peak RSS of a module set over `repeats` fresh processes, or None if not installed."""
+    probe = _IMPORT_PROBE.format(paths=[str(REPO_ROOT), str(REPO_ROOT / "src" / "app")], modules=modules)
+    runs = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, cwd=REPO_ROOT)
+        if result.returncode != 0:
+            print(f"Skipping {name}: {result.stderr.strip().splitlines()[-1]}")
+            return None
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {
+        "modules": name,
+        "import_seconds": statistics.median(run["seconds"] for run in runs),
+        "rss_mb": statistics.median(run["rss_mb"] for run in runs),
+    }
+
+def measure_model_list(host: str, reruns: int) -> Dict:
+    """Per-rerun cost of listing models directly versus through the catalog."""
+    client = ollama.Client(host=host)
+    direct = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        client.list()
+        direct.append(time.perf_counter() - start)
+
+    catalog = ModelCatalog(client=client, ttl=30.0)
+    start = time.perf_counter()
+    catalog.models()
+    first = time.perf_counter() - start
+    cached = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        catalog.models()
+        cached.append(time.perf_counter() - start)
+    return {
+        "direct_p50_ms": 1000 * statistics.median(direct),
+        "catalog_first_ms": 1000 * first,
+        "catalog_p50_ms": 1000 * statistics.median(cached),
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark app startup imports and per-rerun model listing.")
+    parser.add_argument("--sets", nargs="+", default=list(MODULE_SETS), choices=MODULE_SETS, help="Module sets to import")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh processes per module set")
+    parser.add_argument("--reruns", type=int, default=50, help="Model list lookups to time")
+    parser.add_argument("--host", default=None, help="Ollama server to list models from (default: a local fake server)")
+    parser.add_argument("--list-delay", type=float, default=0.02, help="Seconds the fake server takes per model listing")
+    parser.add_argument("--json", type=Path, default=None, help="Write the results to this JSON file")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args()
+
+    imports = [
+        result for name in args.sets
+        if (result := measure_imports(name, MODULE_SETS[name], args.repeats)) is not None
+    ]
+    print(f"{'modules':<18}{'import s':>10}{'RSS MB':>8}")
+    for r in imports:
+        print(f"{r['modules']:<18}{r['import_seconds']:>10.2f}{r['rss_mb']:>8.1f}")
+
+    if args.host:
+        listing = measure_model_list(args.host, args.reruns)
+    else:
+        with FakeOllamaServer(list_delay=args.list_delay) as server:
+            listing = measure_model_list(server.base_url, args.reruns)
+    print(
+        f"\nmodel list per rerun: ollama.list() {listing['direct_p50_ms']:.2f} ms, "
+        f"ModelCatalog {listing['catalog_p50_ms']:.3f} ms (first lookup {listing['catalog_first_ms']:.2f} ms)"
+    )
+
+    if args.json:
+        args.json.write_text(json.dumps({"imports": imports, "model_list": listing}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Compare the NumPy vector store with Chroma on recall, latency, memory and open time.
+
+python -m benchmarks.vector_stores --chunks 500 2000 --json vector_stores.json
+
+Every backend runs in a fresh process so resident memory and open time are
+not skewed by an earlier run. Vectors are synthetic (clustered, like chunks of
+one document) and exact float32 search is the recall reference.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import resource
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+BACKENDS = ("chroma", "numpy-float16", "numpy-int8")
+
+class PrecomputedEmbeddings(Embeddings):
+    """Serves fixed vectors for the texts "chunk <i>"; queries are searched by vector."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[int(text.split()[1])].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def make_corpus(chunks: int, queries: int, dim: int, seed: int = 0):
+    """Clustered unit vectors and noisy queries drawn near random chunks."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(chunks // 50, 1), dim))
+    vectors = centers[rng.integers(0, len(centers), size=chunks)] + 0.5 * rng.normal(size=(chunks, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_vectors = vectors[rng.integers(0, chunks, size=queries)] + 0.3 * rng.normal(size=(queries, dim)) / np.sqrt(dim)
+    return vectors.astype(np.float32), query_vectors.astype(np.float32)
+
+def _rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _open(backend: str, directory: str, embeddings: Embeddings):
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+        return Chroma(persist_directory=directory, collection_name="bench", embedding_function=embeddings)
+    from src.core.numpy_store import NumpyVectorStore
+    return NumpyVectorStore(
+        collection_name="bench",
+        embedding_function=embeddings,
+        persist_directory=directory,
+        quantization=backend.split("-")[1]
+    )
+
+def _build(backend: str, directory: str, vectors: np.ndarray) -> float:
+    """Ingest the corpus in a child process and return the seconds taken."""
+    store = _open(backend, directory, PrecomputedEmbeddings(vectors))
+    start = time.perf_counter()
+    texts = [f"chunk {i}" for i in range(len(vectors))]
+    for offset in range(0, len(texts), 256):
+        store.add_texts(texts[offset:offset + 256], metadatas=[{"index": i} for i in range(offset, min(offset + 256, len(texts)))])
+    return time.perf_counter() - start
+
+def _query(backend: str, directory: str, vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> Dict:
+    """Open the persisted collection in a fresh process and time the queries."""
+    with tempfile.TemporaryDirectory() as warmup:
+        _open(backend, warmup, PrecomputedEmbeddings(vectors))  # exclude import time
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    store = _open(backend, directory, PrecomputedEmbeddings(vectors))
+    store.similarity_search_by_vector(query_vectors[0].tolist(), k=k)
+    open_seconds = time.perf_counter() - start
+
+    latencies, results = [], []
+    for query in query_vectors:
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(query.tolist(), k=k)
+        latencies.append(time.perf_counter() - start)
+        results.append([doc.metadata["index"] for doc in docs])
+    return {
+        "open_seconds": open_seconds,
+        "latencies": latencies,
+        "results": results,
+        "rss_mb": _rss_mb() - rss_before,
+    }
+
+def run_backend(backend: str, vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> Dict:
+    """Benchmark one backend, each phase in its own process."""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        with context.Pool(1) as pool:
+            build_seconds = pool.apply(_build, (backend, directory, vectors))
+        with context.Pool(1) as pool:
+            measured = pool.apply(_query, (backend, directory, vectors, query_vectors, k))
+
+    exact = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :k]
+    recall = statistics.mean(len(set(found) & set(truth)) / k for found, truth in zip(measured["results"], exact.tolist()))
+    latencies = sorted(measured["latencies"])
+    return {
+        "backend": backend,
+        "chunks": len(vectors),
+        "build_seconds": build_seconds,
+        "open_seconds": measured["open_seconds"],
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p95_ms": 1000 * latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        f"recall@{k}": recall,
+        "rss_mb": measured["rss_mb"],
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy vector store against Chroma.")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[500, 2000, 10000], help="Corpus sizes")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension (nomic-embed-text: 768)")
+    parser.add_argument("--k", type=int, default=4, help="Results per query")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS, help="Backends to compare")
+    parser.add_argument("--json", type=Path, default=None, help="Write the results to this JSON file")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args()
+
+    results = []
+    for chunks in args.chunks:
+        vectors, query_vectors = make_corpus(chunks, args.queries, args.dim)
+        for backend in args.backends:
+            try:
+                results.append(run_backend(backend, vectors, query_vectors, args.k))
+            except ImportError as e:
+                print(f"Skipping {backend}: {e}")
+
+    recall_key = f"recall@{args.k}"
+    print(f"{'backend':<15}{'chunks':>8}{'build s':>9}{'open ms':>9}{'p50 ms':>8}{'p95 ms':>8}{recall_key:>10}{'RSS MB':>8}")
+    for r in results:
+        print(
+            f"{r['backend']:<15}{r['chunks']:>8}{r['build_seconds']:>9.2f}{1000 * r['open_seconds']:>9.1f}"
+            f"{r['p50_ms']:>8.2f}{r['p95_ms']:>8.2f}{r[recall_key]:>10.3f}{r['rss_mb']:>8.1f}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
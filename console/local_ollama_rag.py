@@ -1,11 +1,10 @@
 import os
 import subprocess
-import torch
 import warnings
 import logging
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from langchain_community.document_loaders import UnstructuredPDFLoader
+from langchain.schema import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
@@ -16,6 +15,11 @@ from langchain_core.runnables import RunnablePassthrough
 from langchain.retrievers.multi_query import MultiQueryRetriever
 from colorama import Fore, Style, init
 from tqdm import tqdm
+from src.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+from src.core.embedding_executor import BatchedEmbeddings
+from src.core.model_catalog import ModelCatalog
+from src.core.pdf_backends import PDFTextExtractor
+from src.core.scheduler import RequestScheduler
 
 # Initialize warnings and colorama
 warnings.filterwarnings('ignore')
@@ -33,20 +37,24 @@ os.environ["PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"] = "python"
 # Global cache for Ollama models output
 OLLAMA_MODELS_CACHE = None
 
-def check_gpu():
-    """Check and log if a GPU is available."""
-    if torch.cuda.is_available():
-        logging.info(f"{Fore.MAGENTA}GPU is available. Running on GPU.{Style.RESET_ALL}")
+def check_gpu(model_name="deepseek-r1:8b"):
+    """Log whether Ollama runs the model on the GPU or the CPU."""
+    processor = ModelCatalog().processor(model_name)
+    if processor is None:
+        logging.info(f"{Fore.MAGENTA}{model_name} is not loaded yet; Ollama picks GPU or CPU when it loads.{Style.RESET_ALL}")
     else:
-        logging.info(f"{Fore.MAGENTA}GPU not available. Running on CPU.{Style.RESET_ALL}")
+        logging.info(f"{Fore.MAGENTA}{model_name} runs on {processor}.{Style.RESET_ALL}")
 
 def load_pdf(pdf_path: str):
     """Load a PDF document from a local file."""
     if not pdf_path or not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
     logging.info(f"{Fore.CYAN}Loading PDF file: {pdf_path}{Style.RESET_ALL}")
-    loader = UnstructuredPDFLoader(file_path=pdf_path)
-    data = loader.load()
+    extractor = PDFTextExtractor(backend="pypdfium2", fallback="unstructured")
+    data = [
+        Document(page_content=text, metadata={"source": pdf_path, "page": page_number})
+        for page_number, text in extractor.iter_pages(pdf_path)
+    ]
     logging.info(f"{Fore.GREEN}PDF loaded successfully!{Style.RESET_ALL}")
     return data
 
@@ -83,23 +91,32 @@ def split_document(data, chunk_size=7500, chunk_overlap=100):
     logging.info(f"{Fore.GREEN}Splitting complete. {len(chunks)} chunks created.{Style.RESET_ALL}")
     return chunks
 
-def create_vector_database(chunks, collection_name="local-rag", embedding_model="nomic-embed-text"):
-    """Create a vector database using Ollama embeddings."""
+def create_scheduler(embedding_model="nomic-embed-text", cache_dir="data/embedding_cache", max_generations=2):
+    """Create the request scheduler: batched query embeddings over cached Ollama embeddings, and bounded generations."""
+    embeddings = CachedEmbeddings(
+        BatchedEmbeddings(OllamaEmbeddings(model=embedding_model)),
+        EmbeddingCache(cache_dir=cache_dir),
+        model_name=embedding_model
+    )
+    return RequestScheduler(embeddings, max_generations=max_generations)
+
+def create_vector_database(chunks, scheduler, collection_name="local-rag"):
+    """Create a vector database using Ollama embeddings, reusing cached chunk vectors."""
     logging.info(f"{Fore.CYAN}Creating vector database...{Style.RESET_ALL}")
-    embeddings = OllamaEmbeddings(model=embedding_model)
+    # Concurrent queries embed through the scheduler's batcher; ingestion-sized calls bypass it
     vector_db = Chroma.from_documents(
         documents=chunks,
-        embedding=embeddings,
+        embedding=scheduler.embeddings,
         collection_name=collection_name
     )
     logging.info(f"{Fore.GREEN}Vector database created successfully!{Style.RESET_ALL}")
+    logging.info(f"{Fore.CYAN}Embedding cache stats: {scheduler.embeddings.embeddings.cache.stats()}{Style.RESET_ALL}")
     return vector_db
 
 def initialize_llm(model_name="deepseek-r1:8b"):
-    """Initialize the ChatOllama LLM with GPU support if available."""
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    logging.info(f"{Fore.MAGENTA}Initializing LLM with model: {model_name} on device: {device}{Style.RESET_ALL}")
-    llm = ChatOllama(model=model_name, device=device)
+    """Initialize the ChatOllama LLM; Ollama uses the GPU when one is available."""
+    logging.info(f"{Fore.MAGENTA}Initializing LLM with model: {model_name}{Style.RESET_ALL}")
+    llm = ChatOllama(model=model_name)
     return llm
 
 def setup_retriever(vector_db, llm):
@@ -189,19 +206,21 @@ def pdf_processing_flow():
             progress.update(1)
 
             # Step 4: Create the vector database
-            vector_db = create_vector_database(chunks)
+            scheduler = create_scheduler()
+            vector_db = create_vector_database(chunks, scheduler)
             progress.update(1)
 
             # Step 5: GPU Check
             check_gpu()
             progress.update(1)
 
-            # Step 6: Initialize the LLM
-            llm = initialize_llm()
+            # Step 6: Initialize the LLM; concurrent queries share the scheduler's generation and rewrite slots
+            base_llm = initialize_llm()
+            llm = scheduler.schedule(base_llm)
             progress.update(1)
 
             # Step 7: Set up the retriever and build the chain
-            retriever = setup_retriever(vector_db, llm)
+            retriever = setup_retriever(vector_db, scheduler.schedule_rewrite(base_llm))
             chain = build_chain(retriever, llm)
             progress.update(1)
 
@@ -220,6 +239,7 @@ def pdf_processing_flow():
                         results.append((query, result))
                     except Exception as e:
                         logging.error(f"Error processing query '{query}': {e}")
+            logging.info(f"{Fore.CYAN}Scheduler stats: {scheduler.stats()}{Style.RESET_ALL}")
             progress.update(1)
 
     except Exception as e:
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Async HTTP API for the RAG pipeline.
+
+python -m src.api.server --config config.yml --port 8000
+
+Endpoints:
+    GET  /health         liveness plus registry and cache counters
+    POST /ingest         multipart upload of one or more PDF, DOCX or HTML files
+    POST /query          JSON {"question", "collection", "model"?} -> {"answer", "degradations"}
+    POST /query/stream   same body, answer streamed as server-sent events
+    GET  /query/stream   same, with query parameters, for EventSource clients
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+
+import uvicorn
+import yaml
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+
+from src.api.service import CollectionNotFoundError, RAGService, ServiceBusyError
+from src.core.budget import StageTimeout
+from src.core.ingest import SUPPORTED_EXTENSIONS
+from src.core.scheduler import PRIORITIES, request_priority
+from src.core.warmup import ModelWarmer
+
+logger = logging.getLogger(__name__)
+
+_UPLOAD_CHUNK = 1 << 20
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1)
+    collection: str = Field(min_length=1)
+    model: Optional[str] = None
+    # Interactive requests get generation slots before batch ones
+    priority: Literal["interactive", "batch"] = "interactive"
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event; data is JSON so answers may contain newlines."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def create_app(config: Dict[str, Any]) -> FastAPI:
+    """Build the API app; clients and pipelines are created once at startup and shared by all requests."""
+    max_upload_bytes = int(config["api"]["max_upload_mb"] * 1024 * 1024)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        service = RAGService(config)
+        warmer = ModelWarmer(
+            keep_alive=config["ollama"]["keep_alive"].get("models") or {},
+            default_keep_alive=config["ollama"]["keep_alive"]["default"],
+            refresh_interval=config["ollama"]["state_refresh_seconds"]
+        )
+        warmer.warm(service.default_model, "chat")
+        warmer.warm(service.vector_store.embedding_model, "embed")
+        rewrite_model = await asyncio.to_thread(service.rewrite_model)
+        if rewrite_model:
+            warmer.warm(rewrite_model, "chat")
+        app.state.service = service
+        yield
+        warmer.stop()
+
+    app = FastAPI(title="Local Ollama RAG API", lifespan=lifespan)
+
+    @app.exception_handler(CollectionNotFoundError)
+    async def collection_not_found(request: Request, e: CollectionNotFoundError):
+        return JSONResponse(status_code=404, content={"detail": str(e)})
+
+    @app.exception_handler(ServiceBusyError)
+    async def service_busy(request: Request, e: ServiceBusyError):
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": "1"})
+
+    @app.exception_handler(StageTimeout)
+    async def stage_timeout(request: Request, e: StageTimeout):
+        return JSONResponse(status_code=504, content={"detail": str(e), "stage": e.stage})
+
+    @app.get("/health")
+    async def health(request: Request) -> Dict[str, Any]:
+        return {"status": "ok", **request.app.state.service.stats()}
+
+    @app.post("/ingest")
+    async def ingest(
+        request: Request,
+        files: List[UploadFile] = File(...),
+        collection: Optional[str] = Form(None)
+    ) -> Dict[str, Any]:
+        service: RAGService = request.app.state.service
+        with tempfile.TemporaryDirectory(prefix="rag-upload-") as tmp_dir:
+            paths = []
+            for upload in files:
+                name = Path(upload.filename or "").name
+                if Path(name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                    raise HTTPException(status_code=415, detail=f"Unsupported file type: {name or 'unnamed upload'}")
+                path = Path(tmp_dir) / f"{len(paths)}" / name
+                path.parent.mkdir()
+                size = 0
+                with open(path, "wb") as out:
+                    while chunk := await upload.read(_UPLOAD_CHUNK):
+                        size += len(chunk)
+                        if size > max_upload_bytes:
+                            raise HTTPException(status_code=413, detail=f"{name} exceeds {config['api']['max_upload_mb']} MB")
+                        out.write(chunk)
+                paths.append(path)
+            try:
+                return await service.ingest(paths, collection_name=collection or None)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+
+    @app.post("/query")
+    async def query(request: Request, body: QueryRequest) -> Dict[str, Any]:
+        service: RAGService = request.app.state.service
+        answer, stats = await service.query(
+            body.question,
+            body.collection,
+            model=body.model,
+            priority=PRIORITIES[body.priority]
+        )
+        return {
+            "answer": answer,
+            "collection": body.collection,
+            "model": body.model or service.default_model,
+            "degradations": stats.degradations,
+        }
+
+    async def stream_response(request: Request, body: QueryRequest) -> StreamingResponse:
+        service: RAGService = request.app.state.service
+        # Resolve the collection and wait for a slot before answering, so errors get a proper status code
+        pipeline = await service.pipeline_for(body.collection, body.model)
+        release = await service.acquire(service.query_slots)
+
+        async def events() -> AsyncIterator[str]:
+            try:
+                with request_priority(PRIORITIES[body.priority]):
+                    stream = await pipeline.astream(body.question)
+                    async for token in stream:
+                        yield sse_event("token", {"text": token})
+                stats = stream.stats
+                yield sse_event("done", {**asdict(stats), "tokens_per_second": stats.tokens_per_second})
+            except Exception as e:
+                logger.error(f"Error streaming answer: {e}")
+                yield sse_event("error", {"detail": str(e)})
+            finally:
+                release()
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            # Also release when the client disconnects before the stream starts
+            background=BackgroundTask(release)
+        )
+
+    @app.post("/query/stream")
+    async def query_stream(request: Request, body: QueryRequest) -> StreamingResponse:
+        return await stream_response(request, body)
+
+    @app.get("/query/stream")
+    async def query_stream_get(
+        request: Request,
+        question: str = Query(min_length=1),
+        collection: str = Query(min_length=1),
+        model: Optional[str] = None,
+        priority: Literal["interactive", "batch"] = "interactive"
+    ) -> StreamingResponse:
+        return await stream_response(
+            request,
+            QueryRequest(question=question, collection=collection, model=model, priority=priority)
+        )
+
+    return app
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the RAG pipeline over HTTP.")
+    parser.add_argument("--config", type=Path, default=Path("config.yml"), help="Path to config.yml")
+    parser.add_argument("--host", default=None, help="Interface to bind (default: api.host)")
+    parser.add_argument("--port", type=int, default=None, help="Port to bind (default: api.port)")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    # One worker process: clients, caches and concurrency limits live in this process
+    uvicorn.run(
+        create_app(config),
+        host=args.host or config["api"]["host"],
+        port=args.port or config["api"]["port"]
+    )
+
+if __name__ == "__main__":
+    main()
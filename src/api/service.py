@@ -0,0 +1,269 @@
+"""Shared clients, pipelines and concurrency limits behind the HTTP API."""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from src.core.answer_cache import SemanticAnswerCache
+from src.core.budget import LatencyBudget
+from src.core.context import ContextPacker, budget_for_model
+from src.core.dedup import ChunkDeduplicator
+from src.core.embeddings import VectorStore
+from src.core.ingest import IngestionPipeline
+from src.core.lexical_index import BM25Index
+from src.core.llm import LLMManager
+from src.core.manifest import collection_name_for, compute_document_digest
+from src.core.model_catalog import ModelCatalog
+from src.core.pipeline_registry import PipelineRegistry
+from src.core.query_cache import LRUCache
+from src.core.rag import RAGPipeline, recording_stats
+from src.core.scheduler import INTERACTIVE, RequestScheduler, request_priority
+from src.core.token_stream import GenerationStats
+from src.core.warmup import keep_alive_for
+
+logger = logging.getLogger(__name__)
+
+class CollectionNotFoundError(LookupError):
+    """The requested collection does not exist or is empty."""
+
+class ServiceBusyError(RuntimeError):
+    """No concurrency slot became free within the queue timeout."""
+
+class RAGService:
+    """
+    Owns everything the API shares between requests: one vector store and
+    embedder, one LLM client per model, one RAG pipeline per (model,
+    collection), the query and answer caches, and the semaphores that bound
+    concurrent queries and ingestions against the single Ollama backend.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Parameters:
+            config (Dict[str, Any]): Parsed config.yml.
+        """
+        self.config = config
+        api_config = config["api"]
+        embeddings_config = config["embeddings"]
+        self.vector_store = VectorStore(
+            embedding_model=embeddings_config["model"],
+            cache_dir=embeddings_config["cache"]["directory"] if embeddings_config["cache"]["enabled"] else None,
+            cache_max_entries=embeddings_config["cache"]["max_entries"],
+            persist_directory=config["vector_db"]["persist_directory"],
+            batch_size=embeddings_config["batch_size"],
+            max_in_flight=embeddings_config["max_in_flight"],
+            lexical_directory=config["lexical_index"]["directory"] if config["lexical_index"]["enabled"] else None,
+            backend=config["vector_db"]["backend"],
+            quantization=config["vector_db"]["quantization"],
+            keep_alive=keep_alive_for(config["ollama"]["keep_alive"], embeddings_config["model"])
+        )
+        scheduler_config = config["scheduler"]
+        self.scheduler = RequestScheduler(
+            self.vector_store.embeddings,
+            max_generations=scheduler_config["max_generations"],
+            embed_window=scheduler_config["embed_window_ms"] / 1000,
+            max_embed_batch=scheduler_config["max_embed_batch"],
+            max_rewrites=scheduler_config["max_rewrites"]
+        )
+        self.registry = PipelineRegistry(max_entries=config["pipeline_registry"]["max_entries"])
+        cache_config = config["query_cache"]
+        self.variation_cache = LRUCache(
+            max_entries=cache_config["variations"]["max_entries"],
+            ttl_seconds=cache_config["variations"]["ttl_seconds"]
+        )
+        self.embedding_cache = LRUCache(max_entries=cache_config["embeddings"]["max_entries"])
+        self.answer_cache = SemanticAnswerCache(
+            threshold=config["answer_cache"]["similarity_threshold"],
+            max_entries=config["answer_cache"]["max_entries"]
+        ) if config["answer_cache"]["enabled"] else None
+        self.latency_budget = LatencyBudget.from_config(config["latency_budget"])
+        self.default_model = api_config.get("model") or config["default_model"]
+        self.queue_timeout = api_config["queue_timeout_seconds"]
+        self.ingest_workers = api_config["ingest_workers"]
+        self.query_slots = asyncio.Semaphore(api_config["max_concurrent_queries"])
+        self.ingest_slots = asyncio.Semaphore(api_config["max_concurrent_ingests"])
+        self.model_catalog = ModelCatalog(
+            ttl=config["ollama"]["model_list_ttl_seconds"],
+            loaded_ttl=config["ollama"]["loaded_list_ttl_seconds"]
+        )
+
+    def rewrite_model(self) -> Optional[str]:
+        """The configured rewrite model if it is installed, or None to rewrite with the answering model."""
+        model = self.config["retrieval"].get("rewrite_model")
+        if model and not self.model_catalog.is_installed(model):
+            logger.warning(f"Rewrite model {model} is not installed (ollama pull {model}), rewriting with the answering model")
+            return None
+        return model
+
+    def get_llm_manager(self, model: str) -> LLMManager:
+        """Return the shared LLM client for a model."""
+        return self.registry.get_or_create(
+            ("llm", model),
+            lambda: LLMManager(
+                model_name=model,
+                rewrite_model=self.rewrite_model(),
+                rewrite_max_tokens=self.config["retrieval"]["rewrite_max_tokens"],
+                keep_alive_for=lambda name: keep_alive_for(self.config["ollama"]["keep_alive"], name)
+            )
+        )
+
+    def get_pipeline(self, model: str, collection_name: str) -> RAGPipeline:
+        """Return the shared RAG pipeline for a model and collection, built on first use."""
+        return self.registry.get_or_create(
+            ("rag", model, collection_name),
+            lambda: self._build_pipeline(model, collection_name)
+        )
+
+    def _build_pipeline(self, model: str, collection_name: str) -> RAGPipeline:
+        vector_db = self.vector_store.open_collection(collection_name)
+        if vector_db._collection.count() == 0:
+            raise CollectionNotFoundError(f"Collection '{collection_name}' does not exist or is empty")
+        retrieval_config = self.config["retrieval"]
+        return RAGPipeline(
+            vector_db,
+            self.get_llm_manager(model),
+            context_packer=ContextPacker(
+                token_budget=budget_for_model(self.config["context"]["token_budget"], model),
+                chars_per_token=self.config["context"]["chars_per_token"]
+            ),
+            k=retrieval_config["k"],
+            max_variations=retrieval_config["max_variations"],
+            variation_cache=self.variation_cache,
+            embedding_cache=self.embedding_cache,
+            embedding_model=self.vector_store.embedding_model,
+            answer_cache=self.answer_cache,
+            lexical_index=self.vector_store.open_lexical_index(collection_name),
+            retrieval_mode=retrieval_config["mode"],
+            scheduler=self.scheduler,
+            speculative=retrieval_config["speculative"],
+            latency_budget=self.latency_budget,
+            manifest=self.vector_store.manifest
+        )
+
+    async def pipeline_for(self, collection_name: str, model: Optional[str] = None) -> RAGPipeline:
+        """Async `get_pipeline`; building one opens the collection from disk, so it runs in a worker thread."""
+        return await asyncio.to_thread(self.get_pipeline, model or self.default_model, collection_name)
+
+    async def acquire(self, slots: asyncio.Semaphore) -> Callable[[], None]:
+        """
+        Wait up to the queue timeout for a slot.
+
+        Returns a release function that is safe to call more than once, so a
+        streamed response can release from both its generator and its cleanup.
+        """
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ServiceBusyError(f"No free slot within {self.queue_timeout}s, try again later")
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                slots.release()
+        return release
+
+    @asynccontextmanager
+    async def limit(self, slots: asyncio.Semaphore) -> AsyncIterator[None]:
+        """Hold one of `slots` for the duration of the block."""
+        release = await self.acquire(slots)
+        try:
+            yield
+        finally:
+            release()
+
+    async def query(
+        self,
+        question: str,
+        collection_name: str,
+        model: Optional[str] = None,
+        priority: int = INTERACTIVE
+    ) -> Tuple[str, GenerationStats]:
+        """Answer a question about a collection; the stats list the degradations applied to stay within budget."""
+        pipeline = await self.pipeline_for(collection_name, model)
+        stats = GenerationStats()
+        async with self.limit(self.query_slots):
+            with request_priority(priority), recording_stats(stats):
+                answer = await pipeline.aget_response(question)
+        return answer, stats
+
+    async def ingest(self, paths: List[Path], collection_name: Optional[str] = None) -> Dict[str, Any]:
+        """Ingest uploaded files, holding an ingestion slot; the work itself runs in a worker thread."""
+        async with self.limit(self.ingest_slots):
+            return await asyncio.to_thread(self.ingest_files, paths, collection_name)
+
+    def ingest_files(self, paths: List[Path], collection_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ingest files into a collection.
+
+        Files are appended to `collection_name` when given. Otherwise exactly
+        one file is expected and it gets its own collection named after its
+        digest, which is reused if the same document was ingested before.
+        """
+        digest = None
+        if collection_name is None:
+            if len(paths) != 1:
+                raise ValueError("Pass a collection name to ingest several files at once")
+            splitter_config = self.config["text_splitter"]
+            digest = compute_document_digest(
+                paths[0].read_bytes(),
+                splitter_config["chunk_size"],
+                splitter_config["chunk_overlap"],
+                self.vector_store.embedding_model
+            )
+            collection_name = collection_name_for(digest)
+            if self.vector_store.open_vector_db(digest) is not None:
+                logger.info(f"{paths[0].name} is already ingested as {collection_name}")
+                entry = self.vector_store.manifest.get(digest)
+                return {"collection": collection_name, "chunks": entry["chunk_count"], "cached": True}
+            # Drop leftovers of an interrupted ingestion before appending to the collection
+            self.vector_store.open_collection(collection_name).delete_collection()
+            if self.vector_store.lexical_directory is not None:
+                BM25Index.remove(self.vector_store.lexical_directory, collection_name)
+
+        report = self._ingestion_pipeline().ingest_files(paths, collection_name=collection_name)
+        if report.chunks == 0:
+            raise ValueError(f"No text could be ingested: {report.errors or 'documents are empty'}")
+        if digest is not None and self.vector_store.manifest is not None:
+            self.vector_store.manifest.record(digest, collection_name, paths[0].name, report.chunks)
+        # Pipelines hold the collection's BM25 index as it was when they were built
+        self.registry.discard(lambda key: key[0] == "rag" and key[2] == collection_name)
+        return {
+            "collection": collection_name,
+            "chunks": report.chunks,
+            "cached": False,
+            "files": report.files_ok,
+            "duplicates_dropped": report.duplicates_dropped,
+            "seconds": round(report.elapsed, 3),
+            "errors": {Path(path).name: error for path, error in report.errors.items()},
+        }
+
+    def _ingestion_pipeline(self) -> IngestionPipeline:
+        dedup_config = self.config["dedup"]
+        return IngestionPipeline(
+            self.vector_store,
+            chunk_size=self.config["text_splitter"]["chunk_size"],
+            chunk_overlap=self.config["text_splitter"]["chunk_overlap"],
+            max_workers=self.ingest_workers,
+            pdf_backend=self.config["pdf"]["text_backend"],
+            pdf_fallback=self.config["pdf"]["fallback_backend"],
+            deduplicator=ChunkDeduplicator(
+                threshold=dedup_config["threshold"],
+                num_perm=dedup_config["num_perm"],
+                bands=dedup_config["bands"],
+                shingle_size=dedup_config["shingle_size"]
+            ) if dedup_config["enabled"] else None
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Registry and cache counters."""
+        stats = {
+            "pipelines": self.registry.stats(),
+            "scheduler": self.scheduler.stats(),
+            "variation_cache": self.variation_cache.stats(),
+            "embedding_cache": self.embedding_cache.stats(),
+        }
+        if self.answer_cache is not None:
+            stats["answer_cache"] = self.answer_cache.stats()
+        return stats
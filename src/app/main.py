@@ -1,37 +1,28 @@
+import time
+
+# Taken before the imports, so the first run of a process measures startup
+RUN_START = time.perf_counter()
+
 import streamlit as st
 import os
-import re
-import pdfplumber
-import ollama
-import warnings
-import torch
-import sys
-
-from typing import Any, Tuple
-from bs4 import BeautifulSoup
-from docx import Document
-from langchain.schema import HumanMessage
+import itertools
+
+from typing import Tuple
 
 from config import config
 from logging_config import logger
-from vector_db import create_vector_db, delete_vector_db
-from question_processor import process_question
-
-# Set the log level to ERROR to avoid unnecessary logs from Ollama
-os.environ["C10_LOG_LEVEL"] = "ERROR"
-original_stderr = sys.stderr
-sys.stderr = open(os.devnull, "w")
-sys.stderr = original_stderr
-warnings.filterwarnings("ignore", category=UserWarning, message=".*torch.classes.*")
-
-# Determine device: GPU if available, else CPU
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-if device.type == "cuda":
-    logger.info("Running on GPU")
-else:
-    logger.info("Running on CPU")
-
-# device = torch.device("cpu")  # Uncomment this line to force CPU usage
+from vector_db import (
+    acquire_document_text,
+    acquire_vector_db,
+    create_vector_db,
+    create_vector_db_from_pdf,
+    delete_vector_db,
+    document_digest,
+)
+from pipelines import get_llm, get_model_catalog, get_model_warmer, get_rewrite_model, get_run_timings
+from question_processor import stream_chat, stream_question
+from src.core.token_stream import GenerationStats
+from modular.pdf_utils import render_pdf_window
 
 os.environ["PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"] = "python"
 
@@ -43,6 +34,8 @@ st.set_page_config(
 
 def extract_text_from_docx(file) -> str:
     """Extract text from a DOCX file."""
+    # Imported on first use to keep it out of app startup
+    from docx import Document
     doc = Document(file)
     return "\n".join([para.text for para in doc.paragraphs])
 
@@ -50,6 +43,7 @@ def extract_text_from_html(file) -> str:
     """Extract plain text from an HTML file using BeautifulSoup."""
     file.seek(0)
     content = file.read().decode("utf-8")
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(content, "html.parser")
     return soup.get_text()
 
@@ -58,22 +52,6 @@ def extract_raw_html(file) -> str:
     file.seek(0)
     return file.read().decode("utf-8")
 
-def extract_text_from_pdf(file) -> str:
-    """Extract text from a PDF file using pdfplumber."""
-    with pdfplumber.open(file) as pdf:
-        return "\n".join([page.extract_text() or "" for page in pdf.pages])
-
-def extract_model_names(models_info: Any) -> Tuple[str, ...]:
-    """Extract model names from the provided models information."""
-    logger.info("Extracting model names from models_info")
-    try:
-        if hasattr(models_info, "models"):
-            return tuple(model.model for model in models_info.models)
-        return tuple()
-    except Exception as e:
-        logger.error(f"Error extracting model names: {e}")
-        return tuple()
-
 def render_word_viewer(word_text: str):
     """Render the Word viewer with adjustable font size."""
     font_size = st.slider(
@@ -109,14 +87,48 @@ def render_html_viewer(html_content: str):
     """
     st.components.v1.html(html_with_zoom, height=600, scrolling=True)
 
+def format_generation_stats(stats: GenerationStats) -> str:
+    """One-line latency summary shown under each answer."""
+    ttft = f"{stats.ttft:.2f}s" if stats.ttft is not None else "-"
+    if stats.cached:
+        return f"⏱️ served from answer cache in {ttft}"
+    summary = f"⏱️ first token {ttft} · {stats.tokens_per_second:.1f} tokens/s · {stats.seconds:.1f}s total"
+    if stats.rewrite_seconds is not None:
+        summary += f" · rewrite {stats.rewrite_seconds:.2f}s ({stats.variations} variations)"
+    if stats.degradations:
+        summary += f" · ⚠️ degraded: {', '.join(stats.degradations)}"
+    return summary
+
+MODEL_STATE_ICONS = {"cold": "⚪", "loading": "⏳", "ready": "🟢", "failed": "🔴"}
+
+@st.fragment(run_every=2)
+def show_model_status(models: Tuple[str, ...]):
+    """Load state of the warmed models and the processor Ollama runs them on, refreshed while the page is open."""
+    warmer = get_model_warmer()
+    catalog = get_model_catalog()
+    parts = []
+    for model in models:
+        state = warmer.state(model)
+        label = f"{MODEL_STATE_ICONS.get(state.state, '')} `{model}` {state.state}"
+        if state.state == "ready":
+            details = [f"{state.load_seconds:.1f}s"] if state.load_seconds is not None else []
+            processor = catalog.processor(model)
+            if processor is not None:
+                details.append(processor)
+            if details:
+                label += f" ({', '.join(details)})"
+        elif state.state == "failed":
+            label += f": {state.error}"
+        parts.append(label)
+    st.caption(" · ".join(parts))
+
 def main():
     """Main function to run the Streamlit application."""
     st.title(config["app"]["page_title"])
-    st.markdown(f"### Using Device: `{device}`")
+    st.sidebar.caption(f"⏱️ {get_run_timings().summary()}")
 
-    # Get available models from Ollama
-    models_info = ollama.list()
-    available_models = extract_model_names(models_info)
+    # Installed models are listed once and then refreshed in the background, so reruns do not wait for Ollama
+    available_models = get_model_catalog().models()
 
     col1, col2 = st.columns(2)
 
@@ -131,6 +143,18 @@ def main():
         key="model_select"
     )
 
+    # Load the models in the background so the first question does not wait for them
+    warmer = get_model_warmer()
+    warmer.warm(selected_model, "chat")
+    warmer.warm(config["embeddings"]["model"], "embed")
+    warmed = [selected_model, config["embeddings"]["model"]]
+    rewrite_model = get_rewrite_model()
+    if rewrite_model and rewrite_model != selected_model:
+        warmer.warm(rewrite_model, "chat")
+        warmed.append(rewrite_model)
+    with col1:
+        show_model_status(tuple(warmed))
+
     file_upload = col1.file_uploader(
         "Upload a file (PDF, DOCX, HTML) ⬆️",
         type=["pdf", "docx", "html"],
@@ -141,33 +165,52 @@ def main():
     if file_upload:
         if st.session_state["vector_db"] is None:
             with st.spinner("Processing uploaded file..."):
-                file_text = ""
+                # Sessions viewing the same document share its collection and extracted text
+                digest = document_digest(file_upload.getvalue())
+                ingest = None
                 if file_upload.type == "application/pdf":
-                    file_text = extract_text_from_pdf(file_upload)
+                    ingest = lambda: create_vector_db_from_pdf(file_upload, digest)
                 elif file_upload.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                    file_text = extract_text_from_docx(file_upload)
+                    text_lease = acquire_document_text(digest, "docx", lambda: extract_text_from_docx(file_upload))
                     # Save extracted DOCX text for later rendering
-                    st.session_state["docx_text"] = file_text
+                    st.session_state["document_text_lease"] = text_lease
+                    st.session_state["docx_text"] = text_lease.value
+                    file_text = text_lease.value
+
+                    def ingest_docx():
+                        if not file_text:
+                            return None
+                        return create_vector_db({"name": file_upload.name, "text": file_text, "digest": digest})
+
+                    ingest = ingest_docx
                 elif file_upload.type == "text/html":
-                    # Extract plain text for vector DB and raw HTML for viewing
-                    file_text = extract_text_from_html(file_upload)
-                    file_upload.seek(0)
-                    st.session_state["html_text"] = extract_raw_html(file_upload)
-
-                if file_text:
-                    st.session_state["vector_db"] = create_vector_db({
-                        "name": file_upload.name,
-                        "text": file_text
-                    })
+                    # Keep the raw HTML for viewing; plain text is only extracted for the vector DB
+                    def read_raw_html() -> str:
+                        file_upload.seek(0)
+                        return extract_raw_html(file_upload)
+
+                    def ingest_html():
+                        file_upload.seek(0)
+                        file_text = extract_text_from_html(file_upload)
+                        if not file_text:
+                            return None
+                        return create_vector_db({"name": file_upload.name, "text": file_text, "digest": digest})
+
+                    text_lease = acquire_document_text(digest, "html", read_raw_html)
+                    st.session_state["document_text_lease"] = text_lease
+                    st.session_state["html_text"] = text_lease.value
+                    ingest = ingest_html
+
+                lease = acquire_vector_db(digest, ingest)
+                vector_db = lease.value if lease is not None else None
+                st.session_state["vector_db_lease"] = lease
+                if vector_db is not None:
+                    st.session_state["vector_db"] = vector_db
                     st.session_state["file_upload"] = file_upload
                     st.success(f"File processed: {file_upload.name}")
 
-    # Display PDF pages if available
+    # Display PDF pages if available, rendering only the visible window
     if file_upload and file_upload.type == "application/pdf":
-        with pdfplumber.open(file_upload) as pdf:
-            st.session_state["pdf_pages"] = [page.to_image().original for page in pdf.pages]
-
-    if "pdf_pages" in st.session_state and st.session_state["pdf_pages"]:
         zoom_level = col1.slider(
             "Zoom Level 🔎", 
             min_value=config["pdf"]["zoom_slider"]["min"], 
@@ -177,9 +220,7 @@ def main():
             key="zoom_slider"
         )
         with col1:
-            with st.container(height=500, border=True):
-                for page_image in st.session_state["pdf_pages"]:
-                    st.image(page_image, width=zoom_level)
+            render_pdf_window(file_upload, zoom_level)
     
     # Render DOCX content if available
     if (file_upload and 
@@ -209,6 +250,8 @@ def main():
             avatar = "🤖" if message["role"] == "assistant" else "👨🏻‍💻"
             with message_container.chat_message(message["role"], avatar=avatar):
                 st.markdown(message["content"])
+                if message.get("stats"):
+                    st.caption(message["stats"])
 
 
 
@@ -220,37 +263,32 @@ def main():
                     st.markdown(prompt)
 
                 with message_container.chat_message("assistant", avatar="🤖"):
+                    llm = get_llm(selected_model)
+
                     with st.spinner(":green[processing...]"):
-                        from langchain_ollama.chat_models import ChatOllama
-                        llm = ChatOllama(model=selected_model, device=device)
-                        
                         if st.session_state.get("vector_db") is not None:
-                            response = process_question(prompt, st.session_state["vector_db"], llm)
-                        else:
-                            user_message = HumanMessage(content=prompt)
-                            response = llm.invoke([user_message])
-                        
-                        # If the response is a string containing metadata, extract only the reply text.
-                        if isinstance(response, str):
-                            # Try to extract the content between "content='" and the next "'"
-                            match = re.search(r"content='(.*?)'", response)
-                            if match:
-                                assistant_message = match.group(1)
-                            else:
-                                assistant_message = response
-                        elif hasattr(response, "message"):
-                            assistant_message = response.message.content
-                        elif isinstance(response, dict):
-                            assistant_message = response.get("content", "")
+                            stream = stream_question(prompt, st.session_state["vector_db"], llm)
                         else:
-                            assistant_message = str(response)
-                        
-                        st.markdown(assistant_message)
-                        st.session_state["messages"].append({"role": "assistant", "content": assistant_message})
-                        
+                            stream = stream_chat(prompt, llm)
+                        # Keep the spinner up through retrieval, until the first token arrives
+                        tokens = iter(stream)
+                        first_token = next(tokens, "")
+
+                    assistant_message = st.write_stream(itertools.chain([first_token], tokens))
+                    stats = stream.stats
+                    st.caption(format_generation_stats(stats))
+                    st.session_state["messages"].append({
+                        "role": "assistant",
+                        "content": assistant_message,
+                        "stats": format_generation_stats(stats),
+                    })
+
             except Exception as e:
                 st.error(e, icon="⛔️")
                 logger.error(f"Error processing prompt: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        get_run_timings().record(time.perf_counter() - RUN_START)
\ No newline at end of file
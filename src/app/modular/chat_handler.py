@@ -1,6 +1,4 @@
 import re
-from langchain.schema import HumanMessage
-from langchain_ollama.chat_models import ChatOllama
 from logging_config import logger
 
 def extract_model_names(models_info) -> tuple:
@@ -14,18 +12,20 @@ def extract_model_names(models_info) -> tuple:
         logger.error(f"Error extracting model names: {e}")
         return tuple()
 
-def process_chat(prompt: str, vector_db, selected_model, device) -> str:
+def process_chat(prompt: str, vector_db, selected_model) -> str:
     """Process the chat prompt and return the assistant's reply."""
     try:
-        llm = ChatOllama(model=selected_model, device=device)
+        # Ollama places the model on the GPU or CPU itself
+        from pipelines import get_llm
+        llm = get_llm(selected_model)
         if vector_db is not None:
             # Process the question using the vector DB
             from src.app.question_processor import process_question
             response = process_question(prompt, vector_db, llm)
         else:
-            # Otherwise, simply call the language model
-            user_message = HumanMessage(content=prompt)
-            response = llm.invoke([user_message])
+            # Otherwise, simply call the language model, bounded by the generate budget
+            from src.app.question_processor import stream_chat
+            response = "".join(stream_chat(prompt, llm))
         
         # Extract the reply content from the response
         if isinstance(response, str):
@@ -1,15 +1,59 @@
-import pdfplumber
+import hashlib
 import streamlit as st
-from typing import List, Any
+from config import config
 from logging_config import logger
+from src.core.page_images import PageImageCache
 
-@st.cache_data
-def extract_all_pages_as_images(file_upload) -> List[Any]:
+@st.cache_resource
+def get_page_image_cache() -> PageImageCache:
     """
-    Extract all pages from a PDF file as images.
+    Return the page image cache shared by all sessions.
     """
-    logger.info(f"Extracting all pages as images from file: {file_upload.name}")
-    with pdfplumber.open(file_upload) as pdf:
-        pdf_pages = [page.to_image().original for page in pdf.pages]
-    logger.info("PDF pages extracted as images")
-    return pdf_pages
\ No newline at end of file
+    cache_config = config["pdf"]["page_cache"]
+    return PageImageCache(
+        cache_dir=cache_config["directory"],
+        max_bytes=cache_config["max_mb"] * 1024 * 1024,
+        min_age_seconds=cache_config["min_age_seconds"]
+    )
+
+def _document_info(file_upload):
+    """
+    Return (bytes, digest, page_count) for an uploaded PDF, hashing it only once per upload.
+    """
+    data = file_upload.getvalue()
+    info = st.session_state.get("pdf_info")
+    if info is None or info["file_id"] != file_upload.file_id:
+        try:
+            page_count = PageImageCache.page_count(data)
+        except Exception as e:
+            logger.error(f"Error counting pages of {file_upload.name}: {e}")
+            page_count = 0
+        info = {
+            "file_id": file_upload.file_id,
+            "digest": hashlib.sha256(data).hexdigest(),
+            "page_count": page_count,
+        }
+        st.session_state["pdf_info"] = info
+        logger.info(f"Opened PDF viewer for {file_upload.name} ({info['page_count']} pages)")
+    return data, info["digest"], info["page_count"]
+
+def render_pdf_window(file_upload, width: int):
+    """
+    Render a window of PDF pages starting at the selected page.
+
+    Only the visible pages are rasterized, at the current zoom width, and the
+    images are served from the disk cache on later reruns.
+    """
+    data, digest, page_count = _document_info(file_upload)
+    if page_count == 0:
+        st.info("This PDF has no pages that can be displayed.")
+        return
+    window = config["pdf"]["viewer_window"]
+    first_page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="pdf_page")
+    last_page = min(first_page + window - 1, page_count)
+
+    paths = get_page_image_cache().get_pages(data, digest, range(first_page, last_page + 1), width)
+    with st.container(height=500, border=True):
+        for path in paths:
+            st.image(str(path), width=width)
+    st.caption(f"Pages {first_page}–{last_page} of {page_count}")
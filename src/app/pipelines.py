@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import streamlit as st
+from typing import Optional
+from config import config
+from src.core.model_catalog import ModelCatalog
+from src.core.pipeline_registry import PipelineRegistry
+from src.core.run_timings import RunTimings
+from src.core.warmup import ModelWarmer
+
+logger = logging.getLogger(__name__)
+
+# Missing rewrite models already reported, so reruns do not repeat the warning
+_missing_rewrite_models = set()
+
+@st.cache_resource
+def get_pipeline_registry() -> PipelineRegistry:
+    """
+    Return the registry of LLM clients and RAG chains shared by all sessions.
+    """
+    return PipelineRegistry(max_entries=config["pipeline_registry"]["max_entries"])
+
+@st.cache_resource
+def get_model_warmer() -> ModelWarmer:
+    """
+    Return the warm-up manager shared by all sessions.
+    """
+    keep_alive = config["ollama"]["keep_alive"]
+    return ModelWarmer(
+        keep_alive=keep_alive.get("models") or {},
+        default_keep_alive=keep_alive["default"],
+        refresh_interval=config["ollama"]["state_refresh_seconds"]
+    )
+
+@st.cache_resource
+def get_model_catalog() -> ModelCatalog:
+    """
+    Return the cached Ollama model listings shared by all sessions.
+    """
+    return ModelCatalog(
+        ttl=config["ollama"]["model_list_ttl_seconds"],
+        loaded_ttl=config["ollama"]["loaded_list_ttl_seconds"]
+    )
+
+@st.cache_resource
+def get_run_timings() -> RunTimings:
+    """
+    Return the startup and rerun timings of this app process.
+    """
+    return RunTimings()
+
+def prompt_config_key() -> str:
+    """Digest of the settings baked into a built chain, so changing them builds a new one."""
+    settings = {
+        "prompt_templates": config["prompt_templates"],
+        "retrieval": config["retrieval"],
+        "context": config["context"],
+        "answer_cache": config["answer_cache"],
+        "lexical_index": config["lexical_index"]["enabled"],
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def get_llm(model: str):
+    """
+    Return the shared chat client for a model, created on first use.
+
+    Ollama picks the GPU or CPU itself; `get_model_catalog().processor(model)` reports which.
+    """
+    def build():
+        from langchain_ollama.chat_models import ChatOllama
+        return ChatOllama(model=model, keep_alive=get_model_warmer().keep_alive_for(model))
+    return get_pipeline_registry().get_or_create(("llm", model), build)
+
+def get_rewrite_model() -> Optional[str]:
+    """
+    Return the configured rewrite model if it is installed, or None to rewrite
+    with the selected chat model.
+    """
+    model = config["retrieval"].get("rewrite_model")
+    if not model:
+        return None
+    if not get_model_catalog().is_installed(model):
+        if model in _missing_rewrite_models:
+            return None
+        _missing_rewrite_models.add(model)
+        logger.warning(f"Rewrite model {model} is not installed (ollama pull {model}), rewriting with the chat model")
+        return None
+    return model
+
+def get_rewrite_llm():
+    """
+    Return the shared client of the small model that writes query variations,
+    or None when rewriting uses the selected chat model.
+    """
+    model = get_rewrite_model()
+    if not model:
+        return None
+
+    def build():
+        from langchain_ollama.chat_models import ChatOllama
+        return ChatOllama(
+            model=model,
+            temperature=0,
+            num_predict=config["retrieval"]["rewrite_max_tokens"],
+            keep_alive=get_model_warmer().keep_alive_for(model)
+        )
+    return get_pipeline_registry().get_or_create(("rewrite_llm", model), build)
+
+def forget_collection(collection_name: str) -> None:
+    """Drop cached chains built on a collection, e.g. after it was deleted."""
+    get_pipeline_registry().discard(lambda key: key[0] == "chain" and key[2] == collection_name)
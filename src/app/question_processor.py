@@ -1,41 +1,153 @@
-from langchain.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain.retrievers.multi_query import MultiQueryRetriever
+import time
+import streamlit as st
 from config import config
 from logging_config import logger
+from src.core.answer_cache import SemanticAnswerCache
+from src.core.budget import LatencyBudget, RequestDeadline, mark_generation_start, request_deadline, stream_within_budget
+from src.core.context import ContextPacker, budget_for_model
+from src.core.lexical_index import BM25Index
+from src.core.llm import LLMManager
+from src.core.query_cache import LRUCache
+from src.core.rag import RAGPipeline, recording_stats
+from src.core.scheduler import RequestScheduler
+from src.core.token_stream import GenerationStats, TokenStream
+from pipelines import get_pipeline_registry, get_rewrite_llm, prompt_config_key
+from vector_db import get_embeddings, get_lexical_index
 
-def process_question(question: str, vector_db, llm) -> str:
+@st.cache_resource
+def get_query_caches():
     """
-    Process a user question using the vector database and the provided GPU-enabled LLM instance.
+    Return the query-variation and query-embedding caches shared by all sessions.
     """
-    logger.info(f"Processing question: {question} using LLM instance: {llm}")
-    
-    # Create a prompt template for querying the retriever
-    QUERY_PROMPT = PromptTemplate(
-        input_variables=["question"],
-        template=config["prompt_templates"]["query_prompt"],
+    cache_config = config["query_cache"]
+    variation_cache = LRUCache(
+        max_entries=cache_config["variations"]["max_entries"],
+        ttl_seconds=cache_config["variations"]["ttl_seconds"]
     )
+    embedding_cache = LRUCache(max_entries=cache_config["embeddings"]["max_entries"])
+    return variation_cache, embedding_cache
+
+@st.cache_resource
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Return the semantic answer cache shared by all sessions.
+    """
+    return SemanticAnswerCache(
+        threshold=config["answer_cache"]["similarity_threshold"],
+        max_entries=config["answer_cache"]["max_entries"]
+    )
+
+def get_latency_budget() -> LatencyBudget:
+    """The per-stage latency budgets from config."""
+    return LatencyBudget.from_config(config["latency_budget"])
 
-    # Build the retriever with multi-query support
-    retriever = MultiQueryRetriever.from_llm(
-        vector_db.as_retriever(), 
-        llm,
-        prompt=QUERY_PROMPT
+@st.cache_resource
+def get_request_scheduler() -> RequestScheduler:
+    """
+    Return the scheduler shared by all sessions: concurrent query embeddings
+    are batched and generations share a fixed number of slots.
+    """
+    return RequestScheduler(
+        get_embeddings(),
+        max_generations=config["scheduler"]["max_generations"],
+        embed_window=config["scheduler"]["embed_window_ms"] / 1000,
+        max_embed_batch=config["scheduler"]["max_embed_batch"],
+        max_rewrites=config["scheduler"]["max_rewrites"]
     )
 
-    # Create the response prompt using a chat template
-    template = config["prompt_templates"]["response_prompt"]
-    prompt = ChatPromptTemplate.from_template(template)
+def _build_pipeline(vector_db, llm, lexical_index) -> RAGPipeline:
+    """
+    Build the RAG pipeline for a collection and model.
 
-    # Construct the chain for retrieval-augmented generation
-    chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
+    The selected model answers and a small, fast model, when configured,
+    writes the query variations; retrieval, context packing, the answer
+    cache and the latency budgets are those of `RAGPipeline`.
+    """
+    model = getattr(llm, "model", "")
+    rewrite_llm = get_rewrite_llm()
+    variation_cache, embedding_cache = get_query_caches()
+    return RAGPipeline(
+        vector_db,
+        LLMManager(
+            model_name=model,
+            rewrite_model=getattr(rewrite_llm, "model", None),
+            llm=llm,
+            rewrite_llm=rewrite_llm,
+            query_template=config["prompt_templates"]["query_prompt"],
+            rag_template=config["prompt_templates"]["response_prompt"]
+        ),
+        context_packer=ContextPacker(
+            token_budget=budget_for_model(config["context"]["token_budget"], model),
+            chars_per_token=config["context"]["chars_per_token"]
+        ),
+        k=config["retrieval"]["k"],
+        max_variations=config["retrieval"]["max_variations"],
+        variation_cache=variation_cache,
+        embedding_cache=embedding_cache,
+        embedding_model=config["embeddings"]["model"],
+        answer_cache=get_answer_cache() if config["answer_cache"]["enabled"] else None,
+        lexical_index=lexical_index,
+        retrieval_mode=config["retrieval"]["mode"],
+        scheduler=get_request_scheduler(),
+        speculative=config["retrieval"]["speculative"],
+        latency_budget=get_latency_budget()
     )
 
-    response = chain.invoke(question)
+def get_pipeline(vector_db, llm) -> RAGPipeline:
+    """
+    Return the pipeline for a model and collection, built once per (model,
+    collection, prompt config, lexical index version) and shared by all sessions.
+    """
+    collection_name = vector_db._collection.name
+    lexical_index = get_lexical_index(collection_name, vector_db)
+    lexical_version = BM25Index.version(config["lexical_index"]["directory"], collection_name) if lexical_index is not None else None
+    key = ("chain", getattr(llm, "model", ""), collection_name, prompt_config_key(), lexical_version)
+    return get_pipeline_registry().get_or_create(key, lambda: _build_pipeline(vector_db, llm, lexical_index))
+
+def process_question(question: str, vector_db, llm) -> str:
+    """
+    Process a user question using the vector database and the provided LLM instance.
+    """
+    logger.info(f"Processing question: {question} using LLM instance: {llm}")
+    stats = GenerationStats()
+    with recording_stats(stats):
+        response = get_pipeline(vector_db, llm).get_response(question)
+    variation_cache, embedding_cache = get_query_caches()
+    if stats.degradations:
+        logger.info(f"Degradations applied: {', '.join(stats.degradations)}")
     logger.info("Question processed and response generated")
-    return response
\ No newline at end of file
+    logger.info(f"Query cache stats: variations {variation_cache.stats()}, embeddings {embedding_cache.stats()}")
+    return response
+
+def stream_question(question: str, vector_db, llm) -> TokenStream:
+    """
+    Like `process_question`, but return the answer as a token stream.
+
+    Iterate the stream to receive text chunks as the model generates them;
+    its `stats` report time to first token, tokens/s, rewrite latency, the
+    number of variations used and the degradations applied afterwards.
+    """
+    logger.info(f"Streaming answer to question: {question} using LLM instance: {llm}")
+    return get_pipeline(vector_db, llm).stream(question)
+
+def stream_chat(prompt: str, llm) -> TokenStream:
+    """
+    Answer a prompt without a document, as a token stream.
+
+    The call takes a generation slot like any answer and is bounded by the
+    generate budget: a stalled model raises StageTimeout instead of hanging
+    the session, and a slow one is cut short and marked as truncated.
+    """
+    from langchain_core.messages import HumanMessage
+
+    start = time.perf_counter()
+    stats = GenerationStats()
+    deadline = RequestDeadline(get_latency_budget(), stats.degradations)
+    llm = get_request_scheduler().schedule(llm)
+
+    def chunks():
+        with request_deadline(deadline):
+            # No retrieval: the whole request counts against the generate budget
+            mark_generation_start()
+            yield from stream_within_budget(chunk.content for chunk in llm.stream([HumanMessage(content=prompt)]))
+    return TokenStream(chunks(), start=start, stats=stats)
@@ -4,38 +4,226 @@ import shutil
 import streamlit as st
 import logging
 
-from typing import Optional, Dict, Union, List
+from typing import Callable, Optional, Dict, Union, List
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import UnstructuredPDFLoader
 from langchain.schema import Document 
-from bs4 import BeautifulSoup
-from docx import Document as DocxDocument
 from config import config, PERSIST_DIRECTORY
+from pipelines import forget_collection, get_model_warmer
+from src.core.dedup import ChunkDeduplicator
+from src.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+from src.core.embedding_executor import BatchedEmbeddings
+from src.core.lexical_index import BM25Index
+from src.core.pdf_backends import PDFTextExtractor
+from src.core.numpy_store import NumpyVectorStore
+from src.core.resource_cache import Lease, SharedResourceCache
+from src.core.manifest import DocumentManifest, collection_name_for, compute_document_digest
+from src.core.streaming import iter_batches, iter_chunks, iter_pdf_pages, prefetch
+from src.core.warmup import KeepAliveOllamaEmbeddings
 
 logger = logging.getLogger(__name__)
 
+@st.cache_resource
+def get_embeddings():
+    """
+    Build the embedder shared by all sessions: batched, concurrency-limited
+    Ollama requests, backed by the on-disk cache when enabled.
+    """
+    model = config["embeddings"]["model"]
+    embeddings = BatchedEmbeddings(
+        KeepAliveOllamaEmbeddings(model=model, keep_alive=get_model_warmer().keep_alive_for(model)),
+        batch_size=config["embeddings"]["batch_size"],
+        max_in_flight=config["embeddings"]["max_in_flight"],
+        max_retries=config["embeddings"]["max_retries"],
+        retry_base_delay=config["embeddings"]["retry_base_delay"]
+    )
+    cache_config = config["embeddings"].get("cache", {})
+    if cache_config.get("enabled", False):
+        cache = EmbeddingCache(
+            cache_dir=cache_config["directory"],
+            max_entries=cache_config["max_entries"]
+        )
+        embeddings = CachedEmbeddings(embeddings, cache, model_name=model)
+    return embeddings
+
+@st.cache_resource
+def get_resource_cache() -> SharedResourceCache:
+    """
+    Return the reference-counted cache of collections and extracted texts
+    shared by all sessions; resources no session holds are evicted when idle.
+    """
+    return SharedResourceCache(
+        idle_seconds=config["shared_resources"]["idle_seconds"],
+        sweep_interval=config["shared_resources"]["sweep_interval_seconds"]
+    )
+
+@st.cache_resource
+def get_chroma_client():
+    """
+    Return the one persistent Chroma client shared by all collections and sessions.
+    """
+    import chromadb
+    return chromadb.PersistentClient(path=PERSIST_DIRECTORY)
+
+def log_embedding_stats(embeddings) -> None:
+    """Log cache and throughput counters of the shared embedder."""
+    if isinstance(embeddings, CachedEmbeddings):
+        logger.info(f"Embedding cache stats: {embeddings.cache.stats()}")
+        embeddings = embeddings.embeddings
+    if isinstance(embeddings, BatchedEmbeddings):
+        logger.info(f"Embedding throughput stats: {embeddings.stats()}")
+
 def extract_text_from_docx(file) -> str:
     """Extract text from a DOCX file."""
+    # Imported on first use to keep it out of app startup
+    from docx import Document as DocxDocument
     doc = DocxDocument(file)
     return "\n".join([para.text for para in doc.paragraphs])
 
 def extract_text_from_html(file) -> str:
     """Extract text from an HTML file."""
     content = file.read().decode("utf-8")
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(content, "html.parser")
     return soup.get_text()
 
+def get_pdf_extractor() -> PDFTextExtractor:
+    """Build the PDF text extractor selected in config."""
+    return PDFTextExtractor(
+        backend=config["pdf"]["text_backend"],
+        fallback=config["pdf"]["fallback_backend"],
+        min_chars=config["pdf"]["min_chars_per_page"]
+    )
+
+def get_deduplicator() -> Optional[ChunkDeduplicator]:
+    """Build a fresh near-duplicate filter for one document, or None if disabled."""
+    dedup_config = config["dedup"]
+    if not dedup_config["enabled"]:
+        return None
+    return ChunkDeduplicator(
+        threshold=dedup_config["threshold"],
+        num_perm=dedup_config["num_perm"],
+        bands=dedup_config["bands"],
+        shingle_size=dedup_config["shingle_size"]
+    )
+
+@st.cache_resource
+def get_manifest() -> DocumentManifest:
+    """Return the manifest of documents persisted under PERSIST_DIRECTORY."""
+    return DocumentManifest(PERSIST_DIRECTORY)
+
+@st.cache_resource(max_entries=8)
+def load_lexical_index(collection_name: str, version: int) -> Optional[BM25Index]:
+    """Load a collection's persisted BM25 index; `version` keys the cache so every save is picked up."""
+    return BM25Index.load(config["lexical_index"]["directory"], collection_name)
+
+def get_lexical_index(collection_name: str, vector_db: Chroma) -> Optional[BM25Index]:
+    """
+    Return the BM25 index of a collection, or None if lexical search is disabled.
+
+    Collections ingested before the index existed are indexed from the chunks
+    stored in Chroma, without re-embedding anything.
+    """
+    if not config["lexical_index"]["enabled"]:
+        return None
+    directory = config["lexical_index"]["directory"]
+    version = BM25Index.version(directory, collection_name)
+    if version is None:
+        logger.info(f"Building missing lexical index for {collection_name}")
+        stored = vector_db.get(include=["documents", "metadatas"])
+        lexical_index = BM25Index()
+        lexical_index.add_documents(
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(stored["documents"], stored["metadatas"])
+        )
+        lexical_index.save(directory, collection_name)
+        version = BM25Index.version(directory, collection_name)
+    return load_lexical_index(collection_name, version)
+
+def save_lexical_index(collection_name: str, chunks: List[Document]) -> None:
+    """Index chunks for BM25 search and persist them next to the vectors."""
+    if not config["lexical_index"]["enabled"]:
+        return
+    lexical_index = BM25Index()
+    lexical_index.add_documents(chunks)
+    lexical_index.save(config["lexical_index"]["directory"], collection_name)
+
+def open_collection(collection_name: str, embeddings) -> Union[Chroma, NumpyVectorStore]:
+    """Open (or create empty) a collection with the backend selected in config."""
+    if config["vector_db"]["backend"] == "numpy":
+        return NumpyVectorStore(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=PERSIST_DIRECTORY,
+            quantization=config["vector_db"]["quantization"]
+        )
+    return Chroma(
+        client=get_chroma_client(),
+        collection_name=collection_name,
+        embedding_function=embeddings
+    )
+
+def document_digest(data: bytes) -> str:
+    """Digest of the file bytes together with the chunking and embedding settings."""
+    return compute_document_digest(
+        data,
+        chunk_size=config["text_splitter"]["chunk_size"],
+        chunk_overlap=config["text_splitter"]["chunk_overlap"],
+        embedding_model=config["embeddings"]["model"]
+    )
+
+def open_vector_db(digest: str) -> Optional[Chroma]:
+    """
+    Open the persisted collection for a document digest, or return None if it was never ingested.
+    """
+    manifest = get_manifest()
+    entry = manifest.get(digest)
+    if entry is None:
+        return None
+    try:
+        vector_db = open_collection(entry["collection_name"], get_embeddings())
+        if vector_db._collection.count() == 0:
+            logger.warning(f"Persisted collection {entry['collection_name']} is empty, re-ingesting")
+            manifest.remove(digest)
+            return None
+    except Exception as e:
+        logger.error(f"Error opening persisted collection {entry['collection_name']}: {e}")
+        manifest.remove(digest)
+        return None
+    logger.info(f"Opened persisted collection {entry['collection_name']} for {entry['file_name']}")
+    return vector_db
+
+def acquire_vector_db(digest: str, ingest: Optional[Callable[[], Optional[Chroma]]] = None) -> Optional[Lease]:
+    """
+    Lease the collection of a document, shared by every session viewing it.
+
+    The collection is opened from disk if the document was ingested before,
+    otherwise built with `ingest`. Sessions uploading the same document at
+    the same time wait for a single ingestion. Returns None if neither works.
+    """
+    return get_resource_cache().acquire(
+        ("collection", collection_name_for(digest)),
+        lambda: open_vector_db(digest) or (ingest() if ingest is not None else None)
+    )
+
+def acquire_document_text(digest: str, kind: str, extract: Callable[[], str]) -> Lease:
+    """Lease text extracted from a document (`kind` tells extractions apart), shared by every session viewing it."""
+    return get_resource_cache().acquire(("text", kind, digest), extract)
+
 def create_vector_db(file_upload: Union[st.runtime.uploaded_file_manager.UploadedFile, Dict[str, str]]) -> Optional[Chroma]:
     """
     Create a vector database from an uploaded file (PDF, DOCX, HTML).
+
+    Raw text input may carry a precomputed "digest" of the original file bytes;
+    otherwise the digest of the text itself is used.
     """
     if isinstance(file_upload, dict):  # Handling raw text input
         file_name = file_upload["name"]
         file_text = file_upload["text"]
+        digest = file_upload.get("digest") or document_digest(file_text.encode("utf-8"))
     elif isinstance(file_upload, st.runtime.uploaded_file_manager.UploadedFile):  # Handling uploaded file
         file_name = file_upload.name
+        digest = document_digest(file_upload.getvalue())
         logger.info(f"Creating vector DB from file upload: {file_name}")
 
         temp_dir = tempfile.mkdtemp()
@@ -49,9 +237,7 @@ def create_vector_db(file_upload: Union[st.runtime.uploaded_file_manager.Uploade
                 logger.info(f"File saved to temporary path: {path}")
 
             if file_type == "application/pdf":
-                loader = UnstructuredPDFLoader(path)
-                data = loader.load()
-                file_text = "\n".join([doc.page_content for doc in data])
+                file_text = "\n".join(text for _, text in get_pdf_extractor().iter_pages(path))
             elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
                 file_text = extract_text_from_docx(file_upload)
             elif file_type == "text/html":
@@ -82,30 +268,115 @@ def create_vector_db(file_upload: Union[st.runtime.uploaded_file_manager.Uploade
     chunks = text_splitter.split_documents(documents)
     logger.info("Document split into chunks")
 
-    # Use embedding model from config
-    embeddings = OllamaEmbeddings(model=config["embeddings"]["model"])
-    vector_db = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=PERSIST_DIRECTORY,
-        collection_name=f"file_{hash(file_name)}"
-    )
+    # Drop repeated boilerplate before it is embedded
+    deduplicator = get_deduplicator()
+    if deduplicator is not None:
+        chunks = deduplicator.deduplicate(chunks)
+        logger.info(f"Deduplication stats: {deduplicator.stats()}")
+
+    # Use embedding model from config, served from the embedding cache when possible
+    embeddings = get_embeddings()
+    collection_name = collection_name_for(digest)
+    # Drop leftovers of an interrupted ingestion so chunks are not added twice
+    open_collection(collection_name, embeddings).delete_collection()
+    vector_db = open_collection(collection_name, embeddings)
+    vector_db.add_documents(chunks)
+    save_lexical_index(collection_name, chunks)
+    get_manifest().record(digest, collection_name, file_name, len(chunks))
     logger.info("Vector DB created with persistent storage")
+    log_embedding_stats(embeddings)
 
     return vector_db
 
+def create_vector_db_from_pdf(
+    file_upload: st.runtime.uploaded_file_manager.UploadedFile,
+    digest: str
+) -> Optional[Chroma]:
+    """
+    Stream a PDF into a new collection page by page.
+
+    Pages are parsed and chunked in a background thread while earlier batches
+    are embedded, so peak memory is bounded by a few batches of chunks rather
+    than the full text of the document.
+    """
+    file_name = file_upload.name
+    logger.info(f"Streaming PDF into vector DB: {file_name}")
+    embeddings = get_embeddings()
+    collection_name = collection_name_for(digest)
+    streaming_config = config["streaming"]
+
+    try:
+        # Drop leftovers of an interrupted ingestion so chunks are not added twice
+        open_collection(collection_name, embeddings).delete_collection()
+        vector_db = open_collection(collection_name, embeddings)
+
+        file_upload.seek(0)
+        chunks = iter_chunks(
+            iter_pdf_pages(file_upload, get_pdf_extractor()),
+            chunk_size=config["text_splitter"]["chunk_size"],
+            chunk_overlap=config["text_splitter"]["chunk_overlap"],
+            source=file_name
+        )
+        deduplicator = get_deduplicator()
+        if deduplicator is not None:
+            chunks = deduplicator.iter_unique(chunks)
+        chunk_count = 0
+        lexical_index = BM25Index() if config["lexical_index"]["enabled"] else None
+        for batch in prefetch(iter_batches(chunks, streaming_config["batch_size"]), streaming_config["prefetch_batches"]):
+            vector_db.add_documents(batch)
+            if lexical_index is not None:
+                lexical_index.add_documents(batch)
+            chunk_count += len(batch)
+            logger.info(f"Embedded {chunk_count} chunks from {file_name}")
+    except Exception as e:
+        logger.error(f"Error streaming PDF {file_name}: {e}")
+        st.error(f"Error processing file: {file_name}")
+        return None
+
+    if chunk_count == 0:
+        st.error(f"No text could be extracted from {file_name}")
+        return None
+
+    if lexical_index is not None:
+        lexical_index.save(config["lexical_index"]["directory"], collection_name)
+    get_manifest().record(digest, collection_name, file_name, chunk_count)
+    logger.info("Vector DB created with persistent storage")
+    if deduplicator is not None:
+        logger.info(f"Deduplication stats: {deduplicator.stats()}")
+    log_embedding_stats(embeddings)
+    return vector_db
+
+def destroy_collection(vector_db: Chroma) -> None:
+    """Delete a collection with its manifest entry, BM25 index and cached chains."""
+    collection_name = vector_db._collection.name
+    get_manifest().remove_collection(collection_name)
+    BM25Index.remove(config["lexical_index"]["directory"], collection_name)
+    load_lexical_index.clear()
+    forget_collection(collection_name)
+    vector_db.delete_collection()
+
 def delete_vector_db(vector_db: Optional[Chroma]) -> None:
     """
-    Delete the vector database and clear related session state.
+    Close this session's document and clear related session state.
+
+    The collection itself is only deleted when no other session still holds it.
     """
     logger.info("Deleting vector DB")
     if vector_db is not None:
         try:
-            vector_db.delete_collection()
-            st.session_state.pop("pdf_pages", None)
+            text_lease = st.session_state.pop("document_text_lease", None)
+            if text_lease is not None:
+                text_lease.release()
+            lease = st.session_state.pop("vector_db_lease", None)
+            if lease is not None and get_resource_cache().release_or_destroy(lease, destroy_collection):
+                st.success("Collection and temporary files deleted successfully.")
+                logger.info("Vector DB deleted")
+            else:
+                st.success("Document closed; other sessions still use its collection.")
+                logger.info("Vector DB kept for other sessions")
+            st.session_state.pop("pdf_info", None)
             st.session_state.pop("file_upload", None)
             st.session_state.pop("vector_db", None)
-            st.success("Collection and temporary files deleted successfully.")
             logger.info("Vector DB and related session state cleared")
             st.rerun()
         except Exception as e:
@@ -113,4 +384,4 @@ def delete_vector_db(vector_db: Optional[Chroma]) -> None:
             logger.error(f"Error deleting collection: {e}")
     else:
         st.error("No vector database found to delete.")
-        logger.warning("Attempted to delete vector DB, but none was found")
\ No newline at end of file
+        logger.warning("Attempted to delete vector DB, but none was found")
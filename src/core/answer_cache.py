@@ -0,0 +1,122 @@
+"""Semantic answer cache scoped to a collection version and model."""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .manifest import DocumentManifest, collection_name_for
+
+logger = logging.getLogger(__name__)
+
+def collection_version(vector_db: Any, manifest: Optional[DocumentManifest] = None) -> str:
+    """
+    Return a string that changes whenever the collection's content changes.
+
+    Collections named after a document digest hold that document only, so
+    their name and chunk count identify the content. Any other collection
+    can be re-ingested under the same name, possibly with the same number of
+    chunks, so its version is the counter the manifest bumps on every ingest
+    and delete. Without a manifest, i.e. for an in-memory store, it is a
+    digest of the stored chunk ids, which are generated anew for every chunk added.
+    """
+    if hasattr(vector_db, "collection_version"):
+        return vector_db.collection_version()
+    collection = getattr(vector_db, "_collection", None)
+    if collection is None:
+        return f"object-{id(vector_db)}"
+    if collection.name.startswith(collection_name_for("")):
+        return f"{collection.name}:{collection.count()}"
+    if manifest is not None:
+        return f"{collection.name}:v{manifest.collection_version(collection.name)}"
+    hasher = hashlib.sha256()
+    for chunk_id in sorted(collection.get(include=[])["ids"]):
+        hasher.update(f"{chunk_id}\0".encode("utf-8"))
+    return f"{collection.name}:{hasher.hexdigest()}"
+
+class _Scope:
+    """Cached answers for one (collection version, model) pair."""
+
+    def __init__(self):
+        self.vectors: List[np.ndarray] = []
+        self.answers: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+
+class SemanticAnswerCache:
+    """
+    Returns a cached answer when a new question's embedding is within a cosine
+    similarity threshold of a previously answered one, for the same collection
+    version and model. Entries of other versions are never matched, so changing
+    a collection invalidates its answers automatically.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256, max_scopes: int = 16):
+        """
+        Parameters:
+            threshold (float): Minimum cosine similarity for a cache hit.
+            max_entries (int): Maximum cached answers per collection version and model.
+            max_scopes (int): Maximum number of (collection version, model) pairs kept.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self._scopes: "OrderedDict[Tuple[str, str], _Scope]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, question_vector: Sequence[float], version: str, model: str) -> Optional[str]:
+        """Return the answer of the most similar cached question, if similar enough."""
+        with self._lock:
+            scope = self._scopes.get((version, model))
+            if scope is None or not scope.answers:
+                self.misses += 1
+                return None
+            self._scopes.move_to_end((version, model))
+            if scope.matrix is None:
+                scope.matrix = np.vstack(scope.vectors)
+            similarities = scope.matrix @ self._normalize(question_vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            logger.info(f"Semantic answer cache hit (similarity {similarities[best]:.3f})")
+            return scope.answers[best]
+
+    def store(self, question_vector: Sequence[float], answer: str, version: str, model: str) -> None:
+        """Cache an answer for a question embedding."""
+        with self._lock:
+            scope = self._scopes.setdefault((version, model), _Scope())
+            self._scopes.move_to_end((version, model))
+            scope.vectors.append(self._normalize(question_vector))
+            scope.answers.append(answer)
+            if len(scope.answers) > self.max_entries:
+                del scope.vectors[0]
+                del scope.answers[0]
+            scope.matrix = None
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+
+    def invalidate(self, version_prefix: str = "") -> None:
+        """Drop cached answers of versions starting with the given prefix (all by default)."""
+        with self._lock:
+            for key in [key for key in self._scopes if key[0].startswith(version_prefix)]:
+                del self._scopes[key]
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the number of cached answers."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(scope.answers) for scope in self._scopes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
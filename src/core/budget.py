@@ -0,0 +1,228 @@
+"""Per-request latency budgets for the RAG pipeline stages, and the degradations applied when one runs out."""
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("rewrite", "embed", "retrieve", "generate")
+
+# Degradations reported with a response
+REWRITE_SKIPPED = "rewrite_skipped"
+FEWER_CHUNKS = "fewer_chunks"
+LEXICAL_ONLY = "lexical_only"
+ANSWER_TRUNCATED = "answer_truncated"
+
+# How often a stream waiting for retrieval checks whether generation has started
+_POLL_SECONDS = 0.05
+_DONE = object()
+
+class StageTimeout(TimeoutError):
+    """A stage ran out of budget and no cheaper path was left."""
+
+    def __init__(self, stage: str, budget: float):
+        super().__init__(f"The {stage} stage exceeded its {budget:.2f}s budget")
+        self.stage = stage
+        self.budget = budget
+
+@dataclass(frozen=True)
+class LatencyBudget:
+    """
+    Seconds allowed per stage; None means no limit.
+
+    `rewrite` bounds the wait for query variations, `embed` and `retrieve`
+    each embedding call and each round of vector searches, and `generate`
+    the answer from the end of retrieval to the last token.
+    """
+
+    rewrite: Optional[float] = None
+    embed: Optional[float] = None
+    retrieve: Optional[float] = None
+    generate: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "LatencyBudget":
+        """Build from the `latency_budget` config section (`<stage>_ms` keys)."""
+        if not config.get("enabled", True):
+            return cls()
+        return cls(**{
+            stage: config[f"{stage}_ms"] / 1000 if config.get(f"{stage}_ms") is not None else None
+            for stage in STAGES
+        })
+
+class RequestDeadline:
+    """Tracks one request against a `LatencyBudget` and records the degradations applied to it."""
+
+    def __init__(self, budget: LatencyBudget, degradations: Optional[List[str]] = None):
+        """
+        Parameters:
+            budget (LatencyBudget): Stage budgets.
+            degradations (Optional[List[str]]): List to record degradations in, e.g. a response's stats.
+        """
+        self.budget = budget
+        self.degradations = degradations if degradations is not None else []
+        self.generation_started: Optional[float] = None
+
+    def timeout(self, stage: str) -> Optional[float]:
+        return getattr(self.budget, stage)
+
+    def degrade(self, degradation: str, reason: str) -> None:
+        """Record a degradation once per request."""
+        logger.warning(f"Degrading request ({degradation}): {reason}")
+        if degradation not in self.degradations:
+            self.degradations.append(degradation)
+
+    def start_generation(self) -> None:
+        self.generation_started = time.monotonic()
+
+    def generation_remaining(self) -> Optional[float]:
+        """Seconds left for generation, or None before it started or without a generate budget."""
+        if self.budget.generate is None or self.generation_started is None:
+            return None
+        return max(0.0, self.generation_started + self.budget.generate - time.monotonic())
+
+_deadline: contextvars.ContextVar[Optional[RequestDeadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+@contextmanager
+def request_deadline(deadline: RequestDeadline) -> Iterator[RequestDeadline]:
+    """Apply `deadline` to the stages run by the enclosed request, including its worker threads."""
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+def current_deadline() -> Optional[RequestDeadline]:
+    return _deadline.get()
+
+def stage_timeout(stage: str) -> Optional[float]:
+    """The current request's budget for a stage, or None."""
+    deadline = _deadline.get()
+    return deadline.timeout(stage) if deadline is not None else None
+
+def degrade(degradation: str, reason: str) -> None:
+    """Record a degradation on the current request; outside a request it is only logged."""
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.degrade(degradation, reason)
+    else:
+        logger.warning(f"Degrading request ({degradation}): {reason}")
+
+def mark_generation_start() -> None:
+    """Start the current request's generate budget; called once retrieval is done."""
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.start_generation()
+
+def run_with_timeout(fn: Callable[..., Any], timeout: Optional[float], *args: Any) -> Any:
+    """
+    Call `fn` in a worker thread and wait at most `timeout` seconds.
+
+    Raises concurrent.futures.TimeoutError when the call takes longer; the
+    call itself cannot be interrupted and finishes in the background. With no
+    timeout, `fn` runs in the calling thread.
+    """
+    if timeout is None:
+        return fn(*args)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stage")
+    future = executor.submit(contextvars.copy_context().run, fn, *args)
+    executor.shutdown(wait=False)
+    return future.result(timeout=timeout)
+
+def _truncate(deadline: RequestDeadline, chunks_seen: int) -> None:
+    if chunks_seen == 0:
+        # Nothing to degrade to: the model did not answer in time
+        raise StageTimeout("generate", deadline.budget.generate)
+    deadline.degrade(ANSWER_TRUNCATED, f"generation exceeded its {deadline.budget.generate:.2f}s budget")
+
+def stream_within_budget(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Yield chunks until the current request's generate budget runs out.
+
+    The answer is then cut short and marked as truncated; if not a single
+    chunk arrived in time, StageTimeout is raised. The chunks are produced
+    in a worker thread, so a stalled model cannot block past the budget.
+    """
+    deadline = _deadline.get()
+    if deadline is None or deadline.budget.generate is None:
+        yield from chunks
+        return
+    items: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+
+    def pump() -> None:
+        try:
+            for chunk in chunks:
+                items.put((chunk, None))
+                if stop.is_set():
+                    return
+            items.put((_DONE, None))
+        except Exception as e:
+            items.put((None, e))
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(pump,), name="generate", daemon=True).start()
+    seen = 0
+    try:
+        while True:
+            remaining = deadline.generation_remaining()
+            try:
+                chunk, error = items.get(timeout=_POLL_SECONDS if remaining is None else remaining)
+            except queue.Empty:
+                if remaining is None:
+                    continue
+                _truncate(deadline, seen)
+                return
+            if error is not None:
+                raise error
+            if chunk is _DONE:
+                return
+            seen += 1
+            yield chunk
+    finally:
+        stop.set()
+
+async def astream_within_budget(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Async `stream_within_budget`; the chunks are produced by a separate task."""
+    deadline = _deadline.get()
+    if deadline is None or deadline.budget.generate is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    items: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                await items.put((chunk, None))
+            await items.put((_DONE, None))
+        except Exception as e:
+            await items.put((None, e))
+
+    producer = asyncio.ensure_future(pump())
+    seen = 0
+    try:
+        while True:
+            remaining = deadline.generation_remaining()
+            try:
+                chunk, error = await asyncio.wait_for(items.get(), _POLL_SECONDS if remaining is None else remaining)
+            except asyncio.TimeoutError:
+                if remaining is None:
+                    continue
+                _truncate(deadline, seen)
+                return
+            if error is not None:
+                raise error
+            if chunk is _DONE:
+                return
+            seen += 1
+            yield chunk
+    finally:
+        producer.cancel()
@@ -0,0 +1,120 @@
+"""Token-budgeted packing of retrieved chunks into the RAG prompt context."""
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Sequence
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n|\n(?=\s*(?:[-*•]|\d+[.)])\s)")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or that the this to was what when where "
+    "which who why with you your".split()
+)
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """Cheap token estimate that avoids loading a model-specific tokenizer."""
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+def budget_for_model(budgets: Dict[str, int], model: str) -> int:
+    """Return the token budget configured for a model, falling back to "default"."""
+    return budgets.get(model, budgets["default"])
+
+def _terms(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+class ContextPacker:
+    """
+    Fits retrieved chunks into a token budget: duplicates are removed, chunks
+    are ranked by relevance to the question, and each chunk is trimmed to its
+    most relevant sentences until the budget is used up.
+    """
+
+    def __init__(self, token_budget: int = 3000, chars_per_token: float = 4.0, separator: str = "\n\n"):
+        """
+        Parameters:
+            token_budget (int): Maximum estimated tokens of packed context.
+            chars_per_token (float): Characters per token used for estimates.
+            separator (str): Text placed between packed chunks.
+        """
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.separator = separator
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def _tokens(self, text: str) -> int:
+        return estimate_tokens(text, self.chars_per_token)
+
+    def pack(self, question: str, documents: Sequence[Document]) -> str:
+        """Return the packed context string for a question and its retrieved chunks."""
+        unique: Dict[str, Document] = {}
+        for doc in documents:
+            unique.setdefault(" ".join(doc.page_content.split()), doc)
+        chunks = list(unique.values())
+        tokens_in = sum(self._tokens(doc.page_content) for doc in documents)
+
+        query_terms = set(_terms(question))
+        doc_terms = [Counter(_terms(doc.page_content)) for doc in chunks]
+        idf = {
+            term: math.log(1 + len(chunks) / (1 + sum(1 for terms in doc_terms if term in terms)))
+            for term in query_terms
+        }
+
+        def score(terms: Counter) -> float:
+            return sum(idf[t] * (1 + math.log(terms[t])) for t in query_terms if terms[t])
+
+        # Rank chunks by lexical relevance, keeping retrieval order as the tie-breaker
+        ranked = sorted(range(len(chunks)), key=lambda i: (-score(doc_terms[i]), i))
+
+        # Score every sentence and greedily fill the budget with the best ones
+        sentences = []
+        for rank, index in enumerate(ranked):
+            parts = [p.strip() for p in _SENTENCE_RE.split(chunks[index].page_content) if p and p.strip()]
+            for position, sentence in enumerate(parts):
+                relevance = score(Counter(_terms(sentence)))
+                sentences.append((-relevance, rank, position, sentence))
+        sentences.sort()
+
+        budget = self.token_budget
+        selected: Dict[int, List] = {}
+        for _, rank, position, sentence in sentences:
+            cost = self._tokens(sentence) + 1
+            if cost > budget:
+                continue
+            selected.setdefault(rank, []).append((position, sentence))
+            budget -= cost
+
+        packed = self.separator.join(
+            " ".join(sentence for _, sentence in sorted(selected[rank]))
+            for rank in sorted(selected)
+        )
+        if not packed and chunks:
+            # No single sentence fits; fall back to the head of the best chunk
+            packed = chunks[ranked[0]].page_content[:int(self.token_budget * self.chars_per_token)]
+        tokens_out = self._tokens(packed)
+        with self._lock:
+            self.requests += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+        logger.info(
+            f"Packed {len(documents)} chunks ({len(chunks)} unique) from {tokens_in} to {tokens_out} tokens, "
+            f"saved {tokens_in - tokens_out} tokens"
+        )
+        return packed
+
+    def stats(self) -> Dict[str, int]:
+        """Return cumulative token counts before and after packing."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": self.tokens_in - self.tokens_out,
+            }
@@ -0,0 +1,92 @@
+"""Near-duplicate chunk elimination with MinHash signatures and LSH banding."""
+import logging
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+import mmh3
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+class ChunkDeduplicator:
+    """
+    Drops chunks whose estimated Jaccard similarity to an earlier chunk is at
+    least `threshold`, e.g. repeated headers, footers, disclaimers and tables.
+
+    The first occurrence is kept. Only the MinHash signatures of kept chunks
+    are remembered, not the chunks themselves, so chunks can stream through
+    to embedding without the document accumulating in memory.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, bands: int = 32, shingle_size: int = 5, seed: int = 1):
+        """
+        Parameters:
+            threshold (float): Minimum estimated Jaccard similarity for two chunks to be duplicates.
+            num_perm (int): Number of MinHash permutations; must be divisible by `bands`.
+            bands (int): Number of LSH bands used to find candidate pairs.
+            shingle_size (int): Number of consecutive words per shingle.
+            seed (int): Seed of the permutation coefficients.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all previously seen chunks and counters."""
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._signatures: List[np.ndarray] = []
+        self.seen = 0
+        self.dropped = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a text's word shingles."""
+        words = _WORD_RE.findall(text.lower())
+        k = self.shingle_size
+        shingles = {" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))}
+        hashes = np.fromiter((mmh3.hash(s, signed=False) % _PRIME for s in shingles), dtype=np.uint64, count=len(shingles))
+        # Values are below 2**31, so uint32 halves the signatures kept per chunk
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def iter_unique(self, chunks: Iterable[Document]) -> Iterator[Document]:
+        """
+        Yield chunks that are not near-duplicates of a previously yielded one.
+
+        The index persists across calls until `reset()`, so one instance can
+        deduplicate across all files of an ingestion run.
+        """
+        buckets, signatures = self._buckets, self._signatures
+        for chunk in chunks:
+            self.seen += 1
+            signature = self.signature(chunk.page_content)
+            band_keys = [
+                (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)
+            ]
+            candidates = {index for key in band_keys for index in buckets.get(key, ())}
+            if any(np.mean(signatures[i] == signature) >= self.threshold for i in sorted(candidates)):
+                self.dropped += 1
+                continue
+            for key in band_keys:
+                buckets.setdefault(key, []).append(len(signatures))
+            signatures.append(signature)
+            yield chunk
+        logger.info(f"Deduplication kept {self.seen - self.dropped} of {self.seen} chunks so far, saved {self.dropped} embeddings")
+
+    def deduplicate(self, chunks: Iterable[Document]) -> List[Document]:
+        """Return the chunks with near-duplicates removed."""
+        return list(self.iter_unique(chunks))
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many chunks were seen and how many embeddings were saved."""
+        return {"seen": self.seen, "kept": self.seen - self.dropped, "embeddings_saved": self.dropped}
@@ -1,10 +1,12 @@
 import logging
 from pathlib import Path
-from typing import List, Dict
-from langchain_community.document_loaders import UnstructuredPDFLoader
+from typing import List, Dict, Iterator, Optional
+from langchain.schema import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import docx  
 from bs4 import BeautifulSoup
+from .pdf_backends import PDFTextExtractor
+from .streaming import iter_chunks, iter_pdf_pages
 
 logger = logging.getLogger(__name__)
 
@@ -49,24 +51,48 @@ class HTMLLoader:
 class DocumentProcessor:
     """Handles document loading and processing for multiple file types."""
     
-    def __init__(self, chunk_size: int = 7500, chunk_overlap: int = 100):
+    def __init__(
+        self,
+        chunk_size: int = 7500,
+        chunk_overlap: int = 100,
+        pdf_backend: str = "pypdfium2",
+        pdf_fallback: Optional[str] = "unstructured"
+    ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.pdf_backend = pdf_backend
+        self.pdf_fallback = pdf_fallback
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
         )
     
+    def pdf_extractor(self) -> PDFTextExtractor:
+        """Create a PDF text extractor for the configured backends."""
+        return PDFTextExtractor(backend=self.pdf_backend, fallback=self.pdf_fallback)
+    
     def load_pdf(self, file_path: Path) -> List:
-        """Load a PDF document."""
+        """Load a PDF document as one Document per page."""
         try:
-            logger.info(f"Loading PDF from {file_path}")
-            loader = UnstructuredPDFLoader(str(file_path))
-            return loader.load()
+            logger.info(f"Loading PDF from {file_path} with {self.pdf_backend}")
+            return [
+                Document(page_content=text, metadata={"source": str(file_path), "page": page_number})
+                for page_number, text in self.pdf_extractor().iter_pages(str(file_path))
+            ]
         except Exception as e:
             logger.error(f"Error loading PDF: {e}")
             raise
     
+    def iter_pdf_chunks(self, file_path: Path) -> Iterator:
+        """Stream a PDF page by page, yielding chunks while later pages are still unparsed."""
+        logger.info(f"Streaming PDF from {file_path}")
+        return iter_chunks(
+            iter_pdf_pages(str(file_path), self.pdf_extractor()),
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            source=str(file_path)
+        )
+    
     def load_word(self, file_path: Path) -> List:
         """Load a Word (.docx) document."""
         try:
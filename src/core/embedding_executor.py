@@ -0,0 +1,126 @@
+"""Batched, concurrency-limited embedding requests with retry and throughput metrics."""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that splits large inputs into fixed-size batches and
+    sends at most `max_in_flight` of them to the backend at once.
+
+    The worker pool is shared by every caller of this instance, so concurrent
+    uploads queue behind each other instead of overloading a local Ollama.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 32,
+        max_in_flight: int = 2,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0
+    ):
+        """
+        Parameters:
+            embeddings (Embeddings): The backend embedder, e.g. OllamaEmbeddings.
+            batch_size (int): Number of texts per embedding request.
+            max_in_flight (int): Maximum number of concurrent requests.
+            max_retries (int): Retries per batch before the error is raised.
+            retry_base_delay (float): Base delay in seconds for exponential backoff.
+            retry_max_delay (float): Upper bound for a single backoff delay.
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self._chunks = 0
+        self._batches = 0
+        self._retries = 0
+        # Busy time is the union of concurrent calls, so overlapping callers are not counted twice
+        self._seconds = 0.0
+        self._active = 0
+        self._busy_since = 0.0
+
+    def _with_retry(self, func, *args):
+        """Call `func`, retrying with exponential backoff and full jitter."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Embedding request failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+                logger.warning(f"Embedding request failed ({e}), retrying in {delay:.2f}s")
+                with self._lock:
+                    self._retries += 1
+                time.sleep(delay)
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        vectors = self._with_retry(self.embeddings.embed_documents, batch)
+        with self._lock:
+            self._batches += 1
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in batches, keeping at most `max_in_flight` requests running."""
+        if not texts:
+            return []
+        start = time.perf_counter()
+        with self._lock:
+            if self._active == 0:
+                self._busy_since = start
+            self._active += 1
+        try:
+            batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            vectors: List[List[float]] = []
+            for batch_vectors in self._executor.map(self._embed_batch, batches):
+                vectors.extend(batch_vectors)
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    self._seconds += end - self._busy_since
+        elapsed = end - start
+        with self._lock:
+            self._chunks += len(texts)
+        logger.info(
+            f"Embedded {len(texts)} chunks in {len(batches)} batches "
+            f"({len(texts) / elapsed if elapsed else 0.0:.1f} chunks/s)"
+        )
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query text with retry."""
+        return self._with_retry(self.embeddings.embed_query, text)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return cumulative throughput counters.
+
+        `seconds` is the time at least one call was embedding, so
+        `chunks_per_second` stays accurate when several uploads embed at once.
+        """
+        with self._lock:
+            seconds = self._seconds
+            if self._active:
+                seconds += time.perf_counter() - self._busy_since
+            return {
+                "chunks": self._chunks,
+                "batches": self._batches,
+                "retries": self._retries,
+                "seconds": seconds,
+                "chunks_per_second": self._chunks / seconds if seconds else 0.0,
+            }
@@ -1,38 +1,159 @@
 """Vector embeddings and database functionality."""
 import logging
-from typing import List
-from langchain_ollama import OllamaEmbeddings
+import threading
+from typing import Any, List, Optional, Union
 from langchain_community.vectorstores import Chroma
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
+from .embedding_executor import BatchedEmbeddings
+from .lexical_index import BM25Index
+from .manifest import DocumentManifest, collection_name_for
+from .numpy_store import NumpyVectorStore
+from .warmup import KeepAliveOllamaEmbeddings
 
 logger = logging.getLogger(__name__)
 
 class VectorStore:
     """Manages vector embeddings and database operations."""
     
-    def __init__(self, embedding_model: str = "nomic-embed-text"):
-        self.embeddings = OllamaEmbeddings(model=embedding_model)
+    def __init__(
+        self,
+        embedding_model: str = "nomic-embed-text",
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = 100_000,
+        persist_directory: Optional[str] = None,
+        batch_size: int = 32,
+        max_in_flight: int = 2,
+        lexical_directory: Optional[str] = None,
+        backend: str = "chroma",
+        quantization: str = "float16",
+        keep_alive: Any = None
+    ):
+        if backend not in ("chroma", "numpy"):
+            raise ValueError(f"Unknown vector store backend '{backend}', expected 'chroma' or 'numpy'")
+        self.backend = backend
+        self.quantization = quantization
+        self.embedding_model = embedding_model
+        self.persist_directory = persist_directory
+        self.lexical_directory = lexical_directory
+        self.manifest = DocumentManifest(persist_directory) if persist_directory else None
+        self.embeddings = BatchedEmbeddings(
+            KeepAliveOllamaEmbeddings(model=embedding_model, keep_alive=keep_alive),
+            batch_size=batch_size,
+            max_in_flight=max_in_flight
+        )
+        if cache_dir is not None:
+            cache = EmbeddingCache(cache_dir=cache_dir, max_entries=cache_max_entries)
+            self.embeddings = CachedEmbeddings(self.embeddings, cache, model_name=embedding_model)
         self.vector_db = None
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def chroma_client(self):
+        """The persistent Chroma client shared by every collection this store opens, or None without a persist directory."""
+        if self.persist_directory is None:
+            return None
+        with self._client_lock:
+            if self._client is None:
+                import chromadb
+                self._client = chromadb.PersistentClient(path=self.persist_directory)
+            return self._client
     
-    def create_vector_db(self, documents: List, collection_name: str = "local-rag") -> Chroma:
-        """Create vector database from documents."""
+    def open_collection(self, collection_name: str) -> Union[Chroma, NumpyVectorStore]:
+        """Open (or create empty) a collection with the configured backend."""
+        if self.backend == "numpy":
+            return NumpyVectorStore(
+                collection_name=collection_name,
+                embedding_function=self.embeddings,
+                persist_directory=self.persist_directory,
+                quantization=self.quantization
+            )
+        client = self.chroma_client()
+        if client is None:
+            return Chroma(collection_name=collection_name, embedding_function=self.embeddings)
+        return Chroma(
+            client=client,
+            collection_name=collection_name,
+            embedding_function=self.embeddings
+        )
+
+    def open_vector_db(self, digest: str) -> Optional[Chroma]:
+        """Open the persisted collection for a document digest, if it was ingested before."""
+        if self.manifest is None:
+            return None
+        entry = self.manifest.get(digest)
+        if entry is None:
+            return None
+        try:
+            vector_db = self.open_collection(entry["collection_name"])
+            if vector_db._collection.count() == 0:
+                self.manifest.remove(digest)
+                return None
+        except Exception as e:
+            logger.error(f"Error opening persisted collection: {e}")
+            self.manifest.remove(digest)
+            return None
+        logger.info(f"Opened persisted collection {entry['collection_name']}")
+        self.vector_db = vector_db
+        return vector_db
+
+    def create_vector_db(
+        self,
+        documents: List,
+        collection_name: str = "local-rag",
+        digest: Optional[str] = None,
+        source_name: str = "",
+        save_lexical_index: bool = True
+    ) -> Chroma:
+        """
+        Create vector database from documents.
+
+        When a `digest` is given and the store is persistent, the collection is
+        named after the digest and recorded in the manifest for later reuse.
+        Callers that go on adding batches pass `save_lexical_index=False` and
+        save the collection's BM25 index themselves once it is complete.
+        """
         try:
             logger.info("Creating vector database")
-            self.vector_db = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                collection_name=collection_name
-            )
+            if digest is not None and self.manifest is not None:
+                collection_name = collection_name_for(digest)
+                self.open_collection(collection_name).delete_collection()
+            self.vector_db = self.open_collection(collection_name)
+            self.vector_db.add_documents(documents)
+            if self.lexical_directory is not None and save_lexical_index:
+                lexical_index = BM25Index()
+                lexical_index.add_documents(documents)
+                lexical_index.save(self.lexical_directory, collection_name)
+            if digest is not None and self.manifest is not None:
+                self.manifest.record(digest, collection_name, source_name, len(documents))
+            self.collection_changed(collection_name)
             return self.vector_db
         except Exception as e:
             logger.error(f"Error creating vector database: {e}")
             raise
     
+    def collection_changed(self, collection_name: str) -> None:
+        """Bump the collection's version in the manifest, invalidating answers cached for it."""
+        if self.manifest is not None:
+            self.manifest.bump_collection_version(collection_name)
+
+    def open_lexical_index(self, collection_name: str) -> Optional[BM25Index]:
+        """Load the BM25 index persisted for a collection, if any."""
+        if self.lexical_directory is None:
+            return None
+        return BM25Index.load(self.lexical_directory, collection_name)
+
     def delete_collection(self) -> None:
         """Delete vector database collection."""
         if self.vector_db:
             try:
                 logger.info("Deleting vector database collection")
+                collection_name = self.vector_db._collection.name
+                if self.manifest is not None:
+                    self.manifest.remove_collection(collection_name)
+                if self.lexical_directory is not None:
+                    BM25Index.remove(self.lexical_directory, collection_name)
                 self.vector_db.delete_collection()
+                self.collection_changed(collection_name)
                 self.vector_db = None
             except Exception as e:
                 logger.error(f"Error deleting collection: {e}")
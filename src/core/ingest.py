@@ -0,0 +1,229 @@
+"""Parallel multi-document ingestion into a single vector collection."""
+import functools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from langchain.schema import Document
+from .dedup import ChunkDeduplicator
+from .document import DocumentProcessor
+from .embeddings import VectorStore
+from .lexical_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".html", ".htm")
+_DONE = object()
+
+def _extract_file(path: str, pdf_backend: str, pdf_fallback: Optional[str]) -> List[Document]:
+    """Load a single file in a worker process and return it as LangChain documents."""
+    loaded = DocumentProcessor(pdf_backend=pdf_backend, pdf_fallback=pdf_fallback).load_document(Path(path))
+    documents = []
+    for item in loaded:
+        if isinstance(item, dict):
+            documents.append(Document(page_content=item["text"], metadata={"source": path}))
+        else:
+            item.metadata.setdefault("source", path)
+            documents.append(item)
+    return documents
+
+@dataclass
+class IngestionReport:
+    """Outcome and throughput of a bulk ingestion run."""
+
+    files_total: int = 0
+    files_ok: int = 0
+    chunks: int = 0
+    duplicates_dropped: int = 0
+    elapsed: float = 0.0
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_ok / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files_ok}/{self.files_total} files, {self.chunks} chunks in {self.elapsed:.2f}s "
+            f"({self.files_per_second:.2f} files/s, {self.chunks_per_second:.2f} chunks/s), "
+            f"{self.duplicates_dropped} duplicates dropped, {len(self.errors)} failed"
+        )
+
+class IngestionPipeline:
+    """
+    Ingests many files into one collection with three overlapping stages:
+    extraction in a process pool, splitting in a thread, and batched embedding.
+    Stages are connected by bounded queues so a slow embedder throttles extraction.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        chunk_size: int = 7500,
+        chunk_overlap: int = 100,
+        max_workers: Optional[int] = None,
+        batch_size: int = 64,
+        queue_size: int = 8,
+        deduplicator: Optional[ChunkDeduplicator] = None,
+        pdf_backend: str = "pypdfium2",
+        pdf_fallback: Optional[str] = "unstructured"
+    ):
+        self.vector_store = vector_store
+        self.processor = DocumentProcessor(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            pdf_backend=pdf_backend,
+            pdf_fallback=pdf_fallback
+        )
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.deduplicator = deduplicator
+
+    def ingest_folder(
+        self,
+        folder: Path,
+        collection_name: str = "local-rag",
+        recursive: bool = True,
+        replace: bool = True
+    ) -> IngestionReport:
+        """
+        Ingest every supported file below `folder`.
+
+        The collection mirrors the folder, so by default it is replaced rather
+        than appended to; ingesting the same folder twice does not store its chunks twice.
+        """
+        pattern = "**/*" if recursive else "*"
+        paths = sorted(p for p in Path(folder).glob(pattern) if p.suffix.lower() in SUPPORTED_EXTENSIONS)
+        logger.info(f"Found {len(paths)} files to ingest in {folder}")
+        return self.ingest_files(paths, collection_name=collection_name, replace=replace)
+
+    def ingest_files(self, paths: Iterable[Path], collection_name: str = "local-rag", replace: bool = False) -> IngestionReport:
+        """
+        Ingest the given files into a single collection.
+
+        With `replace`, the collection and its BM25 index are emptied before the
+        first batch is embedded; if nothing could be extracted, they are left as they were.
+        """
+        paths = [str(p) for p in paths]
+        report = IngestionReport(files_total=len(paths))
+        extracted: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        batches: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        processed: set = set()
+        start = time.perf_counter()
+
+        extractor = threading.Thread(target=self._extract_stage, args=(paths, extracted, report), daemon=True)
+        splitter = threading.Thread(target=self._split_stage, args=(extracted, batches, processed, report), daemon=True)
+        extractor.start()
+        splitter.start()
+        self._embed_stage(batches, collection_name, report, replace)
+        extractor.join()
+        splitter.join()
+
+        report.files_ok = len(processed - set(report.errors))
+        report.elapsed = time.perf_counter() - start
+        logger.info(f"Ingestion finished: {report.summary()}")
+        return report
+
+    def _extract_stage(self, paths: List[str], out: queue.Queue, report: IngestionReport) -> None:
+        """Fan extraction out over a process pool, keeping a bounded number of files in flight."""
+        pending = {}
+        remaining = iter(paths)
+        # Workers build their own processor, so they get the PDF settings explicitly
+        extract = functools.partial(
+            _extract_file,
+            pdf_backend=self.processor.pdf_backend,
+            pdf_fallback=self.processor.pdf_fallback
+        )
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                while True:
+                    while len(pending) < self.max_workers * 2:
+                        path = next(remaining, None)
+                        if path is None:
+                            break
+                        pending[pool.submit(extract, path)] = path
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path = pending.pop(future)
+                        try:
+                            out.put((path, future.result()))
+                        except Exception as e:
+                            logger.error(f"Error extracting {path}: {e}")
+                            report.errors[path] = str(e)
+        finally:
+            out.put(_DONE)
+
+    def _split_stage(self, inp: queue.Queue, out: queue.Queue, processed: set, report: IngestionReport) -> None:
+        """Split extracted documents and regroup the chunks into embedding batches."""
+        batch: List[Document] = []
+        try:
+            while (item := inp.get()) is not _DONE:
+                path, documents = item
+                try:
+                    chunks = self.processor.split_documents(documents)
+                    if self.deduplicator is not None:
+                        chunks = self.deduplicator.deduplicate(chunks)
+                        report.duplicates_dropped = self.deduplicator.dropped
+                except Exception as e:
+                    report.errors[path] = str(e)
+                    continue
+                processed.add(path)
+                logger.info(f"Extracted {len(chunks)} chunks from {path}")
+                for chunk in chunks:
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        out.put(batch)
+                        batch = []
+            if batch:
+                out.put(batch)
+        finally:
+            out.put(_DONE)
+
+    def _embed_stage(self, inp: queue.Queue, collection_name: str, report: IngestionReport, replace: bool) -> None:
+        """
+        Embed chunk batches into the collection, created on the first batch.
+
+        Chunks are also added to the collection's BM25 index, which is saved once at the end.
+        """
+        vector_db = None
+        lexical_index = None
+        if self.vector_store.lexical_directory is not None:
+            existing = None if replace else self.vector_store.open_lexical_index(collection_name)
+            lexical_index = existing or BM25Index()
+        while (batch := inp.get()) is not _DONE:
+            sources = {chunk.metadata.get("source", "") for chunk in batch}
+            try:
+                if vector_db is None:
+                    if replace:
+                        self.vector_store.open_collection(collection_name).delete_collection()
+                        self.vector_store.collection_changed(collection_name)
+                    vector_db = self.vector_store.create_vector_db(
+                        batch,
+                        collection_name=collection_name,
+                        save_lexical_index=False
+                    )
+                else:
+                    vector_db.add_documents(batch)
+                if lexical_index is not None:
+                    lexical_index.add_documents(batch)
+                report.chunks += len(batch)
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(batch)} chunks: {e}")
+                for source in sources:
+                    report.errors[source] = str(e)
+        if vector_db is not None and lexical_index is not None:
+            lexical_index.save(self.vector_store.lexical_directory, collection_name)
+        if vector_db is not None:
+            self.vector_store.collection_changed(collection_name)
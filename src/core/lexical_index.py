@@ -0,0 +1,228 @@
+"""In-process BM25 inverted index stored next to the vector collections."""
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+# Keeps part numbers, error codes and versions such as "ERR-1042" or "v2.3.1" together
+_TOKEN_RE = re.compile(r"\w+(?:[-./:]\w+)*")
+_PART_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens; compound tokens are also indexed by their parts so
+    "ERR-1042" matches queries for "err-1042", "err" and "1042".
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_RE.findall(token))
+    return tokens
+
+class BM25Index:
+    """
+    BM25 inverted index over the chunks of one collection.
+
+    Postings are kept in compressed sparse row form: one array of document ids
+    and one of term frequencies, sliced per term through an offsets array, so a
+    query touches only the postings of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Parameters:
+            k1 (float): Term frequency saturation.
+            b (float): Strength of document length normalization.
+        """
+        self.k1 = k1
+        self.b = b
+        self._texts: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._doc_lengths = array("i")
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._compiled: Optional[Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    @staticmethod
+    def path_for(directory: str, collection_name: str) -> Path:
+        """Return the path of the postings file for a collection."""
+        return Path(directory) / f"{collection_name}.npz"
+
+    @classmethod
+    def version(cls, directory: str, collection_name: str) -> Optional[int]:
+        """Modification time (ns) of a persisted index, which changes on every save, or None if there is none."""
+        try:
+            return cls.path_for(directory, collection_name).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def add_documents(self, documents: Iterable[Document]) -> None:
+        """Index chunks; they become searchable immediately."""
+        with self._lock:
+            self._decompile()
+            for doc in documents:
+                doc_id = len(self._texts)
+                terms: Dict[str, int] = {}
+                tokens = tokenize(doc.page_content)
+                for token in tokens:
+                    terms[token] = terms.get(token, 0) + 1
+                for term, tf in terms.items():
+                    ids, tfs = self._postings.setdefault(term, (array("i"), array("f")))
+                    ids.append(doc_id)
+                    tfs.append(tf)
+                self._texts.append(doc.page_content)
+                self._metadatas.append(dict(doc.metadata))
+                self._doc_lengths.append(len(tokens))
+            self._compiled = None
+
+    def _decompile(self) -> None:
+        """Turn loaded CSR arrays back into growable per-term postings."""
+        if self._postings or self._compiled is None:
+            return
+        term_ids, offsets, doc_ids, tfs, _ = self._compiled
+        for term, term_id in term_ids.items():
+            start, end = offsets[term_id], offsets[term_id + 1]
+            self._postings[term] = (array("i", doc_ids[start:end].tolist()), array("f", tfs[start:end].tolist()))
+
+    def _compile(self) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if self._compiled is None:
+            terms = sorted(self._postings)
+            lengths = np.array([len(self._postings[term][0]) for term in terms], dtype=np.int64)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            doc_ids = np.empty(int(offsets[-1]), dtype=np.int32)
+            tfs = np.empty(int(offsets[-1]), dtype=np.float32)
+            for term_id, term in enumerate(terms):
+                ids, freqs = self._postings[term]
+                doc_ids[offsets[term_id]:offsets[term_id + 1]] = np.frombuffer(ids, dtype=np.int32)
+                tfs[offsets[term_id]:offsets[term_id + 1]] = np.frombuffer(freqs, dtype=np.float32)
+            self._compiled = (
+                {term: term_id for term_id, term in enumerate(terms)},
+                offsets,
+                doc_ids,
+                tfs,
+                np.frombuffer(self._doc_lengths, dtype=np.int32).astype(np.float32),
+            )
+        return self._compiled
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Return the top `k` chunks for a query with their BM25 scores."""
+        with self._lock:
+            if not self._texts:
+                return []
+            term_ids, offsets, doc_ids, tfs, doc_lengths = self._compile()
+            n = len(doc_lengths)
+            avgdl = float(doc_lengths.mean()) or 1.0
+            scores = np.zeros(n, dtype=np.float32)
+            for term in set(tokenize(query)):
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    continue
+                start, end = offsets[term_id], offsets[term_id + 1]
+                ids, tf = doc_ids[start:end], tfs[start:end]
+                df = end - start
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lengths[ids] / avgdl)
+                scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm)
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+            ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [
+                (Document(page_content=self._texts[i], metadata=dict(self._metadatas[i])), float(scores[i]))
+                for i in ranked
+            ]
+
+    def save(self, directory: str, collection_name: str) -> Path:
+        """
+        Persist the index as a single postings file.
+
+        Terms and chunk texts travel inside the same file as the postings, so
+        the index is swapped in with one rename and a reader never pairs the
+        vocabulary of one save with the postings of another.
+        """
+        path = self.path_for(directory, collection_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            term_ids, offsets, doc_ids, tfs, doc_lengths = self._compile()
+            sidecar = {
+                "k1": self.k1,
+                "b": self.b,
+                "terms": sorted(term_ids, key=term_ids.get),
+                "texts": self._texts,
+                "metadatas": self._metadatas,
+            }
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp.npz")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(
+                        f,
+                        offsets=offsets,
+                        doc_ids=doc_ids,
+                        tfs=tfs,
+                        doc_lengths=doc_lengths.astype(np.int32),
+                        sidecar=np.frombuffer(json.dumps(sidecar).encode("utf-8"), dtype=np.uint8)
+                    )
+                os.replace(tmp, path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+            # Indexes saved before the sidecar moved into the postings file kept it next to them
+            path.with_suffix(".json").unlink(missing_ok=True)
+        logger.info(f"Saved lexical index for {collection_name} ({len(self._texts)} chunks, {len(term_ids)} terms)")
+        return path
+
+    @classmethod
+    def load(cls, directory: str, collection_name: str) -> Optional["BM25Index"]:
+        """Load a persisted index, or return None if the collection has none."""
+        path = cls.path_for(directory, collection_name)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as arrays:
+                offsets, doc_ids, tfs = arrays["offsets"], arrays["doc_ids"], arrays["tfs"]
+                doc_lengths = arrays["doc_lengths"]
+                if "sidecar" in arrays.files:
+                    sidecar = json.loads(arrays["sidecar"].tobytes().decode("utf-8"))
+                else:
+                    with open(path.with_suffix(".json"), "r", encoding="utf-8") as f:
+                        sidecar = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error loading lexical index {path}: {e}")
+            return None
+        index = cls(k1=sidecar["k1"], b=sidecar["b"])
+        index._texts = sidecar["texts"]
+        index._metadatas = sidecar["metadatas"]
+        index._doc_lengths = array("i", doc_lengths.tolist())
+        index._compiled = (
+            {term: term_id for term_id, term in enumerate(sidecar["terms"])},
+            offsets,
+            doc_ids,
+            tfs,
+            doc_lengths.astype(np.float32),
+        )
+        logger.info(f"Loaded lexical index for {collection_name} ({len(index)} chunks)")
+        return index
+
+    @classmethod
+    def remove(cls, directory: str, collection_name: str) -> None:
+        """Delete the persisted index of a collection, if any."""
+        path = cls.path_for(directory, collection_name)
+        for file in (path, path.with_suffix(".json")):
+            file.unlink(missing_ok=True)
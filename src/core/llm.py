@@ -1,6 +1,7 @@
 """LLM configuration and setup."""
 import logging
 import textwrap
+from typing import Any, Callable, Optional
 from langchain_ollama.chat_models import ChatOllama
 from langchain.prompts import ChatPromptTemplate, PromptTemplate
 
@@ -9,17 +10,52 @@ logger = logging.getLogger(__name__)
 class LLMManager:
     """Manages LLM configuration and prompt templates."""
 
-    def __init__(self, model_name: str = "llama2", llm_class=ChatOllama):
+    def __init__(
+        self,
+        model_name: str = "llama2",
+        llm_class=ChatOllama,
+        rewrite_model: Optional[str] = None,
+        rewrite_max_tokens: Optional[int] = None,
+        keep_alive_for: Optional[Callable[[str], Any]] = None,
+        llm: Optional[Any] = None,
+        rewrite_llm: Optional[Any] = None,
+        query_template: Optional[str] = None,
+        rag_template: Optional[str] = None
+    ):
         """
         Initialize the LLMManager with a specific language model.
 
         Parameters:
-            model_name (str): The name of the language model to use.
+            model_name (str): The name of the language model used for answering.
             llm_class (type): The class of the LLM to instantiate. Defaults to ChatOllama.
+            rewrite_model (Optional[str]): Small, fast model for query rewriting; defaults to `model_name`.
+            rewrite_max_tokens (Optional[int]): Cap on tokens generated per rewrite by `rewrite_model`.
+            keep_alive_for (Optional[Callable[[str], Any]]): Returns the keep_alive sent with each model's requests.
+            llm (Optional[Any]): Existing client for answering, e.g. a shared one; nothing is created for it.
+            rewrite_llm (Optional[Any]): Existing client for query rewriting; defaults to `llm` when `llm` is given.
+            query_template (Optional[str]): Query-rewrite prompt with a {question} variable, replacing the built-in one.
+            rag_template (Optional[str]): Answer prompt with {context} and {question} variables, replacing the built-in one.
         """
         self.model_name = model_name
+        self.rewrite_model_name = rewrite_model or model_name
+        self.query_template = query_template
+        self.rag_template = rag_template
+        if llm is not None:
+            self.llm = llm
+            self.rewrite_llm = rewrite_llm or llm
+            return
+        def keep_alive(model: str) -> dict:
+            return {"keep_alive": keep_alive_for(model)} if keep_alive_for is not None else {}
+
         try:
-            self.llm = llm_class(model=model_name)
+            self.llm = llm_class(model=model_name, **keep_alive(model_name))
+            if rewrite_model and rewrite_model != model_name:
+                options = {"temperature": 0, **keep_alive(rewrite_model)}
+                if rewrite_max_tokens:
+                    options["num_predict"] = rewrite_max_tokens
+                self.rewrite_llm = llm_class(model=rewrite_model, **options)
+            else:
+                self.rewrite_llm = self.llm
         except Exception as e:
             logger.exception("Failed to initialize LLM with model '%s'", model_name)
             raise
@@ -31,7 +67,7 @@ class LLMManager:
         Returns:
             PromptTemplate: A template that accepts a 'question' variable.
         """
-        template = textwrap.dedent("""\
+        template = self.query_template or textwrap.dedent("""\
             You are an AI language model assistant. Your task is to generate 2 different versions
             of the given user question to retrieve relevant documents from a vector database.
             By generating multiple perspectives on the user question, your goal is to help the user 
@@ -51,7 +87,7 @@ class LLMManager:
         Returns:
             ChatPromptTemplate: A template that requires 'context' and 'question' variables.
         """
-        template = textwrap.dedent("""\
+        template = self.rag_template or textwrap.dedent("""\
             Answer the question based ONLY on the following context:
             {context}
             Question: {question}
@@ -0,0 +1,134 @@
+"""Document manifest mapping content digests to persisted vector collections."""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def compute_document_digest(data: bytes, chunk_size: int, chunk_overlap: int, embedding_model: str) -> str:
+    """
+    Compute a stable digest for a document and the settings used to index it.
+
+    Any change to the file bytes, the chunking configuration or the embedding
+    model produces a different digest, and therefore a different collection.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(data)
+    hasher.update(f"\0{chunk_size}\0{chunk_overlap}\0{embedding_model}".encode("utf-8"))
+    return hasher.hexdigest()
+
+def collection_name_for(digest: str) -> str:
+    """Return the Chroma collection name used for a document digest."""
+    return f"doc_{digest[:32]}"
+
+class DocumentManifest:
+    """
+    JSON manifest of fully ingested documents, stored next to the vector store.
+
+    It also keeps a version counter per collection, bumped whenever chunks are
+    added to or deleted from a collection that is not named after a digest.
+    The file is re-read when another process has changed it, so a folder
+    ingested from the command line invalidates a running server's answers.
+    """
+
+    _VERSIONS_KEY = "_collection_versions"
+
+    def __init__(self, persist_directory: str):
+        self.path = Path(persist_directory) / "manifest.json"
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._versions: Dict[str, int] = {}
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._refresh()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error reading manifest {self.path}, starting empty: {e}")
+            return {}
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        # Every save renames a new file into place, so the inode changes even within one mtime tick
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self) -> None:
+        """Reload the manifest if the file changed since it was last read or written. Caller holds the lock."""
+        stamp = self._file_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return
+        entries = self._load()
+        self._versions = entries.pop(self._VERSIONS_KEY, {})
+        self._entries = entries
+        self._stamp = stamp
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({**self._entries, self._VERSIONS_KEY: self._versions}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._stamp = self._file_stamp()
+
+    def get(self, digest: str) -> Optional[Dict]:
+        """Return the manifest entry for a digest, if the document was ingested."""
+        with self._lock:
+            self._refresh()
+            return self._entries.get(digest)
+
+    def record(self, digest: str, collection_name: str, file_name: str, chunk_count: int) -> None:
+        """Record a completed ingestion."""
+        with self._lock:
+            self._refresh()
+            self._entries[digest] = {
+                "collection_name": collection_name,
+                "file_name": file_name,
+                "chunk_count": chunk_count,
+                "created": time.time(),
+            }
+            self._save()
+        logger.info(f"Manifest entry recorded for {file_name} -> {collection_name}")
+
+    def remove(self, digest: str) -> None:
+        """Forget a digest."""
+        with self._lock:
+            self._refresh()
+            if self._entries.pop(digest, None) is not None:
+                self._save()
+
+    def remove_collection(self, collection_name: str) -> None:
+        """Forget every digest that points at the given collection."""
+        with self._lock:
+            self._refresh()
+            stale = [d for d, entry in self._entries.items() if entry["collection_name"] == collection_name]
+            for digest in stale:
+                del self._entries[digest]
+            if stale:
+                self._save()
+
+    def bump_collection_version(self, collection_name: str) -> int:
+        """Record that a collection's content changed; returns its new version."""
+        with self._lock:
+            self._refresh()
+            version = self._versions.get(collection_name, 0) + 1
+            self._versions[collection_name] = version
+            self._save()
+        return version
+
+    def collection_version(self, collection_name: str) -> int:
+        """Return a collection's version counter, 0 if it never changed since versions were kept."""
+        with self._lock:
+            self._refresh()
+            return self._versions.get(collection_name, 0)
@@ -0,0 +1,132 @@
+"""Cached view of the models Ollama has installed and loaded, including where they run."""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+import ollama
+
+logger = logging.getLogger(__name__)
+
+def processor_label(size: int, size_vram: int) -> str:
+    """Where a loaded model runs, in the format of the PROCESSOR column of `ollama ps`."""
+    if size <= 0 or size_vram <= 0:
+        return "100% CPU"
+    if size_vram >= size:
+        return "100% GPU"
+    gpu = round(100 * size_vram / size)
+    return f"{100 - gpu}%/{gpu}% CPU/GPU"
+
+class _CachedListing:
+    """
+    A listing served from memory. Only the first lookup waits for it; once
+    it is older than `ttl`, lookups still return it and one background
+    refresh starts. A failed refresh keeps the previous listing.
+    """
+
+    def __init__(self, fetch: Callable[[], Any], ttl: float, name: str, empty: Any):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.name = name
+        self._value = empty
+        self._expires = 0.0
+        self._refreshing = False
+        self._fetched = threading.Event()
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.errors = 0
+
+    def _refresh(self) -> None:
+        try:
+            value = self.fetch()
+        except Exception as e:
+            logger.warning(f"Could not list {self.name} from Ollama: {e}")
+            with self._lock:
+                self.errors += 1
+        else:
+            with self._lock:
+                self._value = value
+                self.refreshes += 1
+        with self._lock:
+            # A failure is retried after another ttl rather than on every lookup
+            self._expires = time.monotonic() + self.ttl
+            self._refreshing = False
+        self._fetched.set()
+
+    def get(self) -> Any:
+        with self._lock:
+            start = not self._refreshing and time.monotonic() >= self._expires
+            if start:
+                self._refreshing = True
+        if not self._fetched.is_set():
+            if start:
+                self._refresh()
+            self._fetched.wait()
+        elif start:
+            threading.Thread(target=self._refresh, name=f"list-{self.name}", daemon=True).start()
+        with self._lock:
+            return self._value
+
+    def invalidate(self) -> None:
+        """Make the next lookup start a refresh."""
+        with self._lock:
+            self._expires = 0.0
+
+class ModelCatalog:
+    """
+    The installed models (`ollama list`) and the loaded ones with the
+    processor they run on (`ollama ps`), cached for `ttl` seconds.
+
+    Ollama runs inference out of process, so this is where the app learns
+    whether a model runs on the GPU. Only the first lookup of each listing
+    waits for Ollama; afterwards lookups return the cached listing and a
+    stale one is refreshed in a background thread, so reruns never block on it.
+    """
+
+    def __init__(self, client: Optional[ollama.Client] = None, ttl: float = 30.0, loaded_ttl: float = 5.0):
+        """
+        Parameters:
+            client (Optional[ollama.Client]): Ollama client; defaults to OLLAMA_HOST.
+            ttl (float): Seconds before the installed-model list is refreshed.
+            loaded_ttl (float): Seconds before the loaded-model list is refreshed.
+        """
+        self.client = client or ollama.Client()
+        self._installed = _CachedListing(self._list_installed, ttl, "installed models", ())
+        self._loaded = _CachedListing(self._list_loaded, loaded_ttl, "loaded models", {})
+
+    def _list_installed(self) -> Tuple[str, ...]:
+        return tuple(model.model for model in self.client.list().models)
+
+    def _list_loaded(self) -> Dict[str, str]:
+        processors = {}
+        for model in self.client.ps().models:
+            label = processor_label(model.size or 0, model.size_vram or 0)
+            processors[model.model] = label
+            # Ollama reports untagged models with the ":latest" tag
+            if model.model.endswith(":latest"):
+                processors[model.model[:-len(":latest")]] = label
+        return processors
+
+    def models(self) -> Tuple[str, ...]:
+        """Names of the installed models."""
+        return self._installed.get()
+
+    def is_installed(self, model: str) -> bool:
+        """Whether a model is installed; an untagged name matches its ":latest" tag."""
+        models = self.models()
+        return model in models or (":" not in model and f"{model}:latest" in models)
+
+    def processor(self, model: str) -> Optional[str]:
+        """Where a model runs, e.g. "100% GPU", or None while it is not loaded."""
+        return self._loaded.get().get(model)
+
+    def invalidate(self) -> None:
+        """Refresh both listings on the next lookup, e.g. after pulling or loading a model."""
+        self._installed.invalidate()
+        self._loaded.invalidate()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "installed_refreshes": self._installed.refreshes,
+            "loaded_refreshes": self._loaded.refreshes,
+            "errors": self._installed.errors + self._loaded.errors,
+        }
@@ -0,0 +1,347 @@
+"""Brute-force vector store on a memory-mapped float16 or int8 NumPy matrix."""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore as LangChainVectorStore
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("float16", "int8")
+_BLOCK_ROWS = 4096
+
+def _matches(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Chroma-style metadata filter: equality, or {"$in": [...]} / {"$ne": value} per key."""
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class _CollectionInfo:
+    """The subset of Chroma's collection handle the app reads (name and count)."""
+
+    def __init__(self, store: "NumpyVectorStore"):
+        self._store = store
+
+    @property
+    def name(self) -> str:
+        return self._store.collection_name
+
+    def count(self) -> int:
+        return self._store.count()
+
+class NumpyVectorStore(LangChainVectorStore):
+    """
+    Exact cosine search over a contiguous embedding matrix.
+
+    Rows are L2-normalized and stored as float16, or as int8 with one float32
+    scale per row. Top-k is one matrix-vector product plus `argpartition`,
+    which for collections of a few thousand chunks is faster to open and query
+    than an HNSW index.
+
+    When persisted, vectors are appended to a raw file that is opened as a
+    read-only memory map, chunk texts and metadata go to a JSON-lines file,
+    and `meta.json` records the committed row count, so an interrupted append
+    never exposes partial rows.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "local-rag",
+        embedding_function: Optional[Embeddings] = None,
+        persist_directory: Optional[str] = None,
+        quantization: str = "float16"
+    ):
+        """
+        Parameters:
+            collection_name (str): Name of the collection; one subdirectory per collection.
+            embedding_function (Optional[Embeddings]): Embedder for texts and queries.
+            persist_directory (Optional[str]): Root directory, or None for an in-memory store.
+            quantization (str): "float16" or "int8" storage of the vectors.
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+        self.collection_name = collection_name
+        self._embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.path = Path(persist_directory) / "numpy" / collection_name if persist_directory else None
+        self._lock = threading.Lock()
+        self._quantization = quantization
+        self._dim: Optional[int] = None
+        self._count = 0
+        self._records_bytes = 0
+        # Chained digest of every appended chunk, so any change of content changes it
+        self._content_digest = ""
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._records: Optional[List[Dict[str, Any]]] = None
+        if self.path is not None and (self.path / "meta.json").exists():
+            with open(self.path / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self._quantization = meta["quantization"]
+            self._dim = meta["dim"]
+            self._count = meta["count"]
+            self._records_bytes = meta["records_bytes"]
+            self._content_digest = meta.get("content_digest", f"count-{self._count}")
+        elif self.path is None:
+            self._records = []
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    @property
+    def _collection(self) -> _CollectionInfo:
+        return _CollectionInfo(self)
+
+    def count(self) -> int:
+        """Return the number of stored chunks."""
+        return self._count
+
+    def collection_version(self) -> str:
+        """Version string used to scope cached answers to the current content."""
+        with self._lock:
+            return f"{self.collection_name}:{self._content_digest}"
+
+    @property
+    def _dtype(self) -> np.dtype:
+        return np.dtype(np.float16 if self._quantization == "float16" else np.int8)
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        if self._quantization == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _load_vectors(self) -> None:
+        """Map the persisted vectors on first use."""
+        if self._matrix is not None or self.path is None or self._count == 0:
+            return
+        self._matrix = np.memmap(self.path / "vectors.bin", dtype=self._dtype, mode="r", shape=(self._count, self._dim))
+        if self._quantization == "int8":
+            self._scales = np.fromfile(self.path / "scales.bin", dtype=np.float32, count=self._count)
+
+    def _load_records(self) -> List[Dict[str, Any]]:
+        """Read chunk texts and metadata on first use."""
+        if self._records is None:
+            records = []
+            if self.path is not None and self._count:
+                with open(self.path / "documents.jsonl", "r", encoding="utf-8") as f:
+                    for line, _ in zip(f, range(self._count)):
+                        records.append(json.loads(line))
+            self._records = records
+        return self._records
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Embed texts and append them to the collection."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = np.asarray(self._embedding_function.embed_documents(texts), dtype=np.float32)
+        encoded, scales = self._encode(vectors)
+        records = [{"id": i, "text": t, "metadata": m or {}} for i, t, m in zip(ids, texts, metadatas)]
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self._dim}")
+            if self.path is None:
+                self._matrix = encoded if self._matrix is None else np.vstack([self._matrix, encoded])
+                if scales is not None:
+                    self._scales = scales if self._scales is None else np.concatenate([self._scales, scales])
+            else:
+                self._append_files(encoded, scales, records)
+                self._matrix = None
+                self._scales = None
+            if self._records is not None:
+                self._records.extend(records)
+            self._count += len(texts)
+            hasher = hashlib.sha256(self._content_digest.encode("utf-8"))
+            for record in records:
+                hasher.update(f"\0{record['id']}\0{record['text']}".encode("utf-8"))
+            self._content_digest = hasher.hexdigest()
+            if self.path is not None:
+                self._write_meta()
+        return ids
+
+    def _append_files(self, encoded: np.ndarray, scales: Optional[np.ndarray], records: List[Dict[str, Any]]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        row_bytes = self._dim * self._dtype.itemsize
+        # Drop rows of an earlier append that never reached meta.json
+        for name, size in (("vectors.bin", row_bytes), ("scales.bin", 4)):
+            file = self.path / name
+            if file.exists() and file.stat().st_size > self._count * size:
+                os.truncate(file, self._count * size)
+        with open(self.path / "vectors.bin", "ab") as f:
+            f.write(np.ascontiguousarray(encoded).tobytes())
+        if scales is not None:
+            with open(self.path / "scales.bin", "ab") as f:
+                f.write(scales.tobytes())
+        lines = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(self.path / "documents.jsonl", "ab") as f:
+            f.truncate(self._records_bytes)
+            f.write(lines)
+        self._records_bytes += len(lines)
+
+    def _write_meta(self) -> None:
+        tmp_path = self.path / "meta.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "quantization": self._quantization,
+                "dim": self._dim,
+                "count": self._count,
+                "records_bytes": self._records_bytes,
+                "content_digest": self._content_digest,
+            }, f)
+        os.replace(tmp_path, self.path / "meta.json")
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Return the `k` most similar chunks with their cosine similarity."""
+        # Only the snapshot is taken under the lock, so concurrent searches scan in parallel;
+        # appends replace the arrays and only extend the records, so the snapshot stays valid
+        with self._lock:
+            if self._count == 0:
+                return []
+            self._load_vectors()
+            records = self._load_records()
+            matrix, scales = self._matrix, self._scales
+        # Copy: the caller's vector may be shared, e.g. through the embedding cache
+        query = np.array(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        if filter:
+            rows = np.fromiter(
+                (i for i, r in enumerate(records[:len(matrix)]) if _matches(r["metadata"], filter)),
+                dtype=np.int64
+            )
+            if len(rows) == 0:
+                return []
+            matrix = matrix[rows]
+            scales = scales[rows] if scales is not None else None
+        else:
+            rows = None
+        # Upcast block by block: BLAS has no float16/int8 kernels, and this bounds the float32 copy
+        scores = np.concatenate([
+            matrix[start:start + _BLOCK_ROWS].astype(np.float32) @ query
+            for start in range(0, len(matrix), _BLOCK_ROWS)
+        ])
+        if scales is not None:
+            scores *= scales
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        results = []
+        for position in top:
+            record = records[rows[position] if rows is not None else position]
+            results.append((
+                Document(id=record["id"], page_content=record["text"], metadata=dict(record["metadata"])),
+                float(scores[position])
+            ))
+        return results
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding_function.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2
+
+    def get(self, include: Optional[List[str]] = None, **kwargs: Any) -> Dict[str, List]:
+        """Return stored ids, texts and metadata in the shape of `Chroma.get()`."""
+        with self._lock:
+            records = self._load_records()
+            return {
+                "ids": [r["id"] for r in records],
+                "documents": [r["text"] for r in records],
+                "metadatas": [r["metadata"] for r in records],
+            }
+
+    def delete_collection(self) -> None:
+        """Remove every stored chunk and the collection's files."""
+        with self._lock:
+            self._matrix = None
+            self._scales = None
+            self._records = []
+            self._count = 0
+            self._records_bytes = 0
+            self._content_digest = ""
+            self._dim = None
+            if self.path is not None:
+                shutil.rmtree(self.path, ignore_errors=True)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        collection_name: str = "local-rag",
+        persist_directory: Optional[str] = None,
+        quantization: str = "float16",
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        """Create a collection from texts, mirroring `Chroma.from_texts`."""
+        store = cls(
+            collection_name=collection_name,
+            embedding_function=embedding,
+            persist_directory=persist_directory,
+            quantization=quantization
+        )
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,118 @@
+"""On-demand PDF page rendering with an on-disk LRU image cache."""
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+class PageImageCache:
+    """
+    Renders PDF pages to PNG only when they are viewed and keeps the images on
+    disk, keyed by document digest, page number and render width.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "data/page_cache",
+        max_bytes: int = 512 * 1024 * 1024,
+        min_age_seconds: float = 60.0
+    ):
+        """
+        Parameters:
+            cache_dir (str): Directory holding rendered page images.
+            max_bytes (int): Total size of cached images before the least
+                recently viewed ones are evicted.
+            min_age_seconds (float): Images viewed more recently than this are
+                never evicted, so a page just returned to one session is not
+                deleted by another session's eviction before it is displayed.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.min_age_seconds = min_age_seconds
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str, page_number: int, width: int) -> Path:
+        return self.cache_dir / f"{digest[:32]}_{page_number}_{width}.png"
+
+    @staticmethod
+    def page_count(data: bytes) -> int:
+        """Return the number of pages in a PDF."""
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(data)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def get_pages(self, data: bytes, digest: str, page_numbers: Iterable[int], width: int) -> List[Path]:
+        """
+        Return image paths for the requested pages (1-based), rendering only
+        the ones not already cached at this width.
+        """
+        page_numbers = list(page_numbers)
+        paths = [self._path(digest, number, width) for number in page_numbers]
+        missing = []
+        for number, path in zip(page_numbers, paths):
+            try:
+                os.utime(path)  # mark as recently used
+            except FileNotFoundError:
+                # Never rendered, or evicted by another process since
+                missing.append((number, path))
+        if missing:
+            self._render(data, missing, width)
+            self._evict(keep=set(paths))
+        return paths
+
+    def _render(self, data: bytes, pages: List, width: int) -> None:
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(data)
+        try:
+            for number, path in pages:
+                page = pdf[number - 1]
+                try:
+                    bitmap = page.render(scale=width / page.get_width())
+                    # A unique temp file per writer, so concurrent renders of a page cannot mix their bytes
+                    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as tmp:
+                        try:
+                            bitmap.to_pil().save(tmp, format="PNG")
+                        except Exception:
+                            tmp.close()
+                            os.unlink(tmp.name)
+                            raise
+                    os.replace(tmp.name, path)
+                finally:
+                    page.close()
+            logger.info(f"Rendered {len(pages)} PDF pages at width {width}")
+        finally:
+            pdf.close()
+
+    def _evict(self, keep: set) -> None:
+        """
+        Delete the least recently used images while the cache exceeds `max_bytes`,
+        sparing any viewed within the last `min_age_seconds`.
+        """
+        with self._lock:
+            files = []
+            for path in self.cache_dir.glob("*.png"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process
+                files.append((stat.st_mtime, stat.st_size, path))
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            cutoff = time.time() - self.min_age_seconds
+            for mtime, size, path in files:
+                if total <= self.max_bytes or mtime > cutoff:
+                    break
+                if path in keep:
+                    continue
+                total -= size
+                path.unlink(missing_ok=True)
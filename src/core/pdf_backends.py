@@ -0,0 +1,180 @@
+"""Pluggable PDF text extraction backends with per-page hi-res fallback."""
+import io
+import logging
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple, Type, Union
+
+logger = logging.getLogger(__name__)
+
+PDFSource = Union[str, bytes, BinaryIO]
+
+def _read_bytes(source: PDFSource) -> bytes:
+    """Return the raw bytes of a PDF given as a path, bytes or a file-like object."""
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    source.seek(0)
+    return source.read()
+
+class PDFBackend:
+    """Base class for text extractors that work one page at a time."""
+
+    name = ""
+
+    def iter_pages(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) for each page, starting at 1."""
+        raise NotImplementedError
+
+    def extract_page(self, data: bytes, page_number: int) -> str:
+        """Extract the text of a single page."""
+        for number, text in self.iter_pages(data):
+            if number == page_number:
+                return text
+        return ""
+
+    def extract_pages(self, data: bytes) -> Dict[int, str]:
+        """Extract the text of every page in one pass, keyed by page number."""
+        return dict(self.iter_pages(data))
+
+class PypdfiumBackend(PDFBackend):
+    """Text layer extraction through PDFium; the fastest backend."""
+
+    name = "pypdfium2"
+
+    def iter_pages(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(data)
+        try:
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    yield index + 1, textpage.get_text_range().replace("\r\n", "\n")
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            pdf.close()
+
+class PypdfBackend(PDFBackend):
+    """Pure-Python text layer extraction through pypdf."""
+
+    name = "pypdf"
+
+    def iter_pages(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        from pypdf import PdfReader
+
+        reader = PdfReader(io.BytesIO(data))
+        for index, page in enumerate(reader.pages):
+            yield index + 1, page.extract_text() or ""
+
+class PdfplumberBackend(PDFBackend):
+    """Layout-aware text layer extraction through pdfplumber."""
+
+    name = "pdfplumber"
+
+    def iter_pages(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        import pdfplumber
+
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            for index, page in enumerate(pdf.pages):
+                try:
+                    yield index + 1, page.extract_text() or ""
+                finally:
+                    page.close()
+
+class UnstructuredBackend(PDFBackend):
+    """Unstructured's partitioning with OCR; slow, but works on scanned pages."""
+
+    name = "unstructured"
+
+    def __init__(self, strategy: str = "hi_res"):
+        self.strategy = strategy
+
+    def _partition(self, data: bytes) -> Dict[int, str]:
+        from unstructured.partition.pdf import partition_pdf
+
+        pages: Dict[int, list] = {}
+        for element in partition_pdf(file=io.BytesIO(data), strategy=self.strategy):
+            pages.setdefault(element.metadata.page_number or 1, []).append(str(element))
+        return {number: "\n\n".join(texts) for number, texts in pages.items()}
+
+    def iter_pages(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        from pypdf import PdfReader
+
+        texts = self._partition(data)
+        for number in range(1, len(PdfReader(io.BytesIO(data)).pages) + 1):
+            yield number, texts.get(number, "")
+
+    def extract_pages(self, data: bytes) -> Dict[int, str]:
+        return self._partition(data)
+
+    def extract_page(self, data: bytes, page_number: int) -> str:
+        """Partition only the requested page by copying it into a one-page PDF."""
+        from pypdf import PdfReader, PdfWriter
+
+        writer = PdfWriter()
+        writer.add_page(PdfReader(io.BytesIO(data)).pages[page_number - 1])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return self._partition(buffer.getvalue()).get(1, "")
+
+BACKENDS: Dict[str, Type[PDFBackend]] = {
+    backend.name: backend
+    for backend in (PypdfiumBackend, PypdfBackend, PdfplumberBackend, UnstructuredBackend)
+}
+
+def get_backend(name: str) -> PDFBackend:
+    """Instantiate a backend by name."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend: {name} (available: {', '.join(BACKENDS)})")
+
+class PDFTextExtractor:
+    """
+    Extracts text page by page with a fast backend and escalates to a heavier
+    one only for pages whose text layer is missing or too short to be usable.
+
+    The first such page is extracted on its own. From the second one on, the
+    document is assumed to be scanned: the fallback processes the whole
+    document once and the remaining pages are served from that pass, instead
+    of starting the fallback again for every page.
+    """
+
+    def __init__(self, backend: str = "pypdfium2", fallback: Optional[str] = "unstructured", min_chars: int = 20):
+        """
+        Parameters:
+            backend (str): Name of the primary backend.
+            fallback (Optional[str]): Backend used for pages without a usable text layer, or None.
+            min_chars (int): Pages with fewer non-whitespace characters are sent to the fallback.
+        """
+        self.backend = get_backend(backend)
+        self.fallback = get_backend(fallback) if fallback else None
+        self.min_chars = min_chars
+        self.fallback_pages = 0
+
+    def iter_pages(self, source: PDFSource) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) for each page of the PDF."""
+        data = _read_bytes(source)
+        fallback_calls = 0
+        # Whole-document fallback pass, consumed page by page
+        fallback_texts: Optional[Dict[int, str]] = None
+        for page_number, text in self.backend.iter_pages(data):
+            if self.fallback is not None and len("".join(text.split())) < self.min_chars:
+                try:
+                    logger.info(f"Page {page_number} has no usable text layer, using {self.fallback.name}")
+                    if fallback_texts is None and fallback_calls > 0:
+                        fallback_texts = self.fallback.extract_pages(data)
+                    fallback_calls += 1
+                    if fallback_texts is not None:
+                        fallback_text = fallback_texts.pop(page_number, "")
+                    else:
+                        fallback_text = self.fallback.extract_page(data, page_number)
+                    text = fallback_text or text
+                    self.fallback_pages += 1
+                except Exception as e:
+                    logger.error(f"Fallback extraction failed for page {page_number}: {e}")
+            yield page_number, text
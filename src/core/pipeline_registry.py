@@ -0,0 +1,91 @@
+"""Process-wide LRU registry of built LLM clients, retrievers and chains."""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class PipelineRegistry:
+    """
+    Builds expensive objects once per key and hands out the cached instance.
+
+    Keys are typically (model, collection, prompt config). Lookups are
+    thread-safe; concurrent requests for a missing key wait for a single
+    build instead of building it twice, and builds of different keys run in
+    parallel. The least recently used entry is evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        """
+        Parameters:
+            max_entries (int): Maximum number of cached objects.
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._building: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """Return the object cached under `key`, building it with `factory` on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+            try:
+                value = factory()
+            except BaseException:
+                with self._lock:
+                    self._building.pop(key, None)
+                raise
+            # Publish the value and retire the build lock together, so no caller finds neither
+            with self._lock:
+                self._building.pop(key, None)
+                self.misses += 1
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self.evictions += 1
+                    logger.info(f"Evicted pipeline {evicted}")
+        logger.info(f"Built pipeline {key}")
+        return value
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches `predicate`; returns how many were dropped."""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Return size, hits, builds and evictions."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,29 +1,404 @@
 """RAG pipeline implementation."""
+import asyncio
+import contextvars
 import logging
-from typing import Any
-from langchain_core.runnables import RunnablePassthrough
+import re
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
-from langchain.retrievers.multi_query import MultiQueryRetriever
+from .budget import (
+    FEWER_CHUNKS,
+    LEXICAL_ONLY,
+    REWRITE_SKIPPED,
+    LatencyBudget,
+    RequestDeadline,
+    StageTimeout,
+    astream_within_budget,
+    current_deadline,
+    degrade,
+    mark_generation_start,
+    request_deadline,
+    run_with_timeout,
+    stage_timeout,
+    stream_within_budget,
+)
+from .answer_cache import SemanticAnswerCache, collection_version
+from .context import ContextPacker
+from .lexical_index import BM25Index
 from .llm import LLMManager
+from .manifest import DocumentManifest
+from .query_cache import LRUCache, normalize_question
+from .scheduler import RequestScheduler
+from .token_stream import AsyncTokenStream, GenerationStats, TokenStream
 
 logger = logging.getLogger(__name__)
 
+_LIST_MARKER_RE = re.compile(r"^\s*(?:[-*•]|\d+[.):]|[A-Za-z][.)])\s*")
+_REASONING_RE = re.compile(r"<(think|thinking|reasoning)>.*?(?:</\1>|\Z)", re.S | re.I)
+_REASONING_END_RE = re.compile(r"^.*</(?:think|thinking|reasoning)>", re.S | re.I)
+MAX_QUERY_CHARS = 300
+
+# Stats of the request being answered; the retriever records its rewrite here
+_request_stats: contextvars.ContextVar[Optional[GenerationStats]] = contextvars.ContextVar("request_stats", default=None)
+
+@contextmanager
+def recording_stats(stats: GenerationStats) -> Iterator[None]:
+    """Let retrievers running for the enclosed request record rewrite latency and variations in `stats`."""
+    token = _request_stats.set(stats)
+    try:
+        yield
+    finally:
+        _request_stats.reset(token)
+
+def strip_reasoning(text: str) -> str:
+    """
+    Remove the reasoning of models such as deepseek-r1: `<think>` blocks, an
+    unterminated block cut off by the token cap, and everything before a
+    closing tag whose opening tag was not emitted.
+    """
+    return _REASONING_END_RE.sub("", _REASONING_RE.sub("", text)).strip()
+
+def normalize_variations(question: str, generated: str, max_variations: int) -> List[str]:
+    """
+    Turn raw rewrite output into a deduplicated list of queries.
+
+    The original question always comes first. Reasoning blocks, list markers,
+    emphasis and quotes are stripped; preambles ("Here are two versions:"),
+    overlong lines and lines that only differ in case or whitespace are dropped.
+    """
+    queries: List[str] = []
+    seen = set()
+    for line in [question] + strip_reasoning(generated).splitlines():
+        query = _LIST_MARKER_RE.sub("", line).replace("**", "").strip().strip("\"'").strip()
+        key = " ".join(query.lower().split()).rstrip("?.! ")
+        if not key or key in seen:
+            continue
+        if queries and (query.endswith(":") or len(query) > MAX_QUERY_CHARS):
+            continue
+        seen.add(key)
+        queries.append(query)
+        if len(queries) > max_variations:
+            break
+    return queries
+
+def reciprocal_rank_fusion(result_lists: Sequence[Sequence[Document]], k: int = 60) -> List[Document]:
+    """Fuse ranked result lists, scoring each document by the sum of 1 / (k + rank)."""
+    scores: Dict[tuple, float] = {}
+    documents: Dict[tuple, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = (doc.page_content, doc.metadata.get("source"), doc.metadata.get("page"))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+class ParallelMultiQueryRetriever(BaseRetriever):
+    """
+    Multi-query retriever that embeds all query variations in one batched call
+    and runs their vector searches concurrently, fusing the results with
+    reciprocal-rank fusion.
+
+    Optional caches skip the rewrite LLM call for repeated questions
+    (keyed by rewrite model and normalized question) and the embedding
+    round-trip for repeated query texts (keyed by embedding model and text).
+
+    With `speculative` set, the original question is searched while the
+    variations are still being generated, and the variation results are
+    fused in once they arrive.
+
+    Within a `request_deadline`, each stage is bounded by its budget: a
+    rewrite that runs out of time is skipped (the late rewrite still fills
+    the variation cache), searches that run out of time leave fewer chunks,
+    and an embedding or search round without any result raises StageTimeout.
+    """
+
+    vector_db: Any
+    embeddings: Embeddings
+    llm_chain: Runnable
+    k: int = 4
+    max_variations: int = 3
+    rrf_k: int = 60
+    model_name: str = ""
+    embedding_model: str = ""
+    variation_cache: Optional[LRUCache] = None
+    embedding_cache: Optional[LRUCache] = None
+    speculative: bool = True
+
+    @classmethod
+    def from_llm(
+        cls,
+        vector_db: Any,
+        llm: BaseLanguageModel,
+        prompt: BasePromptTemplate,
+        **kwargs: Any
+    ) -> "ParallelMultiQueryRetriever":
+        """
+        Build the retriever from a vector store, the rewrite LLM and its prompt.
+
+        Queries are embedded with the store's embedder unless `embeddings` is passed.
+        """
+        kwargs.setdefault("embeddings", vector_db.embeddings)
+        return cls(
+            vector_db=vector_db,
+            llm_chain=prompt | llm | StrOutputParser(),
+            **kwargs
+        )
+
+    def cached_queries(self, question: str) -> Optional[List[str]]:
+        """Return the variations cached for a question, if any."""
+        if self.variation_cache is None:
+            return None
+        cached = self.variation_cache.get((self.model_name, normalize_question(question)))
+        return list(cached) if cached is not None else None
+
+    def generate_queries(self, question: str) -> List[str]:
+        """Ask the LLM for query variations and normalize them."""
+        key = (self.model_name, normalize_question(question))
+        cached = self.cached_queries(question)
+        if cached is not None:
+            return cached
+        try:
+            generated = self.llm_chain.invoke({"question": question})
+        except Exception as e:
+            # Answering with the original question alone beats failing the request
+            logger.error(f"Query rewrite with {self.model_name} failed, searching the question only: {e}")
+            return [question]
+        queries = normalize_variations(question, generated, self.max_variations)
+        if self.variation_cache is not None:
+            self.variation_cache.put(key, tuple(queries))
+        return queries
+
+    def _await_rewrite(self, rewrite: Any, question: str, timeout: Optional[float]) -> List[str]:
+        """Wait for a submitted rewrite; past the timeout, continue with the original question."""
+        try:
+            return rewrite.result(timeout=timeout)
+        except FuturesTimeoutError:
+            degrade(REWRITE_SKIPPED, f"query rewrite with {self.model_name} exceeded its {stage_timeout('rewrite'):.2f}s budget")
+            return [question]
+
+    def _start_rewrite(self, question: str) -> Any:
+        """Generate the variations in a background thread and return its future."""
+        # The rewrite thread inherits the request's context, e.g. its scheduling priority
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rewrite")
+        rewrite = executor.submit(contextvars.copy_context().run, self.generate_queries, question)
+        executor.shutdown(wait=False)
+        return rewrite
+
+    def embed_within_budget(self, queries: List[str]) -> List[List[float]]:
+        """`embed_queries` bounded by the request's embed budget; raises StageTimeout past it."""
+        timeout = stage_timeout("embed")
+        try:
+            return run_with_timeout(self.embed_queries, timeout, queries)
+        except FuturesTimeoutError:
+            raise StageTimeout("embed", timeout)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed queries in one batched call, serving repeated texts from the cache."""
+        if self.embedding_cache is None:
+            return self.embeddings.embed_documents(queries)
+        vectors = [self.embedding_cache.get((self.embedding_model, query)) for query in queries]
+        missing = [query for query, vector in zip(queries, vectors) if vector is None]
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for query, vector in fresh.items():
+                self.embedding_cache.put((self.embedding_model, query), vector)
+            vectors = [vector if vector is not None else fresh[query] for query, vector in zip(queries, vectors)]
+        return vectors
+
+    def search(self, queries: List[str]) -> List[Document]:
+        """Embed all queries in one call, search concurrently and fuse the results."""
+        return self.search_by_vectors(self.embed_queries(queries))
+
+    def search_lists(self, vectors: List[List[float]]) -> List[List[Document]]:
+        """
+        Run one vector search per query embedding concurrently; returns one ranked list each.
+
+        Searches still running when the request's retrieve budget runs out
+        are dropped, so fewer lists come back; if none finished, StageTimeout is raised.
+        """
+        if not vectors:
+            return []
+        timeout = stage_timeout("retrieve")
+        executor = ThreadPoolExecutor(max_workers=len(vectors))
+        futures = [executor.submit(self.vector_db.similarity_search_by_vector, vector, k=self.k) for vector in vectors]
+        executor.shutdown(wait=False)
+        done, pending = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+        if pending and not any(future.exception() for future in done):
+            if len(pending) == len(futures):
+                raise StageTimeout("retrieve", timeout)
+            degrade(FEWER_CHUNKS, f"{len(pending)} of {len(futures)} searches exceeded the {timeout:.2f}s retrieve budget")
+        return [future.result() for future in futures if future in done]
+
+    def search_by_vectors(self, vectors: List[List[float]]) -> List[Document]:
+        """Run one vector search per query embedding concurrently and fuse the results."""
+        return reciprocal_rank_fusion(self.search_lists(vectors), k=self.rrf_k)
+
+    def _speculative_search(self, question: str) -> Tuple[List[Document], List[str], float]:
+        """
+        Search the original question while the variations are generated.
+
+        Returns the fused documents, the queries used and the seconds spent
+        waiting for the rewrite.
+        """
+        start = time.perf_counter()
+        rewrite = self._start_rewrite(question)
+        results = self.search_lists(self.embed_within_budget([question]))
+        timeout = stage_timeout("rewrite")
+        if timeout is not None:
+            timeout = max(0.0, timeout - (time.perf_counter() - start))
+        queries = self._await_rewrite(rewrite, question, timeout)
+        rewritten = time.perf_counter()
+        try:
+            results += self.search_lists(self.embed_within_budget(queries[1:]))
+        except StageTimeout as e:
+            # The original question's results are enough to answer from
+            degrade(REWRITE_SKIPPED, f"variations dropped: {e}")
+            queries = [question]
+        return reciprocal_rank_fusion(results, k=self.rrf_k), queries, rewritten - start
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        start = time.perf_counter()
+        if self.speculative and self.cached_queries(query) is None:
+            documents, queries, rewrite_seconds = self._speculative_search(query)
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.rewrite_seconds = rewrite_seconds
+                stats.variations = len(queries) - 1
+            logger.info(
+                f"Retrieved {len(documents)} documents for {len(queries)} queries in "
+                f"{time.perf_counter() - start:.2f}s (speculative; rewrite with {self.model_name} {rewrite_seconds:.2f}s)"
+            )
+            return documents
+        if self.cached_queries(query) is not None or stage_timeout("rewrite") is None:
+            queries = self.generate_queries(query)
+        else:
+            queries = self._await_rewrite(self._start_rewrite(query), query, stage_timeout("rewrite"))
+        rewritten = time.perf_counter()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.rewrite_seconds = rewritten - start
+            stats.variations = len(queries) - 1
+        documents = reciprocal_rank_fusion(self.search_lists(self.embed_within_budget(queries)), k=self.rrf_k)
+        logger.info(
+            f"Retrieved {len(documents)} documents for {len(queries)} queries "
+            f"(rewrite with {self.model_name} {rewritten - start:.2f}s, search {time.perf_counter() - rewritten:.2f}s)"
+        )
+        return documents
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines BM25 over the collection's inverted index with a vector retriever.
+
+    In "hybrid" mode both result lists are fused with reciprocal-rank fusion,
+    so exact identifiers found lexically surface next to semantic matches.
+    "lexical" mode answers from the inverted index alone, without an LLM
+    rewrite or embedding call; "vector" mode ignores the index unless the
+    vector side runs out of its latency budget, in which case every mode
+    falls back to the lexical results.
+    """
+
+    lexical_index: BM25Index
+    vector_retriever: Optional[BaseRetriever] = None
+    k: int = 4
+    mode: str = "hybrid"
+    rrf_k: int = 60
+
+    def lexical_search(self, query: str) -> List[Document]:
+        """Return the top BM25 matches for a query."""
+        return [doc for doc, _ in self.lexical_index.search(query, k=self.k)]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        start = time.perf_counter()
+        if self.mode == "lexical" or self.vector_retriever is None:
+            documents = self.lexical_search(query)
+        else:
+            try:
+                vector_documents = self.vector_retriever.invoke(query)
+            except StageTimeout as e:
+                degrade(LEXICAL_ONLY, f"vector retrieval gave up: {e}")
+                return self.lexical_search(query)
+            if self.mode == "vector":
+                documents = vector_documents
+            else:
+                documents = reciprocal_rank_fusion([vector_documents, self.lexical_search(query)], k=self.rrf_k)
+        logger.info(f"{self.mode.capitalize()} retrieval returned {len(documents)} documents in {time.perf_counter() - start:.3f}s")
+        return documents
+
 class RAGPipeline:
     """Manages the RAG (Retrieval Augmented Generation) pipeline."""
     
-    def __init__(self, vector_db: Any, llm_manager: LLMManager):
+    def __init__(
+        self,
+        vector_db: Any,
+        llm_manager: LLMManager,
+        context_packer: Optional[ContextPacker] = None,
+        k: int = 4,
+        max_variations: int = 3,
+        variation_cache: Optional[LRUCache] = None,
+        embedding_cache: Optional[LRUCache] = None,
+        embedding_model: str = "",
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        lexical_index: Optional[BM25Index] = None,
+        retrieval_mode: str = "hybrid",
+        scheduler: Optional[RequestScheduler] = None,
+        speculative: bool = True,
+        latency_budget: Optional[LatencyBudget] = None,
+        manifest: Optional[DocumentManifest] = None
+    ):
         self.vector_db = vector_db
         self.llm_manager = llm_manager
+        self.context_packer = context_packer or ContextPacker()
+        self.k = k
+        self.max_variations = max_variations
+        self.variation_cache = variation_cache
+        # The answer cache embeds the question first; a query embedding cache
+        # lets retrieval reuse that vector instead of embedding it again
+        if embedding_cache is None and answer_cache is not None:
+            embedding_cache = LRUCache(max_entries=256)
+        self.embedding_cache = embedding_cache
+        self.embedding_model = embedding_model
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index
+        self.retrieval_mode = retrieval_mode
+        self.scheduler = scheduler
+        self.speculative = speculative
+        self.latency_budget = latency_budget or LatencyBudget()
+        # Versions named collections for the answer cache without reading their chunks
+        self.manifest = manifest
+        # Generations go through the scheduler's shared, prioritized slots
+        self.llm = scheduler.schedule(llm_manager.llm) if scheduler is not None else llm_manager.llm
+        # Query rewriting may use a smaller, faster model than answering
+        self.rewrite_llm = llm_manager.rewrite_llm
+        if scheduler is not None:
+            # Rewrites have their own slots, so an abandoned one cannot delay the answer
+            self.rewrite_llm = scheduler.schedule_rewrite(llm_manager.rewrite_llm)
         self.retriever = self._setup_retriever()
         self.chain = self._setup_chain()
     
-    def _setup_retriever(self) -> MultiQueryRetriever:
+    def _setup_retriever(self) -> ParallelMultiQueryRetriever:
         """Set up the multi-query retriever."""
         try:
-            return MultiQueryRetriever.from_llm(
-                retriever=self.vector_db.as_retriever(),
-                llm=self.llm_manager.llm,
-                prompt=self.llm_manager.get_query_prompt()
+            return ParallelMultiQueryRetriever.from_llm(
+                vector_db=self.vector_db,
+                llm=self.rewrite_llm,
+                prompt=self.llm_manager.get_query_prompt(),
+                embeddings=self.scheduler.embeddings if self.scheduler is not None else self.vector_db.embeddings,
+                k=self.k,
+                max_variations=self.max_variations,
+                model_name=self.llm_manager.rewrite_model_name,
+                embedding_model=self.embedding_model,
+                variation_cache=self.variation_cache,
+                embedding_cache=self.embedding_cache,
+                speculative=self.speculative
             )
         except Exception as e:
             logger.error(f"Error setting up retriever: {e}")
@@ -33,20 +408,165 @@ class RAGPipeline:
         """Set up the RAG chain."""
         try:
             return (
-                {"context": self.retriever, "question": RunnablePassthrough()}
+                {"context": self._context_retriever(), "question": RunnablePassthrough()}
+                | RunnableLambda(self._pack_context)
                 | self.llm_manager.get_rag_prompt()
-                | self.llm_manager.llm
+                | self.llm
                 | StrOutputParser()
             )
         except Exception as e:
             logger.error(f"Error setting up chain: {e}")
             raise
     
+    def _context_retriever(self) -> BaseRetriever:
+        """
+        Return the retriever feeding the chain, combined with BM25 when an index is available.
+
+        In "vector" mode the index is only searched when vector retrieval runs out of budget.
+        """
+        if self.lexical_index is None:
+            return self.retriever
+        return HybridRetriever(
+            lexical_index=self.lexical_index,
+            vector_retriever=self.retriever,
+            k=self.k,
+            mode=self.retrieval_mode
+        )
+
+    def _pack_context(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """Fit the retrieved documents into the model's context token budget."""
+        # Retrieval is done; the rest of the request counts against the generate budget
+        mark_generation_start()
+        return {
+            "context": self.context_packer.pack(inputs["question"], inputs["context"]),
+            "question": inputs["question"],
+        }
+    
+    def _lookup_answer(self, question: str) -> Tuple[Optional[str], Optional[Callable[[str], None]]]:
+        """
+        Serve semantically equivalent questions about the same collection version from the cache.
+
+        Returns the cached answer, or None together with a callback that stores the fresh answer.
+        """
+        # Lexical-only retrieval must not wait on an embedding call
+        if self.answer_cache is None or (self.lexical_index is not None and self.retrieval_mode == "lexical"):
+            return None, None
+        try:
+            question_vector = self.retriever.embed_within_budget([question])[0]
+        except StageTimeout as e:
+            logger.warning(f"Skipping the answer cache: {e}")
+            return None, None
+        version = collection_version(self.vector_db, self.manifest)
+        model = self.llm_manager.model_name
+        answer = self.answer_cache.lookup(question_vector, version, model)
+        deadline = current_deadline()
+
+        def store(text: str) -> None:
+            # A degraded answer must not be served to later askers
+            if deadline is None or not deadline.degradations:
+                self.answer_cache.store(question_vector, text, version, model)
+        return answer, store
+
+    def _deadline(self) -> RequestDeadline:
+        """A deadline for one request, recording its degradations in the request's stats when recorded."""
+        stats = _request_stats.get()
+        return RequestDeadline(self.latency_budget, stats.degradations if stats is not None else None)
+
+    def _answer(self, question: str) -> str:
+        if self.latency_budget.generate is None:
+            return self.chain.invoke(question)
+        # Streamed internally so a slow generation can be cut at the budget
+        return "".join(stream_within_budget(self.chain.stream(question)))
+
+    async def _aanswer(self, question: str) -> str:
+        if self.latency_budget.generate is None:
+            return await self.chain.ainvoke(question)
+        return "".join([chunk async for chunk in astream_within_budget(self.chain.astream(question))])
+
     def get_response(self, question: str) -> str:
-        """Get response for a question using the RAG pipeline."""
+        """
+        Get response for a question using the RAG pipeline.
+
+        Stages are bounded by the latency budget; to learn which degradations
+        were applied, call inside `recording_stats` and read `degradations`.
+        """
         try:
             logger.info(f"Getting response for question: {question}")
-            return self.chain.invoke(question)
+            with request_deadline(self._deadline()):
+                answer, store = self._lookup_answer(question)
+                if answer is None:
+                    answer = self._answer(question)
+                    if store is not None:
+                        store(answer)
+            return answer
         except Exception as e:
             logger.error(f"Error getting response: {e}")
+            raise
+
+    async def aget_response(self, question: str) -> str:
+        """Async variant of `get_response`; the cache lookup runs in a worker thread."""
+        try:
+            logger.info(f"Getting response for question: {question}")
+            with request_deadline(self._deadline()):
+                answer, store = await asyncio.to_thread(self._lookup_answer, question)
+                if answer is None:
+                    answer = await self._aanswer(question)
+                    if store is not None:
+                        store(answer)
+            return answer
+        except Exception as e:
+            logger.error(f"Error getting response: {e}")
+            raise
+
+    def stream(self, question: str) -> TokenStream:
+        """
+        Stream the response token by token.
+
+        The returned stream is iterated for text chunks; once iteration
+        finishes its `stats` hold the time to first token, tokens/s, the
+        rewrite latency and number of variations used for retrieval, and the
+        degradations applied to stay within the latency budget.
+        """
+        start = time.perf_counter()
+        try:
+            logger.info(f"Streaming response for question: {question}")
+            stats = GenerationStats()
+            deadline = RequestDeadline(self.latency_budget, stats.degradations)
+            with request_deadline(deadline):
+                answer, store = self._lookup_answer(question)
+            if answer is not None:
+                return TokenStream([answer], start=start, cached=True)
+
+            # The chain runs lazily while the stream is iterated, so record from inside the iteration
+            def chunks():
+                with recording_stats(stream.stats), request_deadline(deadline):
+                    yield from stream_within_budget(self.chain.stream(question))
+            stream = TokenStream(chunks(), on_complete=store, start=start, stats=stats)
+            return stream
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            raise
+
+    async def astream(self, question: str) -> AsyncTokenStream:
+        """Async variant of `stream`; the cache lookup runs in a worker thread."""
+        start = time.perf_counter()
+        try:
+            logger.info(f"Streaming response for question: {question}")
+            stats = GenerationStats()
+            deadline = RequestDeadline(self.latency_budget, stats.degradations)
+            with request_deadline(deadline):
+                answer, store = await asyncio.to_thread(self._lookup_answer, question)
+            if answer is not None:
+                async def replay():
+                    yield answer
+                return AsyncTokenStream(replay(), start=start, cached=True)
+
+            async def chunks():
+                with recording_stats(stream.stats), request_deadline(deadline):
+                    async for chunk in astream_within_budget(self.chain.astream(question)):
+                        yield chunk
+            stream = AsyncTokenStream(chunks(), on_complete=store, start=start, stats=stats)
+            return stream
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
             raise 
\ No newline at end of file
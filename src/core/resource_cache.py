@@ -0,0 +1,236 @@
+"""Process-wide, reference-counted cache of resources shared across sessions."""
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class _Entry:
+    __slots__ = ("value", "refs", "last_used", "on_evict")
+
+    def __init__(self, value: Any, on_evict: Optional[Callable[[Any], None]]):
+        self.value = value
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.on_evict = on_evict
+
+class Lease(Generic[T]):
+    """
+    A reference to a shared resource; `value` is the resource.
+
+    Release it with `release()` or a `with` block. A lease that is garbage
+    collected without being released, e.g. with the Streamlit session that
+    held it, releases itself.
+    """
+
+    def __init__(self, cache: "SharedResourceCache", key: Hashable, entry: _Entry):
+        self.key = key
+        self.value: T = entry.value
+        self._entry = entry
+        # Bound to the entry, so a lease outliving `discard` cannot release a rebuilt resource
+        self._finalizer = weakref.finalize(self, cache._release, entry)
+
+    def release(self) -> None:
+        """Drop this reference; safe to call more than once."""
+        self._finalizer()
+
+    @property
+    def released(self) -> bool:
+        return not self._finalizer.alive
+
+    def __enter__(self) -> T:
+        return self.value
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+class SharedResourceCache:
+    """
+    Hands out one shared instance per key to every session that asks.
+
+    `acquire` builds a missing resource once, even when several sessions ask
+    at the same time, and counts the leases taken on it. A resource without
+    leases stays cached for `idle_seconds` so the next session can reuse it,
+    then a background sweep evicts it and calls its `on_evict` hook. Memory
+    and build work therefore scale with the number of distinct resources in
+    use, not with the number of sessions using them.
+    """
+
+    def __init__(self, idle_seconds: float = 900.0, sweep_interval: float = 60.0):
+        """
+        Parameters:
+            idle_seconds (float): Seconds an unreferenced resource is kept for reuse.
+            sweep_interval (float): Seconds between idle sweeps; 0 sweeps only on `acquire`.
+        """
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._building: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def acquire(
+        self,
+        key: Hashable,
+        factory: Callable[[], Optional[T]],
+        on_evict: Optional[Callable[[T], None]] = None
+    ) -> Optional[Lease[T]]:
+        """
+        Lease the resource cached under `key`, building it with `factory` on a miss.
+
+        A factory that returns None caches nothing, and None is returned.
+        `on_evict` receives the resource when it is evicted or discarded.
+        """
+        self._start_sweeper()
+        self.evict_idle()
+        with self._lock:
+            lease = self._lease(key)
+            if lease is not None:
+                return lease
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                lease = self._lease(key)
+                if lease is not None:
+                    return lease
+            try:
+                start = time.perf_counter()
+                value = factory()
+            except BaseException:
+                with self._lock:
+                    self._building.pop(key, None)
+                raise
+            # Publish the value and retire the build lock together, so no caller finds neither
+            with self._lock:
+                self._building.pop(key, None)
+                if value is None:
+                    return None
+                self.builds += 1
+                entry = _Entry(value, on_evict)
+                self._entries[key] = entry
+                entry.refs += 1
+                lease = Lease(self, key, entry)
+        logger.info(f"Built shared resource {key} in {time.perf_counter() - start:.2f}s")
+        return lease
+
+    def _lease(self, key: Hashable) -> Optional[Lease]:
+        """Take a lease on a cached entry. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.refs += 1
+        entry.last_used = time.monotonic()
+        self.hits += 1
+        return Lease(self, key, entry)
+
+    def _release(self, entry: _Entry) -> None:
+        with self._lock:
+            if entry.refs > 0:
+                entry.refs -= 1
+                entry.last_used = time.monotonic()
+
+    def release_or_destroy(self, lease: Lease[T], destroy: Callable[[T], None]) -> bool:
+        """
+        Release `lease` and, if it was the last lease on its resource, drop the
+        resource and call `destroy` on it, e.g. to delete the collection behind it.
+
+        Returns True if the resource was destroyed. While `destroy` runs,
+        `acquire` calls for the same key wait and then build a new resource.
+        """
+        key = lease.key
+        with self._lock:
+            if lease._finalizer.detach() is None:
+                return False
+            entry = lease._entry
+            if entry.refs > 0:
+                entry.refs -= 1
+                entry.last_used = time.monotonic()
+            if entry.refs > 0 or self._entries.get(key) is not entry:
+                return False
+            del self._entries[key]
+            # Held until `destroy` is done, so no session reopens what is being deleted
+            build_lock = threading.Lock()
+            build_lock.acquire()
+            self._building[key] = build_lock
+        try:
+            destroy(entry.value)
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            build_lock.release()
+        logger.info(f"Destroyed shared resource {key}")
+        return True
+
+    def evict_idle(self) -> int:
+        """Evict resources that had no lease for `idle_seconds`; returns how many were evicted."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                key for key, entry in self._entries.items()
+                if entry.refs == 0 and now - entry.last_used >= self.idle_seconds
+            ]
+            evicted = [(key, self._entries.pop(key)) for key in idle]
+            self.evictions += len(evicted)
+        for key, entry in evicted:
+            logger.info(f"Evicted idle shared resource {key}")
+            self._close(key, entry)
+        return len(evicted)
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Drop every resource whose key matches `predicate`, leased or not,
+        e.g. after the collection behind it was deleted; returns how many were dropped.
+
+        Existing leases keep their value; later `acquire` calls build a new one.
+        """
+        with self._lock:
+            dropped = [(key, self._entries.pop(key)) for key in list(self._entries) if predicate(key)]
+        for key, entry in dropped:
+            self._close(key, entry)
+        return len(dropped)
+
+    def _close(self, key: Hashable, entry: _Entry) -> None:
+        if entry.on_evict is None:
+            return
+        try:
+            entry.on_evict(entry.value)
+        except Exception as e:
+            logger.warning(f"Closing shared resource {key} failed: {e}")
+
+    def _start_sweeper(self) -> None:
+        with self._lock:
+            if self.sweep_interval <= 0 or self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="resource-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            self.evict_idle()
+
+    def stop(self) -> None:
+        """Stop the idle sweep."""
+        self._stop.set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Return size, active leases, hits, builds and evictions."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "leases": sum(entry.refs for entry in self._entries.values()),
+                "hits": self.hits,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,58 @@
+"""Wall time of app script runs: the cold first run (startup) and the reruns after it."""
+import logging
+import statistics
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class RunTimings:
+    """
+    Records how long each run of a Streamlit script takes.
+
+    The first run in a process imports the app's modules and creates the
+    shared clients, so it is reported as startup; every later run is a
+    rerun, kept in a window of the most recent `window` runs.
+    """
+
+    def __init__(self, window: int = 200):
+        """
+        Parameters:
+            window (int): Number of recent reruns the statistics cover.
+        """
+        self.startup: Optional[float] = None
+        self._reruns: "deque[float]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            if self.startup is None:
+                self.startup = seconds
+                logger.info(f"App startup took {seconds:.2f}s")
+                return
+            self._reruns.append(seconds)
+        logger.debug(f"Rerun took {seconds * 1000:.0f} ms")
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            reruns = sorted(self._reruns)
+            startup = self.startup
+        return {
+            "startup_seconds": startup,
+            "reruns": len(reruns),
+            "rerun_median_seconds": statistics.median(reruns) if reruns else None,
+            "rerun_p95_seconds": reruns[min(len(reruns) - 1, int(0.95 * len(reruns)))] if reruns else None,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        if stats["startup_seconds"] is None:
+            return "startup -"
+        summary = f"startup {stats['startup_seconds']:.2f}s"
+        if stats["reruns"]:
+            summary += (
+                f", rerun median {stats['rerun_median_seconds'] * 1000:.0f} ms, "
+                f"p95 {stats['rerun_p95_seconds'] * 1000:.0f} ms ({stats['reruns']} reruns)"
+            )
+        return summary
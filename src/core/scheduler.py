@@ -0,0 +1,358 @@
+"""Request scheduling between the RAG pipeline and Ollama: query-embedding micro-batching and prioritized generation slots."""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE, BATCH = 0, 10
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """
+    Run the enclosed requests at `priority` (lower runs first).
+
+    The priority is a context variable, so it follows the request into the
+    worker threads and tasks LangChain starts for it.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    return _priority.get()
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "wake", "cancelled")
+
+    def __init__(self, priority: int, seq: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.wake = wake
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class PrioritySlots:
+    """
+    Counting semaphore whose waiters are served by priority, then arrival.
+
+    Usable from threads (`hold`) and from asyncio (`ahold`); a released slot
+    is handed directly to the next waiter, so a burst of batch requests cannot
+    slip in ahead of a waiting interactive one.
+    """
+
+    def __init__(self, max_in_flight: int):
+        """
+        Parameters:
+            max_in_flight (int): Number of slots.
+        """
+        self.max_in_flight = max_in_flight
+        self._available = max_in_flight
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.waited = 0
+
+    def _try_acquire(self, priority: int, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """Take a free slot (returns None) or enqueue a waiter (returns it). Caller holds the lock."""
+        if self._available > 0 and not self._waiters:
+            self._available -= 1
+            return None
+        waiter = _Waiter(priority, next(self._seq), wake)
+        heapq.heappush(self._waiters, waiter)
+        self.waited += 1
+        return waiter
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """Withdraw a waiter; returns False if it had already been granted a slot."""
+        with self._lock:
+            if waiter in self._waiters:
+                waiter.cancelled = True
+                return True
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                if not waiter.cancelled:
+                    waiter.wake()
+                    return
+            self._available += 1
+
+    @contextmanager
+    def hold(self, priority: Optional[int] = None) -> Iterator[None]:
+        """Hold a slot for the enclosed block, blocking the thread until one is free."""
+        granted = threading.Event()
+        with self._lock:
+            waiter = self._try_acquire(current_priority() if priority is None else priority, granted.set)
+        if waiter is not None:
+            granted.wait()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def ahold(self, priority: Optional[int] = None) -> AsyncIterator[None]:
+        """Async `hold`; waiting does not block the event loop."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        with self._lock:
+            waiter = self._try_acquire(current_priority() if priority is None else priority, wake)
+        if waiter is not None:
+            try:
+                await granted
+            except asyncio.CancelledError:
+                if not self._cancel(waiter):
+                    self.release()
+                raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": self.max_in_flight - self._available,
+                "waiting": sum(not waiter.cancelled for waiter in self._waiters),
+                "waited": self.waited,
+            }
+
+class ScheduledRunnable(Runnable):
+    """
+    Wraps an LLM (or any runnable) so every call holds a generation slot.
+
+    Streaming calls hold the slot until the last chunk, which is when Ollama
+    is done generating. Priority comes from `request_priority`.
+    """
+
+    def __init__(self, bound: Runnable, slots: PrioritySlots):
+        self.bound = bound
+        self.slots = slots
+
+    @property
+    def InputType(self) -> Any:
+        return self.bound.InputType
+
+    @property
+    def OutputType(self) -> Any:
+        return self.bound.OutputType
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped model's fields, e.g. `model`
+        if name == "bound":
+            raise AttributeError(name)
+        return getattr(self.bound, name)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        with self.slots.hold():
+            return self.bound.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        async with self.slots.ahold():
+            return await self.bound.ainvoke(input, config, **kwargs)
+
+    # In a streamed chain the input is produced by the upstream steps, which
+    # may generate too (query rewriting), so the slot is only taken once the
+    # first input has arrived
+
+    def transform(self, input: Iterator[Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        input = iter(input)
+        for first in input:
+            with self.slots.hold():
+                yield from self.bound.transform(itertools.chain([first], input), config, **kwargs)
+            return
+
+    async def atransform(
+        self,
+        input: AsyncIterator[Any],
+        config: Optional[RunnableConfig] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[Any]:
+        async for first in input:
+            async def rest():
+                yield first
+                async for item in input:
+                    yield item
+            async with self.slots.ahold():
+                async for chunk in self.bound.atransform(rest(), config, **kwargs):
+                    yield chunk
+            return
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        yield from self.transform(iter([input]), config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async def single():
+            yield input
+        async for chunk in self.atransform(single(), config, **kwargs):
+            yield chunk
+
+class QueryEmbeddingBatcher(Embeddings):
+    """
+    Coalesces concurrent query-embedding calls into one batched request.
+
+    A dispatcher thread sends one request at a time. Texts that arrive while
+    a request is in flight, or within `window` seconds of the first waiting
+    text, go out together in the next one, and identical texts are embedded
+    once. A lone caller waits at most `window`. Calls with more than
+    `max_batch` texts, such as document ingestion, bypass the batcher.
+    """
+
+    def __init__(self, embeddings: Embeddings, window: float = 0.005, max_batch: int = 64):
+        """
+        Parameters:
+            embeddings (Embeddings): The backend embedder.
+            window (float): Seconds to wait for more texts after the first one arrives.
+            max_batch (int): Maximum number of texts per request.
+        """
+        self.embeddings = embeddings
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[float, str, Future]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._deduplicated = 0
+
+    def _submit(self, texts: List[str]) -> List[Future]:
+        futures = [Future() for _ in texts]
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, name="embed-batcher", daemon=True)
+                self._thread.start()
+            now = time.monotonic()
+            self._pending.extend((now, text, future) for text, future in zip(texts, futures))
+            self._requests += 1
+            self._texts += len(texts)
+            self._cond.notify()
+        return futures
+
+    def _next_batch(self) -> List[Tuple[float, str, Future]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][0] + self.window
+            while len(self._pending) < self.max_batch and (remaining := deadline - time.monotonic()) > 0:
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            unique = list(dict.fromkeys(text for _, text, _ in batch))
+            try:
+                vectors = dict(zip(unique, self.embeddings.embed_documents(unique)))
+            except Exception as e:
+                logger.error(f"Batched query embedding of {len(unique)} texts failed: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._cond:
+                self._batches += 1
+                self._deduplicated += len(batch) - len(unique)
+            for _, text, future in batch:
+                future.set_result(vectors[text])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if len(texts) > self.max_batch:
+            return self.embeddings.embed_documents(texts)
+        return [future.result() for future in self._submit(texts)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if len(texts) > self.max_batch:
+            return await asyncio.to_thread(self.embeddings.embed_documents, texts)
+        return list(await asyncio.gather(*(asyncio.wrap_future(future) for future in self._submit(texts))))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "requests": self._requests,
+                "texts": self._texts,
+                "batches": self._batches,
+                "deduplicated": self._deduplicated,
+                "texts_per_batch": (self._texts / self._batches) if self._batches else 0.0,
+            }
+
+class RequestScheduler:
+    """
+    Sits between RAG pipelines and one Ollama backend: query embeddings go
+    through a shared `QueryEmbeddingBatcher`, and LLM calls wrapped with
+    `schedule` share `max_generations` prioritized slots.
+
+    Query rewrites wrapped with `schedule_rewrite` take their slots from a
+    separate pool of `max_rewrites`. A request that stops waiting for a slow
+    rewrite leaves it running in the background; in the shared pool, that
+    abandoned rewrite would keep a slot its own answer then queues behind.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_generations: int = 2,
+        embed_window: float = 0.005,
+        max_embed_batch: int = 64,
+        max_rewrites: int = 1
+    ):
+        """
+        Parameters:
+            embeddings (Embeddings): Embedder used for queries.
+            max_generations (int): Answer generations running at once.
+            embed_window (float): Seconds a query embedding waits for others to batch with.
+            max_embed_batch (int): Maximum texts per batched embedding request.
+            max_rewrites (int): Query rewrites running at once.
+        """
+        self.embeddings = QueryEmbeddingBatcher(embeddings, window=embed_window, max_batch=max_embed_batch)
+        self.generation_slots = PrioritySlots(max_generations)
+        self.rewrite_slots = PrioritySlots(max_rewrites)
+
+    def schedule(self, llm: Runnable) -> ScheduledRunnable:
+        """Wrap an LLM so its calls hold a generation slot."""
+        return ScheduledRunnable(llm, self.generation_slots)
+
+    def schedule_rewrite(self, llm: Runnable) -> ScheduledRunnable:
+        """Wrap the LLM that writes query variations so its calls hold a rewrite slot."""
+        return ScheduledRunnable(llm, self.rewrite_slots)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            "embeddings": self.embeddings.stats(),
+            "generations": self.generation_slots.stats(),
+            "rewrites": self.rewrite_slots.stats(),
+        }
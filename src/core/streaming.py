@@ -0,0 +1,130 @@
+"""Streaming page-by-page PDF extraction, chunking and batching with bounded memory."""
+import bisect
+import logging
+import queue
+import threading
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from langchain.schema import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .pdf_backends import PDFSource, PDFTextExtractor
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+def iter_pdf_pages(source: PDFSource, extractor: Optional[PDFTextExtractor] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for each page of a PDF, starting at 1.
+
+    Each page's parsed objects are released as soon as its text is extracted,
+    so memory stays bounded by a single page regardless of document length.
+    """
+    return (extractor or PDFTextExtractor()).iter_pages(source)
+
+def iter_chunks(
+    pages: Iterable[Tuple[int, str]],
+    chunk_size: int = 7500,
+    chunk_overlap: int = 100,
+    source: str = ""
+) -> Iterator[Document]:
+    """
+    Chunk a stream of pages as they arrive.
+
+    Text is buffered only until a chunk is complete; the last, still growing
+    piece is carried over to the next page, so chunks and their overlap span
+    page boundaries instead of being cut at every page break. Each chunk
+    records the page it starts on.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    buffer = ""
+    offsets: List[int] = []  # buffer offset where each page starts
+    page_numbers: List[int] = []
+
+    def page_at(offset: int) -> int:
+        return page_numbers[max(bisect.bisect_right(offsets, offset) - 1, 0)]
+
+    for page_number, text in pages:
+        if buffer:
+            buffer += "\n"
+        offsets.append(len(buffer))
+        page_numbers.append(page_number)
+        buffer += text
+        if len(buffer) <= chunk_size:
+            continue
+
+        pieces = splitter.split_text(buffer)
+        cursor = 0
+        starts = []
+        for piece in pieces:
+            start = buffer.find(piece, cursor)
+            start = cursor if start < 0 else start
+            starts.append(start)
+            cursor = start + 1
+        for piece, start in zip(pieces[:-1], starts[:-1]):
+            yield Document(page_content=piece, metadata={"source": source, "page": page_at(start)})
+
+        # Keep only the trailing piece and the page boundaries it still covers
+        keep_from = starts[-1] if pieces else len(buffer)
+        first_page = page_at(keep_from)
+        kept = [(max(o - keep_from, 0), p) for o, p in zip(offsets, page_numbers) if o > keep_from]
+        offsets = [0] + [o for o, _ in kept]
+        page_numbers = [first_page] + [p for _, p in kept]
+        buffer = buffer[keep_from:]
+
+    if buffer.strip():
+        for piece in splitter.split_text(buffer):
+            start = buffer.find(piece)
+            yield Document(page_content=piece, metadata={"source": source, "page": page_at(max(start, 0))})
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most `batch_size` items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def prefetch(items: Iterable[Any], maxsize: int = 4) -> Iterator[Any]:
+    """
+    Consume `items` in a background thread, keeping at most `maxsize` ready.
+
+    Lets the producer (e.g. PDF parsing) run ahead while the consumer (e.g.
+    embedding) works, without letting it buffer the whole document.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+    errors: List[BaseException] = []
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                while not stopped.is_set():
+                    try:
+                        buffer.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stopped.is_set():
+                    return
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            while not stopped.is_set():
+                try:
+                    buffer.put(_DONE, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while (item := buffer.get()) is not _DONE:
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stopped.set()
@@ -0,0 +1,123 @@
+"""Token streams that record time to first token and generation throughput."""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class GenerationStats:
+    """Latency and throughput of one streamed response."""
+
+    ttft: Optional[float] = None
+    tokens: int = 0
+    seconds: float = 0.0
+    generation_seconds: float = 0.0
+    cached: bool = False
+    rewrite_seconds: Optional[float] = None
+    variations: Optional[int] = None
+    degradations: List[str] = field(default_factory=list)
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.generation_seconds if self.generation_seconds else 0.0
+
+    def summary(self) -> str:
+        ttft = f"{self.ttft:.2f}s" if self.ttft is not None else "-"
+        if self.cached:
+            return f"served from answer cache in {ttft}"
+        summary = f"first token {ttft}, {self.tokens} tokens at {self.tokens_per_second:.1f} tokens/s, total {self.seconds:.2f}s"
+        if self.rewrite_seconds is not None:
+            summary += f", rewrite {self.rewrite_seconds:.2f}s ({self.variations} variations)"
+        if self.degradations:
+            summary += f", degraded: {', '.join(self.degradations)}"
+        return summary
+
+class _StreamBase:
+    def __init__(
+        self,
+        on_complete: Optional[Callable[[str], None]],
+        start: Optional[float],
+        cached: bool,
+        stats: Optional[GenerationStats]
+    ):
+        self.stats = stats if stats is not None else GenerationStats()
+        self.stats.cached = cached
+        self.on_complete = on_complete
+        self._start = start if start is not None else time.perf_counter()
+        self._first: Optional[float] = None
+        self._parts: List[str] = []
+
+    @property
+    def text(self) -> str:
+        """Everything streamed so far."""
+        return "".join(self._parts)
+
+    def _record(self, token: str) -> None:
+        now = time.perf_counter()
+        if self._first is None:
+            self._first = now
+            self.stats.ttft = now - self._start
+        self.stats.tokens += 1
+        self._parts.append(token)
+
+    def _finish(self) -> None:
+        now = time.perf_counter()
+        self.stats.seconds = now - self._start
+        if self._first is not None:
+            self.stats.generation_seconds = now - self._first
+        logger.info(f"Streamed response: {self.stats.summary()}")
+        if self.on_complete is not None:
+            self.on_complete(self.text)
+
+class TokenStream(_StreamBase):
+    """
+    Wraps an iterator of text chunks from an LLM stream.
+
+    Timing starts when the stream is created (or at `start`), so time to first
+    token includes retrieval. Each non-empty chunk counts as one token, which
+    matches how Ollama streams. `on_complete` receives the full text once the
+    stream is exhausted, but not if it is abandoned early. `cached` marks an
+    answer replayed from a cache rather than generated. `stats` may be passed
+    when stages record into it before the stream is created.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[str],
+        on_complete: Optional[Callable[[str], None]] = None,
+        start: Optional[float] = None,
+        cached: bool = False,
+        stats: Optional[GenerationStats] = None
+    ):
+        super().__init__(on_complete, start, cached, stats)
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._chunks:
+            if chunk:
+                self._record(chunk)
+                yield chunk
+        self._finish()
+
+class AsyncTokenStream(_StreamBase):
+    """Async counterpart of `TokenStream`."""
+
+    def __init__(
+        self,
+        chunks: AsyncIterable[str],
+        on_complete: Optional[Callable[[str], None]] = None,
+        start: Optional[float] = None,
+        cached: bool = False,
+        stats: Optional[GenerationStats] = None
+    ):
+        super().__init__(on_complete, start, cached, stats)
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        async for chunk in self._chunks:
+            if chunk:
+                self._record(chunk)
+                yield chunk
+        self._finish()
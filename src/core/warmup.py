@@ -0,0 +1,170 @@
+"""Background model preloading and keep-alive management for Ollama."""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+import ollama
+from langchain_ollama import OllamaEmbeddings
+
+logger = logging.getLogger(__name__)
+
+COLD, LOADING, READY, FAILED = "cold", "loading", "ready", "failed"
+
+def _canonical(model: str) -> str:
+    """Ollama reports untagged models with the ":latest" tag."""
+    return model if ":" in model else f"{model}:latest"
+
+def keep_alive_for(keep_alive_config: Dict[str, Any], model: str) -> Any:
+    """Return a model's keep_alive from the `ollama.keep_alive` config section."""
+    return (keep_alive_config.get("models") or {}).get(model, keep_alive_config["default"])
+
+class KeepAliveOllamaEmbeddings(OllamaEmbeddings):
+    """
+    OllamaEmbeddings that sends `keep_alive` with every request, which the
+    pinned langchain-ollama does not. Without it each embedding call resets
+    the model's keep_alive to the server default.
+    """
+
+    keep_alive: Optional[Union[int, str]] = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._client.embed(self.model, texts, keep_alive=self.keep_alive)["embeddings"]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return (await self._async_client.embed(self.model, texts, keep_alive=self.keep_alive))["embeddings"]
+
+@dataclass
+class ModelState:
+    """Load state of one model as last observed."""
+
+    state: str = COLD
+    kind: str = "chat"
+    load_seconds: Optional[float] = None
+    error: str = ""
+    updated: float = 0.0
+
+class ModelWarmer:
+    """
+    Preloads chat and embedding models in background threads so the first
+    real request does not pay the model load time.
+
+    Each model is loaded with its configured `keep_alive`, and the app's
+    real requests send the same value, so a model stays loaded for
+    `keep_alive` after its last real use and then unloads as configured.
+    A background loop checks every `refresh_interval` seconds which warmed
+    models Ollama still has loaded, so unloaded ones show as cold.
+    """
+
+    def __init__(
+        self,
+        client: Optional[ollama.Client] = None,
+        keep_alive: Optional[Dict[str, Any]] = None,
+        default_keep_alive: Any = "30m",
+        refresh_interval: float = 240.0,
+        retry_after: float = 30.0
+    ):
+        """
+        Parameters:
+            client (Optional[ollama.Client]): Ollama client; defaults to OLLAMA_HOST.
+            keep_alive (Optional[Dict[str, Any]]): Per-model keep_alive, e.g. {"nomic-embed-text": -1}.
+            default_keep_alive (Any): keep_alive for models without an entry.
+            refresh_interval (float): Seconds between checks of which models are loaded; 0 disables them.
+            retry_after (float): Seconds before a failed load is attempted again.
+        """
+        self.client = client or ollama.Client()
+        self.keep_alive = dict(keep_alive or {})
+        self.default_keep_alive = default_keep_alive
+        self.refresh_interval = refresh_interval
+        self.retry_after = retry_after
+        self._states: Dict[str, ModelState] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def keep_alive_for(self, model: str) -> Any:
+        """Return the keep_alive configured for a model."""
+        return self.keep_alive.get(model, self.default_keep_alive)
+
+    def state(self, model: str) -> ModelState:
+        """Return a copy of the model's current load state."""
+        with self._lock:
+            current = self._states.get(model, ModelState())
+            return ModelState(**vars(current))
+
+    def warm(self, model: str, kind: str = "chat") -> None:
+        """
+        Start loading a model in the background; returns immediately.
+
+        Calls for a model that is loading or loaded are ignored, so this can be
+        called on every UI rerun.
+        """
+        with self._lock:
+            current = self._states.get(model)
+            if current is not None and (
+                current.state in (LOADING, READY)
+                or (current.state == FAILED and time.monotonic() - current.updated < self.retry_after)
+            ):
+                return
+            self._states[model] = ModelState(state=LOADING, kind=kind, updated=time.monotonic())
+        threading.Thread(target=self._load, args=(model, kind), name=f"warm-{model}", daemon=True).start()
+        self._start_refresher()
+
+    def _request(self, model: str, kind: str) -> None:
+        """Issue the cheapest request that makes Ollama load the model."""
+        keep_alive = self.keep_alive_for(model)
+        if kind == "embed":
+            self.client.embed(model=model, input="warm-up", keep_alive=keep_alive)
+        else:
+            # An empty prompt loads the model without generating anything
+            self.client.generate(model=model, prompt="", keep_alive=keep_alive)
+
+    def _load(self, model: str, kind: str) -> None:
+        start = time.perf_counter()
+        try:
+            self._request(model, kind)
+        except Exception as e:
+            logger.error(f"Warm-up of {model} failed: {e}")
+            self._set(model, ModelState(state=FAILED, kind=kind, error=str(e), updated=time.monotonic()))
+            return
+        seconds = time.perf_counter() - start
+        logger.info(f"Warmed up {model} in {seconds:.2f}s (keep_alive={self.keep_alive_for(model)})")
+        self._set(model, ModelState(state=READY, kind=kind, load_seconds=seconds, updated=time.monotonic()))
+
+    def _set(self, model: str, state: ModelState) -> None:
+        with self._lock:
+            self._states[model] = state
+
+    def refresh(self) -> None:
+        """
+        Mark models that Ollama has unloaded as cold.
+
+        Nothing is sent to the models themselves: a request would keep an
+        unused model loaded indefinitely and defeat its keep_alive.
+        """
+        try:
+            loaded = {_canonical(entry.model) for entry in self.client.ps().models}
+        except Exception as e:
+            logger.warning(f"Could not list loaded models: {e}")
+            return
+        with self._lock:
+            ready = {model: state.kind for model, state in self._states.items() if state.state == READY}
+        for model, kind in ready.items():
+            if _canonical(model) not in loaded:
+                logger.info(f"{model} was unloaded by Ollama")
+                self._set(model, ModelState(state=COLD, kind=kind, updated=time.monotonic()))
+
+    def _start_refresher(self) -> None:
+        with self._lock:
+            if self.refresh_interval <= 0 or self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="model-state", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def stop(self) -> None:
+        """Stop the loaded-model checks."""
+        self._stop.set()
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import pytest
+
+from src.core.budget import (
+    ANSWER_TRUNCATED,
+    LatencyBudget,
+    RequestDeadline,
+    StageTimeout,
+    astream_within_budget,
+    degrade,
+    mark_generation_start,
+    request_deadline,
+    run_with_timeout,
+    stage_timeout,
+    stream_within_budget,
+)
+
+def slow_chunks(first_delay, delay, count):
+    time.sleep(first_delay)
+    for index in range(count):
+        yield f"t{index} "
+        time.sleep(delay)
+
+async def aslow_chunks(first_delay, delay, count):
+    await asyncio.sleep(first_delay)
+    for index in range(count):
+        yield f"t{index} "
+        await asyncio.sleep(delay)
+
+def test_budget_from_config():
+    budget = LatencyBudget.from_config({"rewrite_ms": 1500, "embed_ms": None, "retrieve_ms": 3000, "generate_ms": 120000})
+    assert budget == LatencyBudget(rewrite=1.5, embed=None, retrieve=3.0, generate=120.0)
+    assert LatencyBudget.from_config({"enabled": False, "rewrite_ms": 1500}) == LatencyBudget()
+
+def test_deadline_applies_only_inside_the_request():
+    deadline = RequestDeadline(LatencyBudget(rewrite=0.5))
+    with request_deadline(deadline):
+        assert stage_timeout("rewrite") == 0.5
+        degrade("rewrite_skipped", "slow")
+        degrade("rewrite_skipped", "slow again")
+    assert stage_timeout("rewrite") is None
+    assert deadline.degradations == ["rewrite_skipped"]
+
+def test_run_with_timeout_gives_up_on_slow_calls():
+    assert run_with_timeout(lambda x: x + 1, 1.0, 1) == 2
+    with pytest.raises(FuturesTimeoutError):
+        run_with_timeout(time.sleep, 0.01, 0.2)
+
+def test_slow_generation_is_truncated():
+    deadline = RequestDeadline(LatencyBudget(generate=0.15))
+    with request_deadline(deadline):
+        mark_generation_start()
+        start = time.monotonic()
+        chunks = list(stream_within_budget(slow_chunks(0.0, 0.05, 100)))
+    assert time.monotonic() - start < 0.5
+    assert 0 < len(chunks) < 100
+    assert deadline.degradations == [ANSWER_TRUNCATED]
+
+def test_stalled_generation_raises_stage_timeout():
+    deadline = RequestDeadline(LatencyBudget(generate=0.05))
+    with request_deadline(deadline):
+        mark_generation_start()
+        with pytest.raises(StageTimeout) as error:
+            list(stream_within_budget(slow_chunks(0.5, 0.0, 1)))
+    assert error.value.stage == "generate"
+
+def test_generate_budget_starts_with_generation():
+    # Retrieval inside the stream does not count against the generate budget
+    deadline = RequestDeadline(LatencyBudget(generate=0.1))
+
+    def retrieve_then_generate():
+        time.sleep(0.2)
+        mark_generation_start()
+        yield "answer"
+
+    with request_deadline(deadline):
+        assert list(stream_within_budget(retrieve_then_generate())) == ["answer"]
+    assert deadline.degradations == []
+
+def test_without_generate_budget_the_stream_is_untouched():
+    with request_deadline(RequestDeadline(LatencyBudget())):
+        assert list(stream_within_budget(iter(["a", "b"]))) == ["a", "b"]
+
+def test_async_slow_generation_is_truncated():
+    async def scenario():
+        deadline = RequestDeadline(LatencyBudget(generate=0.15))
+        with request_deadline(deadline):
+            mark_generation_start()
+            chunks = [chunk async for chunk in astream_within_budget(aslow_chunks(0.0, 0.05, 100))]
+        return chunks, deadline.degradations
+
+    chunks, degradations = asyncio.run(scenario())
+    assert 0 < len(chunks) < 100
+    assert degradations == [ANSWER_TRUNCATED]
+
+def test_async_stalled_generation_raises_stage_timeout():
+    async def scenario():
+        with request_deadline(RequestDeadline(LatencyBudget(generate=0.05))):
+            mark_generation_start()
+            return [chunk async for chunk in astream_within_budget(aslow_chunks(0.5, 0.0, 1))]
+
+    with pytest.raises(StageTimeout):
+        asyncio.run(scenario())
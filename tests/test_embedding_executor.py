@@ -0,0 +1,34 @@
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from src.core.embedding_executor import BatchedEmbeddings
+
+class SlowEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        time.sleep(0.05)
+        return [[1.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0]
+
+def test_concurrent_calls_do_not_inflate_busy_time():
+    embeddings = BatchedEmbeddings(SlowEmbeddings(), batch_size=10, max_in_flight=8)
+    threads = [threading.Thread(target=embeddings.embed_documents, args=(["text"] * 10,)) for _ in range(8)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    wall = time.perf_counter() - start
+    stats = embeddings.stats()
+    assert stats["chunks"] == 80
+    assert stats["seconds"] <= wall
+    assert stats["chunks_per_second"] >= 80 / wall
+
+def test_sequential_calls_add_up():
+    embeddings = BatchedEmbeddings(SlowEmbeddings(), batch_size=10)
+    embeddings.embed_documents(["text"] * 10)
+    embeddings.embed_documents(["text"] * 10)
+    assert embeddings.stats()["seconds"] >= 0.1
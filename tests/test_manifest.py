@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from src.core.answer_cache import collection_version
+from src.core.manifest import DocumentManifest, collection_name_for
+
+class FakeCollection:
+    def __init__(self, name, count):
+        self.name = name
+        self._count = count
+
+    def count(self):
+        return self._count
+
+    def get(self, include=None):
+        raise AssertionError("chunk ids must not be read")
+
+def test_collection_version_is_bumped_and_persisted(tmp_path):
+    manifest = DocumentManifest(str(tmp_path))
+    assert manifest.collection_version("manuals") == 0
+    assert manifest.bump_collection_version("manuals") == 1
+    assert manifest.bump_collection_version("manuals") == 2
+    assert DocumentManifest(str(tmp_path)).collection_version("manuals") == 2
+
+def test_changes_from_another_process_are_seen_and_kept(tmp_path):
+    server = DocumentManifest(str(tmp_path))
+    server.record("a" * 64, collection_name_for("a" * 64), "a.pdf", 3)
+    cli = DocumentManifest(str(tmp_path))
+    cli.bump_collection_version("manuals")
+    assert server.collection_version("manuals") == 1
+    # A later write by the server must not roll the counter back
+    server.record("b" * 64, collection_name_for("b" * 64), "b.pdf", 4)
+    assert DocumentManifest(str(tmp_path)).collection_version("manuals") == 1
+    assert cli.get("b" * 64)["chunk_count"] == 4
+
+def test_named_collections_are_versioned_by_the_manifest(tmp_path):
+    manifest = DocumentManifest(str(tmp_path))
+    vector_db = SimpleNamespace(_collection=FakeCollection("manuals", 10))
+    before = collection_version(vector_db, manifest)
+    manifest.bump_collection_version("manuals")
+    assert collection_version(vector_db, manifest) != before
+
+def test_digest_collections_are_versioned_by_count(tmp_path):
+    name = collection_name_for("c" * 64)
+    vector_db = SimpleNamespace(_collection=FakeCollection(name, 7))
+    assert collection_version(vector_db, DocumentManifest(str(tmp_path))) == f"{name}:7"
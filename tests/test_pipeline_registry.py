@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from src.core.pipeline_registry import PipelineRegistry
+
+class ReenteringLock:
+    """Wrap a lock and run a one-shot hook right after its next release."""
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.hook = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        hook, self.hook = self.hook, None
+        if hook is not None:
+            hook()
+
+def get_concurrently(registry, key, factory, count):
+    results = []
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        results.append(registry.get_or_create(key, factory))
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results
+
+def test_concurrent_requests_share_one_build():
+    registry = PipelineRegistry()
+    builds = []
+
+    def factory():
+        time.sleep(0.02)
+        builds.append(object())
+        return builds[-1]
+
+    results = get_concurrently(registry, ("rag", "model", "docs"), factory, 10)
+    assert len(builds) == 1
+    assert all(result is builds[0] for result in results)
+    assert registry.stats() == {"entries": 1, "hits": 9, "misses": 1, "evictions": 0}
+
+def test_caller_arriving_as_a_build_finishes_reuses_it():
+    registry = PipelineRegistry()
+    registry._lock = ReenteringLock(registry._lock)
+    builds = []
+    late = []
+
+    def factory():
+        builds.append(object())
+        # Call again the moment the building caller first lets go of the registry lock
+        registry._lock.hook = lambda: late.append(registry.get_or_create("key", factory))
+        return builds[-1]
+
+    assert registry.get_or_create("key", factory) is builds[0]
+    assert len(builds) == 1
+    assert late == [builds[0]]
+
+def test_least_recently_used_entry_is_evicted():
+    registry = PipelineRegistry(max_entries=2)
+    registry.get_or_create("a", lambda: "A")
+    registry.get_or_create("b", lambda: "B")
+    registry.get_or_create("a", lambda: "unused")
+    registry.get_or_create("c", lambda: "C")
+    assert registry.get_or_create("a", lambda: "rebuilt") == "A"
+    assert registry.get_or_create("b", lambda: "rebuilt") == "rebuilt"
+    assert registry.stats()["evictions"] == 2
+
+def test_failed_build_can_be_retried():
+    registry = PipelineRegistry()
+
+    def failing():
+        raise RuntimeError("model not found")
+
+    with pytest.raises(RuntimeError):
+        registry.get_or_create("key", failing)
+    assert registry.get_or_create("key", lambda: "built") == "built"
+
+def test_discard_drops_matching_entries():
+    registry = PipelineRegistry()
+    registry.get_or_create(("chain", "m", "docs"), lambda: 1)
+    registry.get_or_create(("chain", "m", "other"), lambda: 2)
+    assert registry.discard(lambda key: key[2] == "docs") == 1
+    assert len(registry) == 1
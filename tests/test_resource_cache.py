@@ -0,0 +1,179 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from src.core.resource_cache import SharedResourceCache
+
+class ReenteringLock:
+    """Wrap a lock and run a one-shot hook right after its next release."""
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.hook = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        hook, self.hook = self.hook, None
+        if hook is not None:
+            hook()
+
+def acquire_concurrently(cache, key, factory, count):
+    leases = []
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        leases.append(cache.acquire(key, factory))
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return leases
+
+def test_concurrent_acquirers_share_one_build():
+    cache = SharedResourceCache(sweep_interval=0)
+    builds = []
+
+    def factory():
+        time.sleep(0.02)
+        builds.append(object())
+        return builds[-1]
+
+    leases = acquire_concurrently(cache, "doc", factory, 10)
+    assert len(builds) == 1
+    assert {id(lease.value) for lease in leases} == {id(builds[0])}
+    assert cache.stats() == {"entries": 1, "leases": 10, "hits": 9, "builds": 1, "evictions": 0}
+
+def test_caller_arriving_as_a_build_finishes_reuses_it():
+    cache = SharedResourceCache(sweep_interval=0)
+    cache._lock = ReenteringLock(cache._lock)
+    builds = []
+    late = []
+
+    def factory():
+        builds.append(object())
+        # Acquire again the moment the building caller first lets go of the cache lock
+        cache._lock.hook = lambda: late.append(cache.acquire("doc", factory))
+        return builds[-1]
+
+    lease = cache.acquire("doc", factory)
+    assert lease.value is builds[0]
+    assert len(builds) == 1
+    assert [other.value for other in late] == [builds[0]]
+    assert cache.stats()["leases"] == 2
+
+def test_factory_returning_none_caches_nothing():
+    cache = SharedResourceCache(sweep_interval=0)
+    assert cache.acquire("doc", lambda: None) is None
+    assert len(cache) == 0
+    assert cache.acquire("doc", lambda: "built").value == "built"
+
+def test_failed_build_can_be_retried():
+    cache = SharedResourceCache(sweep_interval=0)
+
+    def failing():
+        raise RuntimeError("ingestion failed")
+
+    with pytest.raises(RuntimeError):
+        cache.acquire("doc", failing)
+    assert cache.acquire("doc", lambda: "built").value == "built"
+
+def test_idle_resources_are_evicted_only_without_leases():
+    cache = SharedResourceCache(idle_seconds=0.01, sweep_interval=0)
+    closed = []
+    lease = cache.acquire("doc", lambda: "collection", on_evict=closed.append)
+    time.sleep(0.02)
+    assert cache.evict_idle() == 0
+    lease.release()
+    assert cache.evict_idle() == 0
+    time.sleep(0.02)
+    assert cache.evict_idle() == 1
+    assert closed == ["collection"]
+    assert len(cache) == 0
+
+def test_release_is_idempotent():
+    cache = SharedResourceCache(sweep_interval=0)
+    first = cache.acquire("doc", lambda: "collection")
+    second = cache.acquire("doc", lambda: "unused")
+    first.release()
+    first.release()
+    assert first.released
+    assert cache.stats()["leases"] == 1
+    second.release()
+    assert cache.stats()["leases"] == 0
+
+def test_garbage_collected_lease_releases_itself():
+    cache = SharedResourceCache(sweep_interval=0)
+    lease = cache.acquire("doc", lambda: "collection")
+    assert cache.stats()["leases"] == 1
+    del lease
+    gc.collect()
+    assert cache.stats()["leases"] == 0
+
+def test_discarded_resource_is_rebuilt_and_old_leases_stay_valid():
+    cache = SharedResourceCache(sweep_interval=0)
+    closed = []
+    old = cache.acquire("doc", lambda: "v1", on_evict=closed.append)
+    assert cache.discard(lambda key: key == "doc") == 1
+    assert closed == ["v1"]
+    new = cache.acquire("doc", lambda: "v2")
+    assert (old.value, new.value) == ("v1", "v2")
+    # Releasing the old lease must not touch the rebuilt entry
+    old.release()
+    assert cache.stats()["leases"] == 1
+
+def test_background_sweep_evicts_idle_resources():
+    cache = SharedResourceCache(idle_seconds=0.01, sweep_interval=0.01)
+    try:
+        cache.acquire("doc", lambda: "collection").release()
+        deadline = time.monotonic() + 2
+        while len(cache) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(cache) == 0
+        assert cache.stats()["evictions"] == 1
+    finally:
+        cache.stop()
+
+def test_only_the_last_lease_destroys_the_resource():
+    cache = SharedResourceCache(sweep_interval=0)
+    destroyed = []
+    first = cache.acquire("doc", lambda: "collection")
+    second = cache.acquire("doc", lambda: "unused")
+    assert not cache.release_or_destroy(first, destroyed.append)
+    assert destroyed == []
+    assert cache.acquire("doc", lambda: "unused").value == "collection"
+    assert not cache.release_or_destroy(first, destroyed.append)
+
+def test_last_lease_destroys_and_blocks_reopening_until_done():
+    cache = SharedResourceCache(sweep_interval=0)
+    lease = cache.acquire("doc", lambda: "v1")
+    reopened = []
+
+    def destroy(value):
+        thread = threading.Thread(target=lambda: reopened.append(cache.acquire("doc", lambda: "v2")))
+        thread.start()
+        thread.join(timeout=0.05)
+        # The other session waits for the delete instead of leasing the doomed resource
+        assert reopened == []
+        destroy.thread = thread
+
+    assert cache.release_or_destroy(lease, destroy)
+    destroy.thread.join(timeout=2)
+    assert [other.value for other in reopened] == ["v2"]
+
+def test_discarded_lease_does_not_destroy_the_rebuilt_resource():
+    cache = SharedResourceCache(sweep_interval=0)
+    old = cache.acquire("doc", lambda: "v1")
+    cache.discard(lambda key: True)
+    cache.acquire("doc", lambda: "v2").release()
+    destroyed = []
+    assert not cache.release_or_destroy(old, destroyed.append)
+    assert destroyed == [] and len(cache) == 1
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableLambda
+
+from src.core.scheduler import BATCH, INTERACTIVE, PrioritySlots, QueryEmbeddingBatcher, RequestScheduler, request_priority
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.001)
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def start_waiter(slots, priority, order, name):
+    def run():
+        with slots.hold(priority):
+            order.append(name)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_released_slot_goes_to_interactive_before_batch():
+    slots = PrioritySlots(1)
+    order = []
+    with slots.hold():
+        threads = [start_waiter(slots, BATCH, order, "batch-1")]
+        wait_until(lambda: slots.stats()["waiting"] == 1)
+        threads.append(start_waiter(slots, BATCH, order, "batch-2"))
+        wait_until(lambda: slots.stats()["waiting"] == 2)
+        threads.append(start_waiter(slots, INTERACTIVE, order, "interactive"))
+        wait_until(lambda: slots.stats()["waiting"] == 3)
+    for thread in threads:
+        thread.join(timeout=2)
+    assert order == ["interactive", "batch-1", "batch-2"]
+    assert slots.stats() == {"in_flight": 0, "waiting": 0, "waited": 3}
+
+def test_priority_follows_the_request_context():
+    slots = PrioritySlots(1)
+    order = []
+
+    def run(priority, name):
+        with request_priority(priority):
+            with slots.hold():
+                order.append(name)
+
+    with slots.hold():
+        batch = threading.Thread(target=run, args=(BATCH, "batch"))
+        batch.start()
+        wait_until(lambda: slots.stats()["waiting"] == 1)
+        interactive = threading.Thread(target=run, args=(INTERACTIVE, "interactive"))
+        interactive.start()
+        wait_until(lambda: slots.stats()["waiting"] == 2)
+    batch.join(timeout=2)
+    interactive.join(timeout=2)
+    assert order == ["interactive", "batch"]
+
+def test_cancelled_async_waiter_gives_up_its_place():
+    async def scenario():
+        slots = PrioritySlots(1)
+        holder_release = asyncio.Event()
+
+        async def holder():
+            async with slots.ahold():
+                await holder_release.wait()
+
+        async def waiter():
+            async with slots.ahold():
+                pass
+
+        held = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(waiter())
+        await asyncio.sleep(0.01)
+        assert slots.stats()["waiting"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert slots.stats()["waiting"] == 0
+        holder_release.set()
+        await held
+        # The slot returns to the pool instead of going to the cancelled waiter
+        assert slots.stats()["in_flight"] == 0
+        async with slots.ahold():
+            assert slots.stats()["in_flight"] == 1
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+def test_rewrites_do_not_wait_for_generation_slots():
+    scheduler = RequestScheduler(CountingEmbeddings(), max_generations=1, max_rewrites=1)
+    rewrite = scheduler.schedule_rewrite(RunnableLambda(lambda question: f"{question}?"))
+    result = []
+    with scheduler.generation_slots.hold():
+        thread = threading.Thread(target=lambda: result.append(rewrite.invoke("why")))
+        thread.start()
+        thread.join(timeout=2)
+    assert result == ["why?"]
+    assert scheduler.stats()["generations"]["waited"] == 0
+
+def test_scheduled_stream_holds_its_slot_until_the_last_chunk():
+    scheduler = RequestScheduler(CountingEmbeddings(), max_generations=1)
+    llm = scheduler.schedule(RunnableLambda(lambda text: text))
+    chunks = llm.stream("answer")
+    assert next(chunks) == "answer"
+    assert scheduler.stats()["generations"]["in_flight"] == 1
+    assert list(chunks) == []
+    assert scheduler.stats()["generations"]["in_flight"] == 0
+
+def test_concurrent_query_embeddings_share_one_request():
+    backend = CountingEmbeddings()
+    batcher = QueryEmbeddingBatcher(backend, window=0.05)
+    texts = ["a", "bb", "ccc", "bb"]
+    results = {}
+    barrier = threading.Barrier(len(texts))
+
+    def embed(index, text):
+        barrier.wait()
+        results[index] = batcher.embed_query(text)
+
+    threads = [threading.Thread(target=embed, args=item) for item in enumerate(texts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=2)
+    assert [results[i] for i in range(len(texts))] == [[float(len(text)), 1.0] for text in texts]
+    assert len(backend.calls) == 1
+    assert sorted(backend.calls[0]) == ["a", "bb", "ccc"]
+    assert batcher.stats()["deduplicated"] == 1
+
+def test_large_embedding_calls_bypass_the_batcher():
+    backend = CountingEmbeddings()
+    batcher = QueryEmbeddingBatcher(backend, max_batch=2)
+    assert len(batcher.embed_documents(["a", "b", "c"])) == 3
+    assert batcher.stats()["requests"] == 0
+
+def test_failed_batch_reaches_every_caller():
+    class FailingEmbeddings(CountingEmbeddings):
+        def embed_documents(self, texts):
+            raise RuntimeError("backend down")
+
+    batcher = QueryEmbeddingBatcher(FailingEmbeddings(), window=0.001)
+    with pytest.raises(RuntimeError, match="backend down"):
+        batcher.embed_query("question")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Usage: python utils/ingest_folder.py documents/word_files_folder --collection manuals
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import yaml
+
+from src.core.dedup import ChunkDeduplicator
+from src.core.embeddings import VectorStore
+from src.core.ingest import IngestionPipeline
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Ingest every PDF, DOCX and HTML file in a folder.")
+    parser.add_argument("folder", type=Path, help="Folder to ingest")
+    parser.add_argument("--collection", default="local-rag", help="Target collection name")
+    parser.add_argument("--config", type=Path, default=Path("config.yml"), help="Path to config.yml")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding batch")
+    parser.add_argument("--append", action="store_true", help="Add to the collection instead of replacing it")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    vector_store = VectorStore(
+        embedding_model=config["embeddings"]["model"],
+        cache_dir=config["embeddings"]["cache"]["directory"] if config["embeddings"]["cache"]["enabled"] else None,
+        persist_directory=config["vector_db"]["persist_directory"],
+        batch_size=config["embeddings"]["batch_size"],
+        max_in_flight=config["embeddings"]["max_in_flight"],
+        lexical_directory=config["lexical_index"]["directory"] if config["lexical_index"]["enabled"] else None,
+        backend=config["vector_db"]["backend"],
+        quantization=config["vector_db"]["quantization"]
+    )
+    pipeline = IngestionPipeline(
+        vector_store,
+        chunk_size=config["text_splitter"]["chunk_size"],
+        chunk_overlap=config["text_splitter"]["chunk_overlap"],
+        max_workers=args.workers,
+        batch_size=args.batch_size,
+        pdf_backend=config["pdf"]["text_backend"],
+        pdf_fallback=config["pdf"]["fallback_backend"],
+        deduplicator=ChunkDeduplicator(
+            threshold=config["dedup"]["threshold"],
+            num_perm=config["dedup"]["num_perm"],
+            bands=config["dedup"]["bands"],
+            shingle_size=config["dedup"]["shingle_size"]
+        ) if config["dedup"]["enabled"] else None
+    )
+    report = pipeline.ingest_folder(args.folder, collection_name=args.collection, replace=not args.append)
+
+    print(report.summary())
+    for path, error in report.errors.items():
+        print(f"  failed: {path}: {error}")
+    sys.exit(1 if report.errors else 0)
+
+if __name__ == "__main__":
+    main()